@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Compare download backends' throughput and CPU use against a local server.
+
+python dev/bench_backends.py --size 256MB --rate 0 --latency 0.05
+
+The server runs in a separate process so the CPU time reported is the
+backend's own (download, streaming hash and final file hash).
+"""
+# ruff: noqa: T201
+
+import argparse
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bench_download import make_payload
+from throttled_http_server import parse_rate
+
+from services import download_backend
+from services.hashing import StreamingHasher
+
+SERVER_SCRIPT = Path(__file__).resolve().parent / "throttled_http_server.py"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(url: str, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, method="HEAD")):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def run_once(
+    backend: download_backend.DownloadBackend, url: str, target: Path
+) -> tuple[float, float, float, str]:
+    """Download and hash *url*; return (seconds, cpu seconds, hash seconds, sha256)."""
+    target.unlink(missing_ok=True)
+    hasher = StreamingHasher(target)
+    began, began_cpu = time.perf_counter(), time.process_time()
+    handle = backend.download(url, target, resume=False, sink=hasher.feed)
+    while not handle.is_finished():
+        time.sleep(0.05)
+        hasher.advance_to(handle.get_progress().get("downloaded", 0))
+    if not handle.is_successful():
+        msg = f"{backend.name} download failed"
+        raise RuntimeError(msg)
+    hasher.advance_to(target.stat().st_size)
+    elapsed = time.perf_counter() - began
+    cpu = time.process_time() - began_cpu
+
+    began = time.perf_counter()
+    digest = backend.hash_file(target)
+    hash_elapsed = time.perf_counter() - began
+    if digest != hasher.hexdigest():
+        msg = f"{backend.name}: streaming hash differs from file hash"
+        raise RuntimeError(msg)
+    return elapsed, cpu, hash_elapsed, digest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_rate, default=parse_rate("128MB"))
+    parser.add_argument("--rate", type=parse_rate, default=0, help="0 = unlimited")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--backends", nargs="+", default=list(download_backend.BACKENDS)
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="wingone_bench_") as tmp:
+        payload = Path(tmp) / "payload.iso"
+        expected = make_payload(payload, args.size)
+        target = Path(tmp) / "download.iso"
+
+        port = free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                str(SERVER_SCRIPT),
+                "--file",
+                str(payload),
+                "--port",
+                str(port),
+                "--rate",
+                str(args.rate),
+                "--latency",
+                str(args.latency),
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            url = f"http://127.0.0.1:{port}/{payload.name}"
+            wait_for_server(url)
+            rate = f"{args.rate / 1e6:.1f} MB/s" if args.rate else "unlimited"
+            print(f"{args.size / 1e6:.0f} MB, {rate}, {args.latency * 1000:.0f} ms")
+            for name in args.backends:
+                try:
+                    backend = download_backend.create_backend(name)
+                except ImportError as e:
+                    print(f"  {name:<8} unavailable: {e}")
+                    continue
+                for _ in range(args.repeat):
+                    elapsed, cpu, hash_elapsed, digest = run_once(backend, url, target)
+                    status = "ok" if digest == expected else "HASH MISMATCH"
+                    print(
+                        f"  {name:<8} {elapsed:7.2f} s  "
+                        f"{args.size / elapsed / 1e6:7.1f} MB/s  "
+                        f"cpu {cpu:6.2f} s ({cpu / elapsed:4.0%})  "
+                        f"hash_file {args.size / hash_elapsed / 1e6:6.0f} MB/s  "
+                        f"{status}"
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
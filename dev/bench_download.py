@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark segmented downloads against a local throttled HTTP server.
+
+python dev/bench_download.py --size 256MB --rate 8MB --segments 1 2 4 8
+"""
+# ruff: noqa: T201
+
+import argparse
+import hashlib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from throttled_http_server import ThrottledServer, parse_rate
+
+from services import segmented_download
+
+
+def make_payload(path: Path, size: int) -> str:
+    """Write *size* pseudo-random bytes to *path* and return their sha256."""
+    digest = hashlib.sha256()
+    block = hashlib.sha256(b"wingone").digest() * (1024 * 1024 // 32)
+    with path.open("wb") as f:
+        remaining = size
+        counter = 0
+        while remaining:
+            data = block[: min(len(block), remaining)]
+            data = counter.to_bytes(8, "little") + data[8:]
+            f.write(data)
+            digest.update(data)
+            remaining -= len(data)
+            counter += 1
+    return digest.hexdigest()
+
+
+def run_once(url: str, target: Path, segments: int) -> tuple[float, str]:
+    """Download *url* with *segments* connections; return (seconds, sha256)."""
+    target.unlink(missing_ok=True)
+    segmented_download.discard_state(target)
+    began = time.perf_counter()
+    handle = segmented_download.start_segmented_download(url, target, segments)
+    if handle is None:
+        msg = "Server does not support Range requests"
+        raise RuntimeError(msg)
+    while not handle.is_finished():
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - began
+    if not handle.is_successful():
+        msg = f"Download failed: {handle.error}"
+        raise RuntimeError(msg)
+    return elapsed, hashlib.sha256(target.read_bytes()).hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_rate, default=parse_rate("128MB"))
+    parser.add_argument("--rate", type=parse_rate, default=parse_rate("8MB"))
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--no-range", action="store_true", help="Check the fallback")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="wingone_bench_") as tmp:
+        payload = Path(tmp) / "payload.iso"
+        expected = make_payload(payload, args.size)
+        target = Path(tmp) / "download.iso"
+
+        with ThrottledServer(
+            payload, args.rate, args.latency, not args.no_range
+        ) as srv:
+            if args.no_range:
+                info = segmented_download.probe(srv.url)
+                result = "falls back" if not info.accepts_ranges else "BROKEN"
+                print(f"Range ignored by server -> segmented mode {result}")
+                return
+
+            print(
+                f"{args.size / 1e6:.0f} MB at {args.rate / 1e6:.1f} MB/s per connection"
+            )
+            for segments in args.segments:
+                elapsed, digest = run_once(srv.url, target, segments)
+                status = "ok" if digest == expected else "HASH MISMATCH"
+                rate = args.size / elapsed / 1e6
+                print(
+                    f"  segments={segments:<3} {elapsed:7.2f} s  {rate:7.1f} MB/s  {status}"
+                )
+
+
+if __name__ == "__main__":
+    main()
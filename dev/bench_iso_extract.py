@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Compare ISO extraction engines on a generated multi-GB image.
+
+python dev/bench_iso_extract.py --size 3GB --files 300 --workers 1 8
+
+Runs pycdlib's per-file copy (the old path) and IsoImage.extract with each
+copy method this platform has, for each number of writers. Timings are with a warm page cache unless
+the image is larger than RAM.
+"""
+# ruff: noqa: T201
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from check_iso_stream import extract_with_pycdlib, make_iso, same_tree
+from throttled_http_server import parse_rate
+
+from services import extent_copy
+from services.iso9660 import get_iso_image
+
+
+def timed(run) -> tuple[float, float]:
+    """Run *run*; return (seconds, CPU seconds)."""
+    began, began_cpu = time.perf_counter(), time.process_time()
+    run()
+    return time.perf_counter() - began, time.process_time() - began_cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_rate, default=parse_rate("3GB"))
+    parser.add_argument("--files", type=int, default=300, help="Small files")
+    parser.add_argument("--dir", type=Path, help="Where to create the image")
+    parser.add_argument(
+        "--methods", nargs="+", default=["pycdlib", *extent_copy.available_methods()]
+    )
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1], help="Writer counts to try"
+    )
+    parser.add_argument("--no-verify", action="store_true")
+    args = parser.parse_args()
+
+    small_size = 64 * 1024
+    files = {f"/images/pxeboot/file_{i}.bin": small_size for i in range(args.files)}
+    files["/LiveOS/squashfs.img"] = max(1, args.size - args.files * small_size)
+
+    with tempfile.TemporaryDirectory(prefix="wingone_iso_", dir=args.dir) as tmp:
+        iso_path = Path(tmp) / "bench.iso"
+        began = time.perf_counter()
+        make_iso(iso_path, files)
+        print(
+            f"Generated {iso_path.stat().st_size / 1e9:.2f} GB image "
+            f"in {time.perf_counter() - began:.1f} s"
+        )
+        elapsed, _ = timed(lambda: get_iso_image(iso_path))
+        print(f"Indexed in {elapsed * 1000:.1f} ms")
+
+        reference = None
+        runs = [("pycdlib", 1)] if "pycdlib" in args.methods else []
+        runs += [(m, w) for m in args.methods if m != "pycdlib" for w in args.workers]
+        for method, workers in runs:
+            name = method if method == "pycdlib" else f"{method} x{workers}"
+            target = Path(tmp) / name.replace(" ", "_")
+            if method == "pycdlib":
+                elapsed, cpu = timed(lambda t=target: extract_with_pycdlib(iso_path, t))
+            else:
+                elapsed, cpu = timed(
+                    lambda t=target, m=method, w=workers: get_iso_image(
+                        iso_path
+                    ).extract(t, None, [m], workers=w)
+                )
+            status = ""
+            if not args.no_verify:
+                if reference is None:
+                    reference = target
+                else:
+                    status = (
+                        "identical" if same_tree(reference, target) else "DIFFERENT"
+                    )
+            print(
+                f"  {name:<20} {elapsed:7.2f} s  {args.size / elapsed / 1e6:7.0f} MB/s  "
+                f"cpu {cpu:6.2f} s  {status}"
+            )
+            if reference is not target:
+                shutil.rmtree(target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Measure the privilege helper protocol's throughput over a loopback transport.
+
+python dev/bench_pipe_framing.py [--sizes 1K,64K,1M,16M,256M] [--repeat 5]
+
+The helper's command loop (privilege_helper.serve) runs in a thread at one
+end of a socket pair, standing in for the named pipe, and the client sends
+commands with the same framing as _PrivilegeManager. Each size is sent
+both ways: as a function argument (client to helper) and as a function's
+result (helper to client).
+"""
+# ruff: noqa: T201
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from throttled_http_server import parse_rate
+
+from services import pipe_framing
+from services.privilege_helper import serve
+
+
+def socket_transport(
+    sock: socket.socket,
+) -> tuple[pipe_framing.Reader, pipe_framing.Writer]:
+    return sock.recv, sock.sendall
+
+
+def builtin_call(func_name: str, *args: object) -> dict:
+    """Get the command calling a builtin function in the helper."""
+    return {
+        "type": "function",
+        "module_name": "builtins",
+        "func_name": func_name,
+        "args": args,
+    }
+
+
+def exchange(
+    read: pipe_framing.Reader, write: pipe_framing.Writer, command: dict
+) -> dict:
+    pipe_framing.send_message(write, command)
+    response = pipe_framing.receive_message(read)
+    if response.get("type") == "error":
+        msg = f"Helper error: {response['error']}"
+        raise RuntimeError(msg)
+    return response
+
+
+def time_command(
+    read: pipe_framing.Reader,
+    write: pipe_framing.Writer,
+    command: dict,
+    repeat: int,
+) -> float:
+    """Get the best round trip time of *command* out of *repeat*."""
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        exchange(read, write, command)
+        best = min(best, time.perf_counter() - began)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1K,64K,1M,16M,256M")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sizes = [parse_rate(size) for size in args.sizes.split(",")]
+
+    client, helper = socket.socketpair()
+    thread = threading.Thread(target=serve, args=socket_transport(helper))
+    thread.start()
+    read, write = socket_transport(client)
+    try:
+        latency = time_command(read, write, {"type": "ping"}, args.repeat * 20)
+        print(f"ping round trip: {latency * 1e6:.0f} us")
+        print(f"{'size':>12}  {'to helper':>12}  {'from helper':>12}")
+        for size in sizes:
+            payload = os.urandom(size)
+            to_helper = builtin_call("len", payload)
+            from_helper = builtin_call("bytes", size)
+            if exchange(read, write, to_helper)["result"] != size:
+                msg = f"The helper did not receive {size} bytes"
+                raise RuntimeError(msg)
+            if len(exchange(read, write, from_helper)["result"]) != size:
+                msg = f"{size} bytes were not received from the helper"
+                raise RuntimeError(msg)
+            sent = time_command(read, write, to_helper, args.repeat)
+            received = time_command(read, write, from_helper, args.repeat)
+            print(
+                f"{size:>12}  {size / sent / 1e6:>9.0f} MB/s"
+                f"  {size / received / 1e6:>9.0f} MB/s"
+            )
+    finally:
+        exchange(read, write, {"type": "shutdown"})
+        thread.join()
+        client.close()
+        helper.close()
+
+
+if __name__ == "__main__":
+    main()
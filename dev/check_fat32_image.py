@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Check userspace-built FAT32 images with fsck.vfat and mtools.
+
+python dev/check_fat32_image.py [--files 300] [--large 64MB]
+
+A synthetic ISO plus a few local files (long and non-ASCII names, empty
+and read-only files) are laid out into a loop image file sized by the
+sizing model. The image is checked with fsck.vfat, and its files are
+copied out with mtools and compared to pycdlib's extraction of the ISO.
+Needs dosfstools and mtools.
+"""
+# ruff: noqa: T201
+
+import argparse
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from check_iso_stream import extract_with_pycdlib, make_iso, same_tree, write_content
+from throttled_http_server import parse_rate
+
+from services import fat32
+from services.fat32_image import Fat32Image, ImageFile
+from services.iso9660 import IsoImage
+
+_LOCAL_FILES = {
+    "/EFI/BOOT/grub.cfg": 3000,  # Replaces the image's
+    "/install-helpers/first-boot/wingone-firstboot.service": 700,
+    "/install-helpers/ks-templates/Grüße aus einer sehr langen Vorlage.ks": 9000,
+    "/ks.cfg": 0,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--large", type=parse_rate, default=parse_rate("64MB"))
+    args = parser.parse_args()
+    missing = [tool for tool in ("fsck.vfat", "mcopy") if not shutil.which(tool)]
+    if missing:
+        sys.exit(f"Missing {', '.join(missing)}: install dosfstools and mtools")
+
+    rnd = random.Random(2)
+    iso_files = {
+        "/LiveOS/squashfs.img": args.large,
+        "/images/empty.img": 0,
+        "/EFI/BOOT/grub.cfg": 1500,
+    }
+    for i in range(args.files):
+        directory = rnd.choice(["/EFI/BOOT", "/images/pxeboot", "/isolinux", ""])
+        iso_files[f"{directory}/file_{i}.bin"] = rnd.randint(1, 300_000)
+
+    with tempfile.TemporaryDirectory(prefix="wingone_fat_") as tmp:
+        tmp_path = Path(tmp)
+        iso_path = tmp_path / "synthetic.iso"
+        make_iso(iso_path, iso_files)
+        expected = tmp_path / "expected"
+        extract_with_pycdlib(iso_path, expected)
+
+        files = [
+            ImageFile(path, str(iso_path), iso_file.extents)
+            for path, iso_file in IsoImage.parse(iso_path).files.items()
+        ]
+        for index, (path, size) in enumerate(_LOCAL_FILES.items()):
+            source = tmp_path / f"local_{index}"
+            write_content(source, size, 1_000 + index)
+            files.append(ImageFile.from_file(path, source, read_only=index == 0))
+            target = expected / path.lstrip("/")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(source.read_bytes())
+
+        tree = {f.path: f.size for f in files}
+        size = fat32.tree_volume_size(tree)
+        image = Fat32Image(files, size, "FEDORA-INST")
+        volume = tmp_path / "volume.img"
+        started = time.monotonic()
+        with volume.open("wb") as f:
+            f.truncate(size)
+            image.write(f.write)
+        elapsed = time.monotonic() - started
+        print(
+            f"{len(image.files)} files, {image.used_size} of {size} bytes "
+            f"written in {elapsed:.2f}s"
+        )
+
+        fsck = subprocess.run(
+            ["fsck.vfat", "-n", "-v", str(volume)], capture_output=True, text=True
+        )
+        print(fsck.stdout.strip().splitlines()[-1] if fsck.stdout else "")
+        if fsck.returncode:
+            print(f"fsck.vfat FAILED:\n{fsck.stdout}{fsck.stderr}")
+            sys.exit(1)
+
+        copied = tmp_path / "copied"
+        copied.mkdir()
+        subprocess.run(
+            ["mcopy", "-s", "-n", "-i", str(volume), "::/*", str(copied)],
+            check=True,
+            capture_output=True,
+        )
+        if not same_tree(expected, copied):
+            print("Contents copied out with mtools DIFFER")
+            sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
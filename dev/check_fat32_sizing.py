@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Check the FAT32 sizing model against real mkfs.vfat images.
+
+python dev/check_fat32_sizing.py [--trials 20] [--files 300] [--iso image.iso]
+                                 [--sweep 200]
+
+First, images of --sweep sizes spread over the FAT32 range the temporary
+partition uses are formatted with mkfs.vfat, and the cluster count of each
+is compared with fat32.formatted_clusters. Then for each generated file
+tree (or the tree of --iso), an image of exactly fat32.tree_volume_size is
+formatted and filled with mtools. The check fails if the tree doesn't fit,
+if mkfs.vfat made fewer clusters than the model expects, or if the files
+use more clusters than predicted.
+
+The temporary partition is sized with no margin on top of the model, so
+run this after changing it. Needs dosfstools and mtools.
+"""
+# ruff: noqa: T201
+
+import argparse
+import array
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from services import fat32
+from services.iso9660 import IsoImage
+
+_NAME_STEMS = ["BOOT", "efi", "LiveOS", "images", "squashfs", "vmlinuz", "Grüße"]
+_EXTENSIONS = ["", ".img", ".EFI", ".cfg", ".ks", ".config-file"]
+
+
+def random_tree(rng: random.Random, count: int) -> dict[str, int]:
+    """Generate *count* file paths with names and sizes of every kind."""
+    cluster = fat32.CLUSTER_SIZE
+    dirs = [""]
+    tree: dict[str, int] = {}
+    while len(tree) < count:
+        parent = rng.choice(dirs)
+        name = rng.choice(_NAME_STEMS) + str(rng.randrange(1000))
+        if rng.random() < 0.15:
+            name += "-" + "long" * rng.randrange(1, 20)  # Several LFN entries
+        if rng.random() < 0.1 and len(dirs) < count // 10:
+            dirs.append(f"{parent}/{name}_dir")  # Never a file's name
+            continue
+        size = rng.choice(
+            [
+                0,
+                1,
+                cluster,
+                cluster + 1,
+                rng.randrange(64 * 1024),
+                rng.randrange(4 * 1024 * 1024),
+            ]
+        )
+        tree[f"{parent}/{name}{rng.choice(_EXTENSIONS)}"] = size
+    return tree
+
+
+def read_layout(image: Path) -> tuple[int, int, int, int]:
+    """Get (clusters, reserved sectors, FAT sectors, sectors per cluster)."""
+    with image.open("rb") as f:
+        boot = f.read(512)
+    per_cluster = boot[0x0D]
+    reserved, fat_count = struct.unpack_from("<HB", boot, 0x0E)
+    total, fat_sectors = struct.unpack_from("<II", boot, 0x20)
+    data = total - reserved - fat_count * fat_sectors
+    return data // per_cluster, reserved, fat_sectors, per_cluster
+
+
+def used_clusters(image: Path) -> int:
+    """Count the allocated clusters in the first FAT of *image*."""
+    count, reserved, fat_sectors, _ = read_layout(image)
+    with image.open("rb") as f:
+        f.seek(reserved * fat32.SECTOR_SIZE)
+        fat = array.array("I", f.read(fat_sectors * fat32.SECTOR_SIZE))
+    return sum(1 for entry in fat[2 : count + 2] if entry & 0x0FFFFFFF)
+
+
+def format_image(image: Path, size: int) -> int:
+    """Format a new image of *size* bytes with mkfs.vfat; get its cluster count."""
+    image.unlink(missing_ok=True)
+    with image.open("wb") as f:
+        f.truncate(size)
+    subprocess.run(
+        [
+            "mkfs.vfat",
+            "-F",
+            "32",
+            "-S",
+            str(fat32.SECTOR_SIZE),
+            "-s",
+            str(fat32.CLUSTER_SIZE // fat32.SECTOR_SIZE),
+            "-n",
+            "WINGONE",
+            str(image),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    made, *_ = read_layout(image)
+    return made
+
+
+def check_formatted_clusters(sizes: list[int], work_dir: Path) -> int:
+    """
+    Compare the clusters mkfs.vfat makes with formatted_clusters.
+
+    Returns:
+        How many sizes get more clusters than the model expects (which is
+        safe, but means the model is not exact)
+    """
+    more = 0
+    for size in sizes:
+        made = format_image(work_dir / "volume.img", size)
+        expected = fat32.formatted_clusters(size // fat32.SECTOR_SIZE)
+        if made < expected:
+            msg = f"{size} bytes: mkfs.vfat made {made} clusters, model {expected}"
+            raise AssertionError(msg)
+        if made > expected:
+            more += 1
+            print(f"{size} bytes: mkfs.vfat made {made} clusters, model {expected}")
+    return more
+
+
+def check_tree(tree: dict[str, int], work_dir: Path) -> tuple[int, int]:
+    """
+    Fill an image of the predicted size with *tree*.
+
+    Returns:
+        (predicted clusters, clusters actually used)
+    """
+    predicted = fat32.tree_clusters(tree)
+    size = fat32.tree_volume_size(tree)
+    image = work_dir / "volume.img"
+    made = format_image(image, size)
+    if made < predicted:
+        msg = f"mkfs.vfat made {made} clusters, the tree needs {predicted}"
+        raise AssertionError(msg)
+
+    content = work_dir / "content"
+    shutil.rmtree(content, ignore_errors=True)
+    for path, file_size in tree.items():
+        target = content / path.lstrip("/")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with target.open("wb") as f:
+            f.truncate(file_size)  # Sparse, mcopy reads zeros
+    for entry in sorted(content.iterdir()):
+        result = subprocess.run(
+            ["mcopy", "-s", "-i", str(image), str(entry), "::/"],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            msg = f"Tree doesn't fit in {size} bytes: {result.stderr.strip()}"
+            raise AssertionError(msg)
+
+    used = used_clusters(image)
+    if used > predicted:
+        msg = f"Files use {used} clusters, {predicted} were predicted"
+        raise AssertionError(msg)
+    return predicted, used
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iso", type=Path, help="Check the tree of this image")
+    parser.add_argument("--sweep", type=int, default=200, help="Sizes to format")
+    args = parser.parse_args()
+    missing = [tool for tool in ("mkfs.vfat", "mcopy") if not shutil.which(tool)]
+    if missing:
+        sys.exit(f"Missing {', '.join(missing)}: install dosfstools and mtools")
+
+    if args.iso:
+        image = IsoImage.parse(args.iso)
+        trees = [{path: f.size for path, f in image.files.items()}]
+    else:
+        rng = random.Random(args.seed)
+        trees = [random_tree(rng, args.files) for _ in range(args.trials)]
+
+    # From the smallest FAT32 volume to 64 GiB
+    sweep_rng = random.Random(args.seed)
+    smallest = fat32.volume_size(0)
+    sizes = [smallest, smallest + fat32.SECTOR_SIZE]
+    sizes += [
+        sweep_rng.randrange(smallest, 64 * 1024**3)
+        // fat32.SECTOR_SIZE
+        * fat32.SECTOR_SIZE
+        for _ in range(args.sweep)
+    ]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        more = check_formatted_clusters(sizes, Path(work_dir))
+        print(f"{len(sizes)} sizes formatted, {more} with more clusters than expected")
+        for i, tree in enumerate(trees):
+            predicted, used = check_tree(tree, Path(work_dir))
+            spare = (predicted - used) * fat32.CLUSTER_SIZE
+            print(
+                f"tree {i}: {len(tree)} files, {predicted} clusters predicted, "
+                f"{used} used ({spare} bytes to spare)"
+            )
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Check streaming ISO extraction against pycdlib on synthetic images.
+
+python dev/check_iso_stream.py [--files 200] [--large 64MB]
+"""
+# ruff: noqa: T201
+
+import argparse
+import filecmp
+import hashlib
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from pycdlib.pycdlib import PyCdlib
+from throttled_http_server import parse_rate
+
+from services.iso9660 import extract_stream
+
+
+def make_iso(path: Path, files: dict[str, int], seed: int = 0) -> None:
+    """
+    Write a Joliet + Rock Ridge image with generated content to *path*.
+
+    File contents are generated on disk next to *path* first, so
+    multi-gigabyte images don't have to fit in memory.
+
+    Args:
+        path: Image file to create
+        files: Joliet path (e.g. ``/LiveOS/squashfs.img``) -> size in bytes
+        seed: Seed of the generated content
+    """
+    iso = PyCdlib()
+    iso.new(joliet=3, rock_ridge="1.09")
+    # Joliet directory -> ISO9660 (8.3) directory
+    iso_dirs = {"/": ""}
+    with tempfile.TemporaryDirectory(dir=path.parent) as content_dir:
+        for index, (joliet_path, size) in enumerate(sorted(files.items())):
+            parts = joliet_path.strip("/").split("/")
+            for depth in range(1, len(parts)):
+                directory = "/" + "/".join(parts[:depth])
+                if directory not in iso_dirs:
+                    parent = iso_dirs["/" + "/".join(parts[: depth - 1])]
+                    iso_dirs[directory] = f"{parent}/D{len(iso_dirs)}"
+                    iso.add_directory(
+                        iso_dirs[directory],
+                        rr_name=parts[depth - 1],
+                        joliet_path=directory,
+                    )
+            content = Path(content_dir) / str(index)
+            write_content(content, size, seed * 100_000 + index)
+            iso.add_file(
+                str(content),
+                f"{iso_dirs['/' + '/'.join(parts[:-1])]}/F{index}.;1",
+                rr_name=parts[-1],
+                joliet_path=joliet_path,
+            )
+        iso.write(str(path))
+        iso.close()
+
+
+def write_content(path: Path, size: int, seed: int) -> None:
+    """Write *size* bytes unique to *seed* (fast, not random) to *path*."""
+    block = hashlib.sha256(seed.to_bytes(8, "little")).digest() * (64 * 1024 // 32)
+    with path.open("wb") as f:
+        counter = 0
+        while size > 0:
+            data = counter.to_bytes(8, "little") + block[8 : min(len(block), size)]
+            f.write(data[:size])
+            size -= len(data)
+            counter += 1
+
+
+def extract_with_pycdlib(iso_path: Path, target: Path) -> None:
+    iso = PyCdlib()
+    iso.open(str(iso_path))
+    try:
+        for parent, _, files in iso.walk(joliet_path="/"):
+            local_dir = target / parent.lstrip("/")
+            local_dir.mkdir(parents=True, exist_ok=True)
+            for name in files:
+                iso.get_file_from_iso(
+                    local_path=str(local_dir / name),
+                    joliet_path=f"{parent.rstrip('/')}/{name}",
+                )
+    finally:
+        iso.close()
+
+
+def same_tree(a: Path, b: Path) -> bool:
+    files_a = sorted(p.relative_to(a) for p in a.rglob("*") if p.is_file())
+    files_b = sorted(p.relative_to(b) for p in b.rglob("*") if p.is_file())
+    return files_a == files_b and all(
+        filecmp.cmp(a / rel, b / rel, shallow=False) for rel in files_a
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--large", type=parse_rate, default=parse_rate("64MB"))
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    files = {"/LiveOS/squashfs.img": args.large, "/images/empty.img": 0}
+    for i in range(args.files):
+        directory = rnd.choice(["/EFI/BOOT", "/images/pxeboot", "/isolinux", ""])
+        files[f"{directory}/file_{i}.bin"] = rnd.randint(1, 300_000)
+
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="wingone_iso_") as tmp:
+        iso_path = Path(tmp) / "synthetic.iso"
+        make_iso(iso_path, files)
+        reference = Path(tmp) / "reference"
+        extract_with_pycdlib(iso_path, reference)
+        data = iso_path.read_bytes()
+
+        for chunk_size in (512, 65536, 1024 * 1024, len(data)):
+            target = Path(tmp) / f"stream_{chunk_size}"
+            chunks = (data[i : i + chunk_size] for i in range(0, len(data), chunk_size))
+            extract_stream(chunks, target)
+            ok = same_tree(reference, target)
+            failed |= not ok
+            print(f"chunk {chunk_size:>10}: {'identical' if ok else 'DIFFERENT'}")
+
+        target = Path(tmp) / "filtered"
+        extract_stream(iter([data]), target, lambda p: p.startswith("/LiveOS/"))
+        ok = [p.name for p in target.rglob("*") if p.is_file()] == ["squashfs.img"]
+        failed |= not ok
+        print(f"filter /LiveOS/: {'ok' if ok else 'WRONG FILES'}")
+
+        try:
+            extract_stream(iter([data[: len(data) // 2]]), Path(tmp) / "truncated")
+            print("truncated image: NOT DETECTED")
+            failed = True
+        except ValueError as e:
+            print(f"truncated image: detected ({e})")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Add release ISOs to the ISO index seed table bundled with the app.
+
+python dev/make_iso_index_seed.py Fedora-KDE-Live-x86_64-43-1.6.iso ...
+
+Each image is hashed and parsed; its file list and the SHA256 of its
+LiveOS/squashfs.img (if any) are merged into src/resources/iso_index_seed.json,
+so installs of those releases can be sized, and their live image fetched by
+ranges, without downloading anything first.
+"""
+# ruff: noqa: T201
+
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models.downloadable_file import LIVE_SQUASHFS_PATH
+from services.iso9660 import IsoImage
+from services.iso_index import SEED_FILE_PATH, IsoIndex
+
+
+def sha256_of(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while data := f.read(8 * 1024 * 1024):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", type=Path, nargs="+")
+    parser.add_argument("--seed", type=Path, default=SEED_FILE_PATH)
+    args = parser.parse_args()
+
+    seed = IsoIndex(args.seed)
+    for path in args.images:
+        sha256 = sha256_of(path)
+        image = IsoImage.parse(path)
+        seed.add(sha256, image.files)
+        line = f"{path.name}: {sha256}, {len(image.files)} files"
+        if image.get(LIVE_SQUASHFS_PATH):
+            seed.record_file_hash(
+                sha256, LIVE_SQUASHFS_PATH, image.hash_file(LIVE_SQUASHFS_PATH)
+            )
+            line += ", squashfs hash recorded"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Run the whole installation on a loopback disk image and time its stages.
+
+python dev/run_pipeline.py [--iso some.iso | --iso-size 512MB] [--rate 50MB]
+                           [--stream | --image] [--work-dir DIR]
+
+The Windows system disk is a sparse GPT disk image (see
+services.storage_loopback), the ISO is served by a local throttled HTTP
+server, and InstallationService runs end to end: download, partitioning,
+extraction, EFI copy and boot entry. The stage wall times are logged at the
+end, and remembered in the work directory like on Windows, so repeated runs
+in the same --work-dir also check the duration estimates.
+Needs util-linux (sfdisk), mtools, and pycdlib unless --iso is given.
+"""
+# ruff: noqa: T201
+
+import argparse
+import dataclasses
+import hashlib
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from check_iso_stream import make_iso
+from throttled_http_server import ThrottledServer, parse_rate
+
+import models  # noqa: F401 - imports core.settings in the order the app does
+from core.settings import ConfigManager, PathConfig, set_config
+from models.installation_context import InstallationContext, InstallationPaths
+from models.kickstart import KickstartConfig, PartitioningConfig
+from models.partition import PartitioningMethod, PartitioningOptions
+from models.spin import Spin
+from services.installation_service import (
+    InstallationService,
+    predict_tmp_partition_size,
+)
+from services.storage import set_storage_backend
+from services.storage_loopback import LoopbackStorage
+
+# Layout of a typical Fedora installer ISO, scaled by --iso-size
+_ISO_LAYOUT = {
+    "/images/install.img": 0.8,
+    "/images/pxeboot/vmlinuz": 0.03,
+    "/images/pxeboot/initrd.img": 0.15,
+    "/EFI/BOOT/BOOTX64.EFI": 0.002,
+    "/EFI/BOOT/grubx64.efi": 0.005,
+    "/EFI/BOOT/mmx64.efi": 0.002,
+    "/EFI/BOOT/grub.cfg": 0.00001,
+    "/EFI/BOOT/fonts/unicode.pf2": 0.005,
+}
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run(args: argparse.Namespace, work_dir: Path) -> bool:
+    """Install the ISO onto a new loopback disk in *work_dir*."""
+    iso_path = args.iso
+    if iso_path is None:
+        iso_path = work_dir / "synthetic.iso"
+        if not iso_path.exists():
+            make_iso(
+                iso_path,
+                {
+                    path: int(args.iso_size * share)
+                    for path, share in _ISO_LAYOUT.items()
+                },
+            )
+    iso_size = iso_path.stat().st_size
+    iso_hash = sha256_file(iso_path)
+
+    config = ConfigManager()
+    config.app = dataclasses.replace(
+        config.app,
+        download_backend="asyncio",
+        mirror_race_count=0,
+        stream_iso_to_partition=args.stream,
+        write_tmp_part_image=args.image,
+    )
+    config.paths = PathConfig(work_dir_override=work_dir)
+    set_config(config)
+    set_storage_backend(LoopbackStorage.create(work_dir / "disk0.img", args.disk_size))
+
+    with ThrottledServer(iso_path, args.rate, args.latency) as server:
+        spin = Spin(
+            name="Benchmark",
+            size=iso_size,
+            hash256=iso_hash,
+            dl_link=server.url,
+        )
+        context = InstallationContext(
+            kickstart=KickstartConfig(
+                partitioning=PartitioningConfig(method=PartitioningMethod.CUSTOM)
+            ),
+            partition=PartitioningOptions(
+                tmp_part_size=predict_tmp_partition_size(spin)
+            ),
+            selected_spin=spin,
+            paths=InstallationPaths(work_dir=work_dir),
+        )
+        began = time.perf_counter()
+        result = InstallationService().install(context)
+        elapsed = time.perf_counter() - began
+
+    mode = "stream" if args.stream else "image" if args.image else "copy"
+    status = "ok" if result.success else f"FAILED: {result.error_message}"
+    print(f"{iso_size / 1e6:.0f} MB ISO, {mode} mode: {elapsed:.2f} s  {status}")
+    return result.success
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iso", type=Path, help="Install this ISO")
+    parser.add_argument("--iso-size", type=parse_rate, default=parse_rate("512MB"))
+    parser.add_argument("--rate", type=parse_rate, default=parse_rate("0"))
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--disk-size", type=parse_rate, default=parse_rate("64GB"))
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stream", action="store_true", help="Stream the ISO")
+    mode.add_argument("--image", action="store_true", help="Write a FAT32 image")
+    parser.add_argument("--work-dir", type=Path, help="Kept between runs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    if args.work_dir:
+        args.work_dir.mkdir(parents=True, exist_ok=True)
+        success = run(args, args.work_dir.resolve())
+    else:
+        with tempfile.TemporaryDirectory(prefix="wingone_pipeline_") as tmp:
+            success = run(args, Path(tmp))
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
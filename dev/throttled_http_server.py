@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Local HTTP server with per-connection bandwidth limits for download benchmarks.
+
+Serves one file with optional Range support. Each connection is throttled
+independently, which mimics a mirror whose single TCP stream tops out well
+below line rate.
+
+    python dev/throttled_http_server.py --file some.iso --rate 5MB --latency 0.05
+"""
+# ruff: noqa: T201
+
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Self
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+_UNITS = {"": 1, "K": 1000, "M": 1000**2, "G": 1000**3}
+
+
+def parse_rate(value: str) -> int:
+    """Parse a rate like ``5MB`` or ``800K`` into bytes per second (0 = unlimited)."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)B?", value.strip().upper())
+    if not match:
+        msg = f"Invalid rate: {value}"
+        raise argparse.ArgumentTypeError(msg)
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+class ThrottledServer:
+    """Serve *file_path* on localhost until stopped (usable as a context manager)."""
+
+    def __init__(
+        self,
+        file_path: Path,
+        rate: int = 0,
+        latency: float = 0.0,
+        support_ranges: bool = True,
+        port: int = 0,
+    ):
+        self.file_path = file_path
+        self.rate = rate
+        self.latency = latency
+        self.support_ranges = support_ranges
+        self.requests_served = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{self.file_path.name}"
+
+    def start(self) -> "ThrottledServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *_exc) -> None:
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # noqa: A002
+                pass
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+            def do_GET(self):
+                self._respond(send_body=True)
+
+            def _respond(self, send_body: bool):
+                server.requests_served += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                size = server.file_path.stat().st_size
+                start, end = 0, size
+                status = 200
+                match = _RANGE_RE.fullmatch(self.headers.get("Range", ""))
+                if match and server.support_ranges:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) + 1 if match.group(2) else size
+                    end = min(end, size)
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.end_headers()
+                        return
+                    status = 206
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(end - start))
+                self.send_header(
+                    "ETag", f'"{size:x}-{int(server.file_path.stat().st_mtime)}"'
+                )
+                if server.support_ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+                self.end_headers()
+                if send_body:
+                    self._send_range(start, end)
+
+            def _send_range(self, start: int, end: int):
+                block = 64 * 1024
+                began = time.monotonic()
+                sent = 0
+                with server.file_path.open("rb") as f:
+                    f.seek(start)
+                    while sent < end - start:
+                        data = f.read(min(block, end - start - sent))
+                        if not data:
+                            break
+                        try:
+                            self.wfile.write(data)
+                        except (BrokenPipeError, ConnectionResetError):
+                            return
+                        sent += len(data)
+                        if server.rate:
+                            # Sleep until this connection is back under its budget
+                            ahead = sent / server.rate - (time.monotonic() - began)
+                            if ahead > 0:
+                                time.sleep(ahead)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", type=Path, required=True, help="File to serve")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--rate", type=parse_rate, default=0, help="Per-connection limit, e.g. 5MB"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per request"
+    )
+    parser.add_argument("--no-range", action="store_true", help="Ignore Range headers")
+    args = parser.parse_args()
+
+    server = ThrottledServer(
+        args.file, args.rate, args.latency, not args.no_range, args.port
+    ).start()
+    print(f"Serving {server.url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
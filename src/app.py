@@ -51,10 +51,13 @@ class MainApp(Application):
             return self.page_manager.start()
         return None
 
-    def _on_state_change(self, change_type: str, **_kwargs) -> None:
-        """Handle state changes."""
+    def _on_state_change(self, change_type: str, **kwargs) -> None:
+        """Handle state changes (may be called from a background thread)."""
         if change_type == "error_occurred":
             self.after(0, lambda: self.page_manager.show_page(PageError))
+        elif change_type == "spins_refreshed":
+            refresh = kwargs["refresh"]
+            self.after(0, lambda: self.app_state.apply_spins_refresh(refresh))
 
     def _setup_navigation(self):
         """Configure navigation flow and register all pages."""
@@ -3,7 +3,6 @@ Application configuration management.
 Replaces the chaotic globals.py with proper configuration handling.
 """
 
-import winreg
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -26,9 +25,6 @@ class AppConfig:
     additional_failsafe_space: DataUnit = field(
         default_factory=lambda: DataUnit.from_gigabytes(2)
     )
-    temp_part_failsafe_space: DataUnit = field(
-        default_factory=lambda: DataUnit.from_gigabytes(0.15)
-    )
 
     # RAM requirements
     minimal_required_ram: DataUnit = field(
@@ -51,6 +47,23 @@ class AppConfig:
     live_iso_name: str = "live_os.iso"
     install_iso_name: str = "install_media.iso"
 
+    # Downloads
+    download_segments: int = 4  # Parallel Range connections per file
+    download_rate_limit: int = 0  # Bytes/s shared by all downloads, 0 = unlimited
+    mirror_race_count: int = 4  # Mirrors raced per download, 0 = use dl_link as is
+    mirror_min_speed: int = 256 * 1024  # Bytes/s below which we fail over
+    download_progress_interval: float = 0.1  # Seconds between progress updates
+    download_backend: str = "requers"  # "requers" or the pure-Python "asyncio"
+    iso_store_budget: int = 20 * 1024**3  # Bytes of images kept, 0 = unlimited
+    # Extract images onto the temporary partition while they download,
+    # without keeping a copy in work_dir
+    stream_iso_to_partition: bool = False
+    # Write the temporary partition as one FAT32 image built in userspace,
+    # instead of copying the files onto the mounted volume. Keep off until
+    # dev/check_fat32_image.py has passed (it needs fsck.vfat and mtools)
+    write_tmp_part_image: bool = False
+    extract_workers: int = 0  # Files written at once, 0 = by target drive type
+
     @property
     def live_img_url(self) -> str:
         return f"file:///run/install/repo/{self.live_img_path}"
@@ -63,6 +76,8 @@ class UrlConfig:
     fedora_geo_ip: str = "https://geoip.fedoraproject.org/city"
     fedora_torrent_download: str = "https://torrent.fedoraproject.org"
     available_spins_list: str = "https://fedoraproject.org/releases.json"
+    fedora_metalink: str = "https://mirrors.fedoraproject.org/metalink"
+    fedora_mirrorlist: str = "https://mirrors.fedoraproject.org/mirrorlist"
 
     # Specific package URLs
 
@@ -71,6 +86,9 @@ class UrlConfig:
 class PathConfig:
     """File and directory paths."""
 
+    # Replaces the work directory in Downloads (dry runs, benchmarks)
+    work_dir_override: Path | None = None
+
     @property
     def current_dir(self) -> Path:
         return Path(__file__).parent.parent
@@ -81,6 +99,8 @@ class PathConfig:
 
     @property
     def work_dir(self) -> Path:
+        if self.work_dir_override is not None:
+            return self.work_dir_override
         return self.downloads_dir / "WinGone Downloads"
 
     @property
@@ -115,6 +135,8 @@ class PathConfig:
     def _get_user_downloads_folder() -> Path:
         """Get the user's Downloads folder from Windows registry."""
         try:
+            import winreg
+
             with winreg.OpenKey(
                 winreg.HKEY_CURRENT_USER,
                 r"SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer\Shell Folders",
@@ -123,7 +145,7 @@ class PathConfig:
                     key, "{374DE290-123F-4565-9164-39C4925E467B}"
                 )[0]
                 return Path(downloads_dir)
-        except (OSError, FileNotFoundError):
+        except (ImportError, OSError):
             # Fallback to user's home directory
             return Path.home() / "Downloads"
 
@@ -17,13 +17,10 @@ from models.kickstart import KickstartConfig
 from models.partition import PartitioningOptions
 from models.spin import Spin
 from models.types import IPLocaleInfo
-from services.disk import (
-    Partition,
-    get_efi_partition,
-    get_windows_partition,
-)
+from services.disk import Partition
 from services.download import fetch_json
 from services.privilege_manager import elevated
+from services.storage import get_efi_partition, get_windows_partition
 
 
 class InstallerStatus(Enum):
@@ -38,6 +35,15 @@ class InstallerStatus(Enum):
     FAILED = "failed"
 
 
+@dataclass(frozen=True)
+class SpinsRefresh:
+    """Newer spins data, parsed off the UI thread."""
+
+    raw_spins_data: list[dict]
+    all_spins: list[Spin]
+    latest_version: str
+
+
 @dataclass
 class SpinState:
     """State related to spin version selection."""
@@ -52,6 +58,9 @@ class SpinState:
     _accepted_spins: list[Spin] = field(default_factory=list)
     _all_spins: list[Spin] = field(default_factory=list)
     _live_os_installer_spin: Spin | None = None
+    # Called from the revalidation thread with newer spins data, which the
+    # UI thread then puts in place with apply_refresh
+    on_refresh: Callable[[SpinsRefresh], None] | None = None
 
     @property
     def latest_version(self) -> str:
@@ -98,7 +107,7 @@ class SpinState:
                 self._raw_spins_data = offline_data.get_fallback_offline_spin_data()
             else:
                 url = get_config().urls.available_spins_list
-                data = fetch_json(url)
+                data = fetch_json(url, on_update=self.refresh_spins_info)
                 self._raw_spins_data = data
             parsed_spins, latest_version = parse_spins(self._raw_spins_data)
             self._latest_version = latest_version
@@ -107,23 +116,58 @@ class SpinState:
             msg = f"Failed to fetch spins: {e}"
             logging.exception(msg)
 
+    def refresh_spins_info(self, data: list[dict]) -> None:
+        """
+        Parse newer spins data (e.g. from revalidation) and pass it on.
+
+        This runs on the revalidation thread, so the current data is left
+        alone: on_refresh hands the parsed data to the UI thread, which
+        puts it in place with apply_refresh.
+        """
+        from services.spin_manager import parse_spins
+
+        try:
+            parsed_spins, latest_version = parse_spins(data)
+        except Exception:
+            logging.exception("Failed to parse refreshed spins data")
+            return
+        if self.on_refresh:
+            self.on_refresh(SpinsRefresh(data, parsed_spins, latest_version))
+
+    def apply_refresh(self, refresh: SpinsRefresh) -> None:
+        """Replace the spins data with newer data (on the UI thread)."""
+        accepted_spins, installer_spin = self._pick_accepted_spins(
+            refresh.all_spins, refresh.latest_version
+        )
+        self._raw_spins_data = refresh.raw_spins_data
+        self._latest_version = refresh.latest_version
+        self._all_spins = refresh.all_spins
+        self._live_os_installer_spin = installer_spin
+        self._accepted_spins = accepted_spins if installer_spin else []
+
     def set_accepted_spins(self, version: str | None = None):
         """Set accepted spins based on version."""
+        spins, installer_spin = self._pick_accepted_spins(
+            self.all_spins, self.latest_version, version
+        )
+        if installer_spin:
+            self._live_os_installer_spin = installer_spin
+            self._accepted_spins = spins
+
+    def _pick_accepted_spins(
+        self, all_spins: list[Spin], latest_version: str, version: str | None = None
+    ) -> tuple[list[Spin], Spin | None]:
+        """Get the spins of a version, and its netinstall spin if there is one."""
         if version is None:
             if self.is_using_untested:
-                version = self.latest_version
+                version = latest_version
             else:
                 version = self.supported_version
-        spins = [spin for spin in self.all_spins if spin.version == version]
+        spins = [spin for spin in all_spins if spin.version == version]
         for spin in spins:
             if spin.is_base_netinstall:
-                self._live_os_installer_spin = spin
-                break
-        if self._live_os_installer_spin:
-            self._accepted_spins = spins
-        else:
-            # strip liveos images if no netinstall found
-            spins = [spin for spin in spins if not spin.is_live_img]
+                return spins, spin
+        return spins, None
 
 
 @dataclass
@@ -150,7 +194,10 @@ class CompatibilityState:
 
     def update_ip_locale(self):
         url = get_config().urls.fedora_geo_ip
-        data = fetch_json(url)
+        data = fetch_json(url, on_update=self._set_ip_locale)
+        self._set_ip_locale(data)
+
+    def _set_ip_locale(self, data: dict) -> None:
         self._ip_locale = IPLocaleInfo(
             country_code=data["country_code"], time_zone=data["time_zone"]
         )
@@ -250,6 +297,7 @@ class ApplicationState:
         supported_version = get_config().app.supported_version
         self.compatibility = CompatibilityState(use_dummy=use_dummy)
         self.spins = SpinState(supported_version=supported_version, use_dummy=use_dummy)
+        self.spins.on_refresh = self._on_spins_refreshed
 
     def add_observer(self, observer: Callable) -> None:
         """Add an observer to be notified of state changes."""
@@ -269,6 +317,28 @@ class ApplicationState:
             except Exception as e:
                 logging.error(f"Error in observer: {e}")
 
+    def _on_spins_refreshed(self, refresh: SpinsRefresh) -> None:
+        """Pass newer spins data from the revalidation thread to observers."""
+        self.notify_observers("spins_refreshed", refresh=refresh)
+
+    def apply_spins_refresh(self, refresh: SpinsRefresh) -> None:
+        """
+        Replace the spins data with newer data, keeping the selected spin current.
+
+        Must run on the UI thread, since the pages read the spins data there.
+        """
+        self.spins.apply_refresh(refresh)
+        selected = self.installation.selected_spin
+        if selected is not None:
+            for spin in self.spins.accepted_spins:
+                if (spin.name, spin.full_version) == (
+                    selected.name,
+                    selected.full_version,
+                ):
+                    self.set_selected_spin(spin)
+                    break
+        self.notify_observers("spins_updated")
+
     def update_installer_status(self, status: InstallerStatus) -> None:
         """Update the installer status and notify observers."""
         old_status = self.installation.status
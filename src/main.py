@@ -29,6 +29,7 @@ import multilingual
 from app import MainApp
 from core.settings import get_config
 from core.state import get_state
+from services.hash_cache import get_hash_cache
 from services.system import get_windows_ui_locale, is_admin
 from utils.logging import setup_file_logging
 
@@ -43,9 +44,46 @@ def parse_arguments():
         "--app_version",
         type=str,
     )
+    parser.add_argument(
+        "--reverify",
+        action="store_true",
+        help="Fully rehash existing downloads instead of trusting the hash cache",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Install without touching disks or firmware and report stage timings",
+    )
+    parser.add_argument(
+        "--dry-run-spin", type=str, help="Spin to dry-run (default: the default one)"
+    )
+    parser.add_argument(
+        "--dry-run-version",
+        type=str,
+        help="Fedora version to take the spin from (default: the supported one)",
+    )
+    parser.add_argument(
+        "--dry-run-report", type=Path, help="Where to write the dry run report"
+    )
     return parser.parse_args()
 
 
+def run_dry_run(args) -> bool:
+    """
+    Run a hardware-free installation instead of the app.
+
+    Returns:
+        Whether the installation succeeded
+    """
+    from services import dry_run
+
+    config = get_config()
+    setup_file_logging(config.paths.work_dir / "wingone_dry_run.log")
+    return dry_run.run_dry_run(
+        args.dry_run_spin, args.dry_run_version, args.dry_run_report
+    )
+
+
 def set_skip_check(skip: bool):
     state = get_state()
     state.compatibility.skip_check = skip
@@ -79,6 +117,10 @@ def run():
         if args.app_version:
             config.update_version(args.app_version)
 
+        if args.reverify:
+            get_hash_cache().reverify = True
+            logging.info("Reverify requested - ignoring cached download hashes")
+
         # Log application startup
         logging.info(f"APP STARTING: {config.app.name} v{config.app.version}")
 
@@ -104,6 +146,9 @@ def run():
 if __name__ == "__main__":
     args = parse_arguments()
 
+    if args.dry_run:
+        raise SystemExit(0 if run_dry_run(args) else 1)
+
     # Auto-detect release mode for PyInstaller builds
 
     if args.release or get_state().is_release_mode:
@@ -9,6 +9,9 @@ from pathlib import Path
 
 from .spin import Spin
 
+# The live image's root filesystem, the only file of a live ISO installed
+LIVE_SQUASHFS_PATH = "/LiveOS/squashfs.img"
+
 
 @dataclass
 class DownloadableFile:
@@ -20,6 +23,13 @@ class DownloadableFile:
     expected_hash: str
     size_bytes: int
     _file_name: str | None = field(default=None)
+    # SHA256 computed while downloading, so later checks needn't re-read the file
+    verified_hash: str | None = field(default=None)
+    # The only file of the image the installation needs (e.g.
+    # "/LiveOS/squashfs.img"), which may be fetched without the rest
+    needed_file: str | None = field(default=None)
+    # Where needed_file was saved, if it was fetched on its own
+    needed_file_path: Path | None = field(default=None)
 
     @property
     def file_name(self) -> str:
@@ -43,6 +53,14 @@ class DownloadableFile:
         """Get the full path where this file will be saved."""
         return self.destination_dir / self.file_name
 
+    @property
+    def needed_file_local_path(self) -> Path | None:
+        """Get where needed_file is saved when fetched without the image."""
+        if self.needed_file is None:
+            return None
+        name = self.needed_file.rsplit("/", 1)[-1]
+        return self.destination_dir / f"{Path(self.file_name).stem}.{name}"
+
     def set_file_name(self, name: str) -> None:
         """Set a custom filename."""
         self._file_name = self._sanitize_filename(name)
@@ -95,6 +113,7 @@ class DownloadableFile:
         file_hint: str,
         destination_dir: Path,
         file_name: str | None = None,
+        needed_file: str | None = None,
     ) -> "DownloadableFile":
         """Create a DownloadableFile from a Spin object."""
         return cls(
@@ -104,4 +123,5 @@ class DownloadableFile:
             expected_hash=spin.hash256,
             size_bytes=spin.size,
             _file_name=file_name,  # If provided, use it; otherwise compute lazily
+            needed_file=needed_file,
         )
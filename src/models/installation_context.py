@@ -13,7 +13,7 @@ from core.state import ApplicationState
 from services.disk import Partition
 from services.partition import PartitioningResult
 
-from .downloadable_file import DownloadableFile
+from .downloadable_file import LIVE_SQUASHFS_PATH, DownloadableFile
 from .kickstart import KickstartConfig
 from .partition import PartitioningOptions
 from .spin import Spin
@@ -70,8 +70,10 @@ class InstallationContext:
     current_file_index: int = 0
     tmp_part_already_created: bool = False
     partitioning_result: PartitioningResult | None = None
+    # Size of every file on the temporary partition, once they are copied
+    tmp_part_manifest: dict[str, int] = field(default_factory=dict)
 
-    # Progress tracking
+    # Progress tracking (updated by the installation service while downloading)
     total_download_size: int = 0
     downloaded_size: int = 0
 
@@ -81,7 +83,12 @@ class InstallationContext:
         self._calculate_total_size()
 
     def _prepare_download_files(self) -> None:
-        """Prepare the list of files that need to be downloaded."""
+        """
+        Prepare the list of files that need to be downloaded.
+
+        Files are listed in the order the installation needs them; downloads
+        run concurrently and the first file gets the largest bandwidth share.
+        """
         self.downloadable_files.clear()
 
         if self.selected_spin.is_live_img and self.live_os_installer_spin:
@@ -93,10 +100,12 @@ class InstallationContext:
             )
             self.downloadable_files.append(installer_file)
 
+            # Only its LiveOS image is used, the installer ISO has the rest
             live_file = DownloadableFile.from_spin(
                 self.selected_spin,
                 file_hint="live_img_iso",
                 destination_dir=self.paths.work_dir,
+                needed_file=LIVE_SQUASHFS_PATH,
             )
             self.downloadable_files.append(live_file)
         else:
@@ -116,16 +125,26 @@ class InstallationContext:
 
     def get_installer_iso_path(self) -> Path | None:
         """Get the path to the installer ISO."""
+        installer_file = self.get_installer_file()
+        return installer_file.full_path if installer_file else None
+
+    def get_installer_file(self) -> DownloadableFile | None:
+        """Get the installer ISO's download."""
         for file in self.downloadable_files:
             if file.file_hint == "installer_iso":
-                return file.full_path
+                return file
         return None
 
     def get_live_iso_path(self) -> Path | None:
         """Get the path to the live ISO."""
+        live_file = self.get_live_file()
+        return live_file.full_path if live_file else None
+
+    def get_live_file(self) -> DownloadableFile | None:
+        """Get the live ISO's download."""
         for file in self.downloadable_files:
             if file.file_hint == "live_img_iso":
-                return file.full_path
+                return file
         return None
 
     def is_live_image_installation(self) -> bool:
@@ -17,6 +17,7 @@ class Page1(Page):
         self.distro_var = tk.StringVar(self)
         self.still_loading_label = None
         self.latest_label = None
+        self.state.add_observer(self._on_state_change)
 
     def init_page(self):
         self.set_page_title(_("desktop.question"))
@@ -178,10 +179,11 @@ class Page1(Page):
             self.state.set_selected_spin(selected_spin)
 
             # Calculate and update partition size
-            total_size_bytes = selected_spin.size
+            from services.installation_service import predict_tmp_partition_size
 
-            if selected_spin.is_live_img and self.state.spins.live_os_installer_spin:
-                total_size_bytes += self.state.spins.live_os_installer_spin.size
+            partition_size_bytes = predict_tmp_partition_size(
+                selected_spin, self.state.spins.live_os_installer_spin
+            )
 
             # Create partition if it doesn't exist and update size
             if self.state.installation.partition is None:
@@ -189,9 +191,6 @@ class Page1(Page):
 
                 self.state.installation.partition = PartitioningOptions()
 
-            partition_size_bytes = (
-                total_size_bytes + self.app_config.app.temp_part_failsafe_space.bytes
-            )
             self.state.installation.partition.tmp_part_size = int(partition_size_bytes)
 
             # Log the selection
@@ -223,6 +222,21 @@ class Page1(Page):
                 self.still_loading_label = None
             self.finish_init_page()
 
+    def _on_state_change(self, change_type: str, **_kwargs) -> None:
+        """Handle state changes (may be called from a background thread)."""
+        if change_type == "spins_updated":
+            self.after(0, self._on_spins_updated)
+
+    def _on_spins_updated(self):
+        """Rebuild the spin list from refreshed spins data, keeping the selection."""
+        if not self.initiated or self.still_loading_label is not None:
+            return  # _wait_spin_loading will pick the new data up
+        if self._get_selected_spin_index() is None:
+            self.distro_var.set("")
+        for widget in self.winfo_children():
+            widget.destroy()
+        self.finish_init_page()
+
     def _on_use_latest(self, _):
         """Handle clicking the use latest label."""
         self.state.spins.is_using_untested = True
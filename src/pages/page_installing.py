@@ -14,6 +14,8 @@ from multilingual import _
 from services.installation_service import InstallationService
 from utils import format_eta, format_speed
 
+_FRAME_MS = 16  # One UI frame at 60 Hz
+
 
 class PageInstalling(Page):
     def __init__(self, parent, *args, **kwargs):
@@ -22,6 +24,11 @@ class PageInstalling(Page):
         self.installation_service: InstallationService = None  # type: ignore
         self.install_job_var = tk.StringVar(parent)
         self.current_stage = InstallationStage.INITIALIZING
+        # index -> (file name, percent, speed, eta) of each download
+        self._download_status: dict[int, tuple[str, float, float, float]] = {}
+        self._pending_download_status: dict[int, tuple[str, float, float, float]] = {}
+        self._download_repaint_scheduled = False
+        self._download_lock = threading.Lock()
 
     def _get_installation_context(self) -> InstallationContext:
         """Infer installation context."""
@@ -104,58 +111,48 @@ class PageInstalling(Page):
         self, index: int, file_name: str, percent: float, speed: float, eta: float
     ) -> None:
         """Handle download-specific progress updates (called from background thread)."""
+        # Keep only the latest status per file and repaint at most once per
+        # frame, however many downloads report in between
+        with self._download_lock:
+            self._pending_download_status[index] = (file_name, percent, speed, eta)
+            if self._download_repaint_scheduled:
+                return
+            self._download_repaint_scheduled = True
         # Schedule GUI update on main thread
-        self.after(0, self._update_download_gui, index, file_name, percent, speed, eta)
+        self.after(_FRAME_MS, self._update_download_gui)
 
-    def _update_download_gui(
-        self, index: int, file_name: str, percent: float, speed: float, eta: float
-    ) -> None:
+    def _update_download_gui(self) -> None:
         """Update download-specific GUI (called on main thread)."""
-        formatted_speed = format_speed(speed)
-        formatted_eta = format_eta(eta) if eta > 0 else "N/A"
-
-        message = (
-            f"{_('job.dl.install.media')}\n"
-            f"File {index + 1} of {len(self.installation_context.downloadable_files)}\n"
-            f"Name: {file_name}\n"
-            f"Progress: {percent:.1f}%\n"
-            f"Speed: {formatted_speed}\n"
-            f"ETA: {formatted_eta}"
-        )
-        self.install_job_var.set(message)
-        real_progress = self._real_progress(index, percent) * 0.80  # 80% for downloads
-        self.progressbar_install.set(0.1 + real_progress)
-
-    def _real_progress(self, index: int, percent: float) -> float:
-        """Calculate real progress across all files."""
-        if not self.installation_context.downloadable_files:
-            return 0.0
+        with self._download_lock:
+            self._download_status.update(self._pending_download_status)
+            self._pending_download_status.clear()
+            self._download_repaint_scheduled = False
 
         total_files = len(self.installation_context.downloadable_files)
-        if index >= total_files:
-            return 1.0
-
-        downloadable_files_sizes = [
-            df.size_bytes for df in self.installation_context.downloadable_files
+        total_speed = sum(status[2] for status in self._download_status.values())
+        lines = [
+            _("job.dl.install.media"),
+            f"Total: {self._real_progress() * 100:.1f}% ({format_speed(total_speed)})",
         ]
-
-        # Sum sizes of all previous files
-        if index == 0:
-            completed_size = 0
-        else:
-            completed_size = sum(
-                size for size in downloadable_files_sizes[:index] if size
+        for i, (name, file_percent, file_speed, file_eta) in sorted(
+            self._download_status.items()
+        ):
+            formatted_eta = format_eta(file_eta) if file_eta > 0 else "N/A"
+            lines.append(
+                f"File {i + 1} of {total_files}: {name}\n"
+                f"    {file_percent:.1f}% - {format_speed(file_speed)} - "
+                f"ETA: {formatted_eta}"
             )
-        current_file_size = downloadable_files_sizes[index] or 0
-        current_progress = (
-            (percent / 100.0) * current_file_size if current_file_size else 0
-        )
-
-        total_size = sum(size for size in downloadable_files_sizes if size)
-        if total_size == 0:
+        self.install_job_var.set("\n".join(lines))
+        # Overall progress, in which the downloads weigh by their expected time
+        self.progressbar_install.set(self.installation_context.progress_percent / 100.0)
+
+    def _real_progress(self) -> float:
+        """Calculate real progress across all files from the context's totals."""
+        context = self.installation_context
+        if not context.total_download_size:
             return 0.0
-
-        return (completed_size + current_progress) / total_size
+        return min(1.0, context.downloaded_size / context.total_download_size)
 
     def _update_gui_progress(
         self, stage: InstallationStage, percent: float, message: str
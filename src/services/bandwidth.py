@@ -0,0 +1,195 @@
+"""
+Bandwidth scheduling for concurrent downloads.
+Shares the available download bandwidth between transfers by weight, so the
+file the next installation stage needs first finishes first while the others
+keep using whatever it leaves idle.
+"""
+
+import threading
+import time
+
+REBALANCE_INTERVAL = 0.5  # seconds between rate reallocations
+_BURST_SECONDS = 0.25  # Token bucket depth, in seconds of the allotted rate
+_MAX_SLEEP = 0.25  # Re-check rates and cancellation at least this often
+_DEMAND_HEADROOM = 1.5  # Let each transfer grow this much per interval
+_MIN_DEMAND_SHARE = 0.05  # Idle transfers still ask for 5% of capacity
+_CAPACITY_DECAY = 0.98  # Per interval, so a slower link is noticed eventually
+
+
+class TransferCancelledError(RuntimeError):
+    """Raised from a transfer's throttle point once the scheduler is cancelled."""
+
+
+class Transfer:
+    """One transfer's share of a BandwidthScheduler."""
+
+    def __init__(self, scheduler: "BandwidthScheduler", name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.rate = 0.0  # Allotted bytes/s, 0 = unthrottled
+        self._scheduler = scheduler
+        self._allowance = 0.0
+        self._last_refill = time.monotonic()
+        self._window_bytes = 0
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes: int) -> None:
+        """
+        Account for *nbytes* received, blocking while over the allotted rate.
+
+        Raises:
+            TransferCancelledError: If the scheduler was cancelled
+        """
+        self.record(nbytes)
+        while True:
+            if self._scheduler.cancelled:
+                msg = f"Download of {self.name} was cancelled"
+                raise TransferCancelledError(msg)
+            with self._lock:
+                now = time.monotonic()
+                if self.rate <= 0:
+                    self._allowance = 0.0
+                    self._last_refill = now
+                    return
+                self._allowance = min(
+                    self._allowance + (now - self._last_refill) * self.rate,
+                    self.rate * _BURST_SECONDS,
+                )
+                self._last_refill = now
+                if self._allowance >= 0:
+                    return
+                wait = -self._allowance / self.rate
+            time.sleep(min(wait, _MAX_SLEEP))
+
+    def record(self, nbytes: int) -> None:
+        """Account for *nbytes* received by a stream that can't be throttled."""
+        with self._lock:
+            self._window_bytes += nbytes
+            if self.rate > 0:
+                self._allowance -= nbytes
+        self._scheduler.rebalance()
+
+    def close(self) -> None:
+        """Release this transfer's share to the others."""
+        self._scheduler.unregister(self)
+
+    def take_window(self) -> int:
+        """Get the bytes received since the last call and reset the count."""
+        with self._lock:
+            nbytes, self._window_bytes = self._window_bytes, 0
+        return nbytes
+
+
+class BandwidthScheduler:
+    """
+    Weighted sharing of download bandwidth between concurrent transfers.
+
+    Capacity is the configured rate limit, or otherwise the peak aggregate
+    throughput seen so far. Every interval it is split by weighted max-min
+    fairness over each transfer's recent demand: a transfer that can't use
+    its share (e.g. a slow mirror) leaves the rest to the others. Without a
+    rate limit the highest-weight transfer is never throttled, so it can
+    probe for more bandwidth; the others are capped at their allocation.
+    """
+
+    def __init__(self, rate_limit: int = 0):
+        """
+        Args:
+            rate_limit: Total bytes/s shared by all transfers, 0 for unlimited
+        """
+        self.rate_limit = rate_limit
+        self._transfers: list[Transfer] = []
+        self._capacity = float(rate_limit)
+        self._last_rebalance = time.monotonic()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def register(self, name: str, weight: float = 1.0) -> Transfer:
+        """
+        Add a transfer competing for bandwidth.
+
+        Args:
+            name: Name used in log and error messages
+            weight: Relative share when bandwidth is contended
+
+        Returns:
+            The transfer's handle; call ``close`` once it's done
+        """
+        transfer = Transfer(self, name, weight)
+        with self._lock:
+            self._transfers.append(transfer)
+            self._allocate(self._transfers, None)
+        return transfer
+
+    def unregister(self, transfer: Transfer) -> None:
+        """Remove a finished transfer."""
+        with self._lock:
+            if transfer in self._transfers:
+                self._transfers.remove(transfer)
+                transfer.rate = 0.0
+                self._allocate(self._transfers, None)
+
+    def cancel(self) -> None:
+        """Make every throttled transfer fail at its next throttle point."""
+        self._cancelled.set()
+
+    def rebalance(self) -> None:
+        """Reallocate rates from recent throughput, at most once per interval."""
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._last_rebalance
+            if elapsed < REBALANCE_INTERVAL:
+                return
+            self._last_rebalance = now
+            measured = {t: t.take_window() / elapsed for t in self._transfers}
+            if not self.rate_limit:
+                self._capacity = max(
+                    self._capacity * _CAPACITY_DECAY, sum(measured.values())
+                )
+            self._allocate(self._transfers, measured)
+
+    def _allocate(
+        self, transfers: list[Transfer], measured: dict[Transfer, float] | None
+    ) -> None:
+        """
+        Set each transfer's rate by weighted max-min fairness (lock held).
+
+        Without measurements (a transfer just joined or left) every transfer
+        gets its plain weighted share until the next rebalance.
+        """
+        if not transfers:
+            return
+        if not self.rate_limit and (len(transfers) == 1 or self._capacity <= 0):
+            for transfer in transfers:
+                transfer.rate = 0.0
+            return
+
+        demand = {
+            t: max(
+                measured[t] * _DEMAND_HEADROOM if measured else float("inf"),
+                self._capacity * _MIN_DEMAND_SHARE,
+            )
+            for t in transfers
+        }
+        remaining = self._capacity
+        pending = set(transfers)
+        while pending:
+            total_weight = sum(t.weight for t in pending)
+            satisfied = {
+                t for t in pending if demand[t] <= remaining * t.weight / total_weight
+            }
+            if not satisfied:
+                for t in pending:
+                    t.rate = remaining * t.weight / total_weight
+                break
+            for t in satisfied:
+                t.rate = demand[t]
+                remaining -= demand[t]
+            pending -= satisfied
+
+        if not self.rate_limit:
+            max(transfers, key=lambda t: t.weight).rate = 0.0
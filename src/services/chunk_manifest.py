@@ -0,0 +1,243 @@
+"""
+Chunk-level integrity manifests.
+Records a SHA256 per fixed-size chunk while a file downloads, so a later hash
+mismatch can be repaired by re-fetching only the damaged chunks over HTTP
+Range instead of deleting and re-downloading the whole file.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from services import segmented_download
+
+CHUNK_SIZE = 4 * 1024 * 1024
+_MANIFEST_SUFFIX = ".chunks.json"
+
+
+@dataclass
+class ChunkManifest:
+    """Per-chunk SHA256 digests of a file."""
+
+    size: int
+    chunk_size: int
+    chunks: list[str] = field(default_factory=list)
+    # True once the whole file matched its expected hash, i.e. the chunk
+    # digests describe known-good content rather than just what was received
+    verified: bool = False
+
+    def chunk_range(self, index: int) -> tuple[int, int]:
+        """Get the [start, end) byte range of chunk *index*."""
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    def save(self, filepath: Path) -> None:
+        """Write the manifest next to *filepath*."""
+        data = {
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+            "verified": self.verified,
+        }
+        try:
+            manifest_path_for(filepath).write_text(json.dumps(data), encoding="utf-8")
+        except OSError as e:
+            logging.warning(f"Could not save chunk manifest for {filepath}: {e}")
+
+    @classmethod
+    def load(cls, filepath: Path) -> "ChunkManifest | None":
+        """Load the manifest stored next to *filepath*, if any."""
+        try:
+            data = json.loads(manifest_path_for(filepath).read_text(encoding="utf-8"))
+            return cls(
+                size=data["size"],
+                chunk_size=data["chunk_size"],
+                chunks=data["chunks"],
+                verified=data.get("verified", False),
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+@dataclass
+class RepairResult:
+    """Outcome of a successful range-based repair."""
+
+    sha256: str
+    chunks_repaired: int
+    bytes_fetched: int
+    bytes_saved: int  # What a full re-download would have cost on top
+
+
+def manifest_path_for(filepath: Path) -> Path:
+    """Get the path of the chunk manifest sidecar of *filepath*."""
+    return filepath.with_name(filepath.name + _MANIFEST_SUFFIX)
+
+
+def discard_manifest(filepath: Path) -> None:
+    """Remove the chunk manifest of *filepath*, if any."""
+    with contextlib.suppress(OSError):
+        manifest_path_for(filepath).unlink()
+
+
+class ChunkRecorder:
+    """
+    Builds a ChunkManifest from data as it is written.
+
+    Each chunk is hashed in order from the first data that reaches it.
+    Overlapping feeds of the same bytes are ignored, so segment workers
+    (which see the bytes as received) and the streaming hasher (which also
+    reads back a resumed download's prefix) can both feed the same recorder:
+    whichever gets to a chunk first wins.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._done: dict[int, str] = {}
+        self._partial: dict[int, tuple[Any, int]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, offset: int, data: bytes | memoryview) -> None:
+        """Record *data* written at *offset*."""
+        view = memoryview(data)
+        while view:
+            index, chunk_offset = divmod(offset, self.chunk_size)
+            piece = view[: self.chunk_size - chunk_offset]
+            with self._lock:
+                self._update_chunk(index, chunk_offset, piece)
+            offset += len(piece)
+            view = view[len(piece) :]
+
+    def reset(self) -> None:
+        """Forget everything recorded (the file was truncated)."""
+        with self._lock:
+            self._done.clear()
+            self._partial.clear()
+
+    def finish(self, filepath: Path, size: int) -> ChunkManifest:
+        """
+        Complete the manifest for a file of *size* bytes.
+
+        Chunks that were never fed completely are read back from disk.
+        """
+        manifest = ChunkManifest(size=size, chunk_size=self.chunk_size)
+        with self._lock, filepath.open("rb") as f:
+            for index in range(-(-size // self.chunk_size)):
+                start, end = manifest.chunk_range(index)
+                digest = self._done.get(index)
+                if digest is None:
+                    partial, filled = self._partial.get(index, (None, 0))
+                    if partial is not None and filled == end - start:
+                        digest = partial.hexdigest()
+                    else:
+                        f.seek(start)
+                        digest = hashlib.sha256(f.read(end - start)).hexdigest()
+                manifest.chunks.append(digest)
+        return manifest
+
+    def _update_chunk(self, index: int, chunk_offset: int, piece: memoryview) -> None:
+        if index in self._done:
+            return
+        digest, filled = self._partial.get(index, (None, 0))
+        if digest is None:
+            if chunk_offset != 0:
+                return  # Start of the chunk is fed later (e.g. by read-back)
+            digest = hashlib.sha256()
+        if chunk_offset > filled or chunk_offset + len(piece) <= filled:
+            return  # Gap before this piece, or already recorded
+        digest.update(piece[filled - chunk_offset :])
+        filled = chunk_offset + len(piece)
+        if filled == self.chunk_size:
+            self._done[index] = digest.hexdigest()
+            self._partial.pop(index, None)
+        else:
+            self._partial[index] = (digest, filled)
+
+
+def repair_file(
+    filepath: Path, url: str, expected_hash: str, manifest: ChunkManifest
+) -> RepairResult | None:
+    """
+    Repair *filepath* by re-fetching only the chunks that differ from *manifest*.
+
+    The file is read once: each chunk is hashed and compared with the
+    manifest, damaged chunks are replaced with data fetched by HTTP Range,
+    and the full digest is built along the way.
+
+    Args:
+        filepath: File whose full hash did not match
+        url: URL the file was downloaded from
+        expected_hash: Expected SHA256 of the whole file
+        manifest: Chunk digests recorded while downloading
+
+    Returns:
+        RepairResult if the file now matches expected_hash, None if it could
+        not be repaired (caller should fall back to a full download)
+    """
+    try:
+        if filepath.stat().st_size != manifest.size:
+            return None
+    except OSError:
+        return None
+
+    full_digest = hashlib.sha256()
+    repaired = 0
+    fetched = 0
+    try:
+        with filepath.open("r+b") as f:
+            for index, chunk_hash in enumerate(manifest.chunks):
+                start, end = manifest.chunk_range(index)
+                f.seek(start)
+                data = f.read(end - start)
+                if hashlib.sha256(data).hexdigest() != chunk_hash:
+                    data = _fetch_chunk(url, start, end)
+                    if hashlib.sha256(data).hexdigest() != chunk_hash:
+                        logging.warning(
+                            f"Re-fetched chunk {index} of {filepath.name} does not "
+                            "match the manifest; cannot repair"
+                        )
+                        return None
+                    f.seek(start)
+                    f.write(data)
+                    repaired += 1
+                    fetched += len(data)
+                full_digest.update(data)
+    except (OSError, segmented_download.RangeNotSupportedError) as e:
+        logging.warning(f"Range repair of {filepath.name} failed: {e}")
+        return None
+
+    actual_hash = full_digest.hexdigest()
+    if not repaired or actual_hash != expected_hash.lower().strip():
+        # Nothing differed from the manifest (or repair didn't help): the bad
+        # bytes were recorded as received, so they can't be localised
+        return None
+
+    result = RepairResult(
+        sha256=actual_hash,
+        chunks_repaired=repaired,
+        bytes_fetched=fetched,
+        bytes_saved=manifest.size - fetched,
+    )
+    logging.info(
+        f"Repaired {filepath.name}: re-fetched {repaired} chunk(s) "
+        f"({fetched} bytes), saved {result.bytes_saved} bytes of re-download"
+    )
+    return result
+
+
+def _fetch_chunk(url: str, start: int, end: int) -> bytes:
+    """Fetch the byte range [start, end) of *url*."""
+    with segmented_download.open_url(url, start, end) as response:
+        if response.status != 206:
+            msg = f"Server ignored Range request for {url}"
+            raise segmented_download.RangeNotSupportedError(msg)
+        data = response.read()
+    if len(data) != end - start:
+        msg = f"Short read fetching bytes {start}-{end} of {url}"
+        raise OSError(msg)
+    return data
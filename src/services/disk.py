@@ -6,17 +6,18 @@ Handles ISO mounting, partition operations, drive management, etc.
 import contextlib
 import logging
 import os
-import posixpath
 import shutil
 import tempfile
-import winreg
 from collections.abc import Generator
 from dataclasses import dataclass
 from pathlib import Path
 
+from services.iso9660 import get_iso_image
 from utils import PartitionUuid, com_context
 
 _MOUNT_DIR_PREFIX = "WinGone_mount_"
+# MSFT_PhysicalDisk.MediaType values
+_MEDIA_TYPES = {3: "hdd", 4: "ssd"}
 
 
 @dataclass
@@ -63,7 +64,7 @@ class Partition:
             RuntimeError: If the partition has no volume unique ID.
             ValueError: If *mount_path* exists and is not empty.
         """
-        from services import elevated
+        from services import elevated, storage
 
         if not self.volume_unique_id:
             msg = "Volume unique ID not available for mounting"
@@ -89,12 +90,12 @@ class Partition:
                 mp.mkdir(parents=True, exist_ok=True)
                 should_delete = True
 
-        elevated.call(mount_volume_to_path, args=(self.volume_unique_id, mount_path))
+        elevated.call(storage.mount_volume, args=(self.volume_unique_id, mount_path))
         try:
             yield mount_path
         finally:
             try:
-                elevated.call(unmount_volume_from_path, args=(mount_path,))
+                elevated.call(storage.unmount_volume, args=(mount_path,))
             except Exception:
                 logging.warning("Failed to unmount %s", mount_path)
             if should_delete:
@@ -108,6 +109,8 @@ def prevent_bitlocker_auto_encrypt():
 
     Sets PreventDeviceEncryption registry key to 1 and restores the original value afterwards.
     """
+    import winreg
+
     key_path = r"SYSTEM\CurrentControlSet\Control\BitLocker"
     value_name = "PreventDeviceEncryption"
 
@@ -220,6 +223,7 @@ def new_partition(
     drive_letter: str | None = None,
     assign_drive_letter: bool = False,
     force_decrypt: bool = True,
+    allocation_unit_size: int | None = None,
 ) -> Partition:
     """
     Create a new partition on the specified disk, optionally formatting it as a volume.
@@ -232,6 +236,7 @@ def new_partition(
         drive_letter: Optional drive letter assignment
         assign_drive_letter: Whether to automatically assign a drive letter if none specified (default: False)
         force_decrypt: Whether to attempt decryption on the formatted volume (default: True)
+        allocation_unit_size: Optional cluster size in bytes to format with (default: the file system's default for the size)
 
     Returns:
         Partition object with partition information
@@ -312,6 +317,8 @@ def new_partition(
                 in_params_format.FileSystemLabel = label or ""
                 in_params_format.Full = False
                 in_params_format.Force = True
+                if allocation_unit_size:
+                    in_params_format.AllocationUnitSize = allocation_unit_size
 
                 out_params_format = target_volume.ExecMethod_(
                     "Format", in_params_format
@@ -360,97 +367,73 @@ def new_partition(
         )
 
 
-def extract_iso_to_dir(iso_path: str, target_dir: str, filter_func=None) -> str:
-    from pycdlib.pycdlib import PyCdlib
-
-    iso = PyCdlib()
-    iso.open(iso_path)
-    Path(target_dir).mkdir(parents=True, exist_ok=True)
-
-    try:
-        for parent, _, files in iso.walk(joliet_path="/"):
-            rel_path = parent.lstrip("/")
-            local_dir = Path(target_dir) / rel_path
-
-            wrote_any_file = False
-            for f in files:
-                iso_file_path = posixpath.join(parent, f)
-                local_file_path = local_dir / f
-
-                if filter_func and not filter_func(iso_file_path):
-                    continue
-
-                # Create the directory only when we actually need to write a file
-                if not wrote_any_file:
-                    local_dir.mkdir(parents=True, exist_ok=True)
-                    wrote_any_file = True
+def extract_iso_to_dir(
+    iso_path: str,
+    target_dir: str,
+    filter_func=None,
+    workers: int = 1,
+    progress_callback=None,
+    sha256: str | None = None,
+) -> str:
+    """
+    Extract the files of an ISO image into a directory.
 
-                iso.get_file_from_iso(
-                    local_path=str(local_file_path), joliet_path=iso_file_path
-                )
-    finally:
-        iso.close()
+    Args:
+        iso_path: Path to the ISO file
+        target_dir: Directory to extract into
+        filter_func: Optional function to filter which files to extract
+        workers: Number of files written concurrently
+        progress_callback: Called with (bytes extracted, total bytes)
+        sha256: Verified digest of the image, to use its indexed tree
 
+    Returns:
+        target_dir
+    """
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    get_iso_image(iso_path, sha256).extract(
+        Path(target_dir),
+        filter_func,
+        workers=workers,
+        progress_callback=progress_callback,
+    )
     return target_dir
 
 
-def get_iso_contents_size(iso_path: str, filter_func=None) -> int:
+def get_iso_contents_size(
+    iso_path: str, filter_func=None, sha256: str | None = None
+) -> int:
     """
     Get the total size of all files in an ISO image.
 
     Args:
         iso_path: Path to the ISO file
         filter_func: Optional function to filter which files to include
+        sha256: Verified digest of the image, to use its indexed tree
 
     Returns:
         Total size in bytes
     """
-    from pycdlib.pycdlib import PyCdlib
-
-    iso = PyCdlib()
-    iso.open(iso_path)
-
-    total_size = 0
-    try:
-        for parent, _, files in iso.walk(joliet_path="/"):
-            for f in files:
-                iso_file_path = posixpath.join(parent, f)
+    return get_iso_image(iso_path, sha256).contents_size(filter_func)
 
-                if filter_func and not filter_func(iso_file_path):
-                    continue
 
-                # Get file size from ISO
-                file_entry = iso.get_record(joliet_path=iso_file_path)
-                total_size += file_entry.get_data_length()
-    finally:
-        iso.close()
-
-    return total_size
-
-
-def get_file_size_in_iso(iso_path: str, file_path: str) -> int:
+def get_file_size_in_iso(
+    iso_path: str, file_path: str, sha256: str | None = None
+) -> int:
     """
     Get the size of a specific file in an ISO image.
 
     Args:
         iso_path: Path to the ISO file
         file_path: Path to the file within the ISO (starting with /)
+        sha256: Verified digest of the image, to use its indexed tree
 
     Returns:
         File size in bytes, or 0 if file not found
     """
-    from pycdlib.pycdlib import PyCdlib
-
-    iso = PyCdlib()
-    iso.open(iso_path)
-
     try:
-        file_entry = iso.get_record(joliet_path=file_path)
-        return file_entry.get_data_length()
-    except Exception:
+        return get_iso_image(iso_path, sha256).file_size(file_path)
+    except (OSError, ValueError):
         return 0
-    finally:
-        iso.close()
 
 
 def get_efi_drive_uuid() -> str:
@@ -574,6 +557,47 @@ def mount_volume_to_path(volume_unique_id: str, mount_path: str) -> None:
             raise RuntimeError(msg)
 
 
+def write_fat32_image(volume_unique_id: str, image_file: str) -> None:
+    """
+    Write a saved FAT32 image over a volume.
+
+    The volume is locked and dismounted first, and stays locked through
+    the one handle until the whole image is written, so Windows can't mount
+    a half-written file system. It mounts the new one the next time the
+    volume is used. Needs admin rights.
+
+    Args:
+        volume_unique_id: Volume unique ID (``\\\\?\\Volume{...}\\``)
+        image_file: Image saved with ``Fat32Image.save()``
+    """
+    import win32file
+    import winioctlcon
+
+    from services.fat32_image import write_saved_image
+
+    handle = win32file.CreateFile(
+        volume_unique_id.rstrip("\\"),
+        win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+        win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+        None,
+        win32file.OPEN_EXISTING,
+        0,
+        None,
+    )
+    try:
+        for control_code in (
+            winioctlcon.FSCTL_LOCK_VOLUME,
+            winioctlcon.FSCTL_DISMOUNT_VOLUME,
+            winioctlcon.FSCTL_ALLOW_EXTENDED_DASD_IO,
+        ):
+            win32file.DeviceIoControl(handle, control_code, None, None)
+        write_saved_image(
+            Path(image_file), lambda data: win32file.WriteFile(handle, data)
+        )
+    finally:
+        handle.Close()
+
+
 def unmount_volume_from_path(mount_path: str) -> None:
     """
     Unmount a volume from a specified path using MSFT_Partition.RemoveAccessPath.
@@ -771,6 +795,31 @@ def get_partition_by_drive_letter(drive_letter: str) -> Partition:
         return _build_partition_from_wmi(target_partition, wmi)
 
 
+def get_disk_media_type(disk_number: int) -> str:
+    """
+    Get whether a disk is solid-state or rotational.
+
+    Args:
+        disk_number: Disk number (as in MSFT_Disk.Number)
+
+    Returns:
+        "ssd", "hdd" or "unknown" (e.g. virtual disks, or if the query fails)
+    """
+    try:
+        with com_context():
+            import win32com.client
+
+            wmi = win32com.client.GetObject("winmgmts:root/Microsoft/Windows/Storage")
+            disks = wmi.ExecQuery(
+                f"SELECT MediaType FROM MSFT_PhysicalDisk WHERE DeviceId = '{disk_number}'"
+            )
+            for physical_disk in disks:
+                return _MEDIA_TYPES.get(int(physical_disk.MediaType or 0), "unknown")
+    except Exception as e:
+        logging.debug(f"Could not get media type of disk {disk_number}: {e}")
+    return "unknown"
+
+
 def get_partition_supported_size(guid: str) -> int:
     """
     Get the supported resizable size for a partition by GUID.
@@ -3,13 +3,27 @@ Download service for handling file downloads and network operations.
 Uses a custom Rust-based downloader for better performance and native SSL support.
 """
 
+import hashlib
+import json
 import logging
+import threading
+import time
 from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-import requers
+from services import chunk_manifest, iso_store, mirrors, segmented_download
+from services.bandwidth import Transfer, TransferCancelledError
+from services.chunk_manifest import ChunkRecorder
+from services.download_backend import get_backend
+from services.hash_cache import get_hash_cache
+from services.hashing import StreamingHasher
+from services.http_cache import CachedResponse, get_http_cache
+from services.progress import DEFAULT_PROGRESS_INTERVAL, ProgressChannel, poll_into
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_RETRIES = 5  # Reconnects (resuming with Range) before a stream fails
 
 
 @dataclass
@@ -24,28 +38,73 @@ class DownloadProgress:
     percentage: float
 
 
+class HashVerificationError(Exception):
+    """Raised when file hash verification fails."""
+
+    def __init__(self, file_path: str, expected: str, actual: str):
+        self.file_path = file_path
+        self.expected = expected
+        self.actual = actual
+        super().__init__(
+            f"Hash mismatch for {file_path}: expected {expected}, got {actual}"
+        )
+
+
+class DownloadedPath(Path):
+    """Path of a downloaded file, carrying the SHA256 computed while it arrived."""
+
+    def __init__(self, *args, sha256: str = ""):
+        super().__init__(*args)
+        self.sha256 = sha256
+
+
 def download_file(
     url: str,
     destination: Path,
     filename: str | None = None,
     expected_hash: str | None = None,
     progress_callback: Callable[[DownloadProgress], None] | None = None,
-) -> Path:
+    segments: int = 1,
+    transfer: Transfer | None = None,
+    mirror_count: int = 0,
+    min_speed: float = 0.0,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+) -> DownloadedPath:
     """
     Download a file with progress tracking and verification.
 
+    The SHA256 digest is computed incrementally while the file downloads
+    (including a resumed download's existing prefix), so verification never
+    reads the finished file back from disk. A per-chunk manifest is recorded
+    alongside it. On a mismatch, if an earlier download of the file left a
+    verified manifest, only the chunks differing from it are re-fetched over
+    HTTP Range before the file is given up on.
+
     Args:
         url: URL to download from
         destination: Directory to save to
         filename: Optional custom filename
         expected_hash: Optional SHA256 hash for verification
         progress_callback: Optional callback for progress updates
+        segments: Number of parallel Range connections (1 = single stream).
+            Falls back to a single stream if the server ignores Range.
+        transfer: Optional share of a BandwidthScheduler. Segmented
+            downloads are throttled to it; a single backend stream can only
+            report its throughput.
+        mirror_count: Number of mirrors to race for the fastest one
+            (0 = download from url as given)
+        min_speed: Bytes/s below which a segmented download moves its
+            remaining ranges to the next-best mirror
+        progress_interval: Minimum seconds between progress callbacks; the
+            final update is delivered as soon as the transfer ends
 
     Returns:
-        Path to downloaded file
+        Path to downloaded file, with its digest in the ``sha256`` attribute
 
     Raises:
-        NetworkError: If download fails
+        HashVerificationError: If the downloaded file doesn't match expected_hash
+        TransferCancelledError: If the transfer's scheduler was cancelled
+        RuntimeError: If download fails
     """
     if not filename:
         filename = url.split("/")[-1]
@@ -54,101 +113,410 @@ def download_file(
     destination.mkdir(parents=True, exist_ok=True)
 
     logging.info(f"Starting download: {url} -> {filepath}")
+    # Resuming or restarting writes to the file in place
+    iso_store.detach_from_store(filepath, keep_data=False)
+    # Chunks known to be good, from an earlier download of the same file
+    previous_manifest = chunk_manifest.ChunkManifest.load(filepath)
 
     try:
-        # Use Rust downloader - now returns a handle for progress monitoring
-        download_handle = requers.download_file(
-            url,
-            str(filepath),
-            True,  # resume
+        sources = mirrors.rank_mirrors(url, mirror_count)
+        recorder = ChunkRecorder()
+        hasher = StreamingHasher(filepath, recorder)
+        channel = ProgressChannel(progress_interval)
+        download_handle = _start_download(
+            sources, filepath, segments, hasher, transfer, channel, min_speed
+        )
+        _monitor_download(
+            download_handle, channel, filename, progress_callback, hasher, transfer
         )
 
-        # Monitor progress
-        while not download_handle.is_finished():
-            if progress_callback:
-                progress_info = download_handle.get_progress()
-                downloaded = progress_info.get("downloaded", 0)
-                total = progress_info.get("total", 0)
-                speed = progress_info.get("speed", 0.0)
-                eta = progress_info.get("eta", 0.0)
-
-                percentage = (downloaded / total) * 100 if total and total > 0 else 0.0
-
-                progress = DownloadProgress(
-                    filename=filename,
-                    downloaded_bytes=downloaded,
-                    total_bytes=total,
-                    speed_bytes_per_sec=speed,
-                    eta_seconds=eta,
-                    percentage=percentage,
-                )
-
-                progress_callback(progress)
-
-            # Small delay to avoid busy waiting
-            import time
+        if isinstance(
+            download_handle, segmented_download.SegmentedDownload
+        ) and isinstance(
+            download_handle.error, segmented_download.RangeNotSupportedError
+        ):
+            # Server stopped honouring Range mid-transfer, start over as one stream
+            logging.warning(f"{download_handle.error}, retrying as a single stream")
+            segmented_download.discard_state(filepath)
+            filepath.unlink()
+            recorder = ChunkRecorder()
+            hasher = StreamingHasher(filepath, recorder)
+            channel = ProgressChannel(progress_interval)
+            download_handle = _start_download(
+                sources, filepath, 1, hasher, transfer, channel
+            )
+            _monitor_download(
+                download_handle, channel, filename, progress_callback, hasher, transfer
+            )
 
-            time.sleep(0.2)
+        if isinstance(
+            download_handle, segmented_download.SegmentedDownload
+        ) and isinstance(download_handle.error, TransferCancelledError):
+            # Keep the partial file and its resume state for the next attempt
+            raise download_handle.error
 
         # Check if download was successful
         if not download_handle.is_successful():
             filepath.unlink()
             msg = f"Download failed for {filename}"
             raise RuntimeError(msg)
+        if (
+            isinstance(download_handle, segmented_download.SegmentedDownload)
+            and download_handle.url == download_handle.info.url
+        ):
+            # Sustained throughput is a better mirror measurement than the race
+            mirrors.get_mirror_stats().record_speed(
+                download_handle.url, download_handle.average_speed
+            )
+
+        # Hash whatever was still unflushed when the handle reported progress
+        file_size = filepath.stat().st_size
+        hasher.advance_to(file_size)
+        actual_hash = hasher.hexdigest()
+        manifest = recorder.finish(filepath, file_size)
 
         # Verify hash if provided
-        if expected_hash and not _verify_file_hash(filepath, expected_hash):
-            filepath.unlink()  # Remove corrupted file
-            msg = f"Hash verification failed for {filename}"
-            raise ValueError(msg)
-        logging.info(
-            f"Successfully downloaded {filename} ({filepath.stat().st_size} bytes)"
-        )
-        return filepath
+        if expected_hash and actual_hash != expected_hash.lower().strip():
+            # The manifest just recorded describes the bad bytes as received,
+            # so it can't show where they are; only a verified one can
+            repair = None
+            if previous_manifest is not None and previous_manifest.verified:
+                repair = chunk_manifest.repair_file(
+                    filepath, url, expected_hash, previous_manifest
+                )
+            if repair is None:
+                filepath.unlink()  # Remove corrupted file
+                chunk_manifest.discard_manifest(filepath)
+                raise HashVerificationError(str(filepath), expected_hash, actual_hash)
+            actual_hash = repair.sha256
 
+        # Only a manifest checked against a known hash can vouch for chunks later
+        manifest.verified = bool(expected_hash)
+        manifest.save(filepath)
+        logging.info(f"Successfully downloaded {filename} ({file_size} bytes)")
+        get_hash_cache().store(filepath, actual_hash)
+        return DownloadedPath(filepath, sha256=actual_hash)
+
+    except (HashVerificationError, TransferCancelledError):
+        raise
     except Exception as e:
         # Clean up partial download
         if filepath.exists():
             filepath.unlink()
+        segmented_download.discard_state(filepath)
+        chunk_manifest.discard_manifest(filepath)
         msg = f"Failed to download {url}: {e}"
         raise RuntimeError(msg) from e
 
 
-def _verify_file_hash(filepath: Path, expected_hash: str) -> bool:
-    """Verify file SHA256 hash."""
-    try:
-        calculated_hash = requers.hash_file(str(filepath)).lower()
-        expected_hash = expected_hash.lower()
+def _start_download(
+    sources: list[str],
+    filepath: Path,
+    segments: int,
+    hasher: StreamingHasher,
+    transfer: Transfer | None,
+    channel: ProgressChannel,
+    min_speed: float = 0.0,
+) -> Any:
+    """
+    Start a segmented download if possible, else a single backend stream.
+
+    The first source is used; a segmented download fails over to the others.
+    *channel* is published to while the download runs and finished when it
+    ends.
+    """
+    url = sources[0]
+    # A partial file without segment state came from a single-stream download;
+    # let the backend resume it rather than starting over
+    can_segment = segments > 1 and (
+        not filepath.exists() or segmented_download.has_resume_state(filepath)
+    )
+    if can_segment:
+        try:
+            handle = segmented_download.start_segmented_download(
+                url,
+                filepath,
+                segments,
+                hasher,
+                hasher.recorder,
+                transfer,
+                mirrors=sources[1:],
+                min_speed=min_speed,
+                progress=channel,
+            )
+        except OSError as e:
+            logging.warning(f"Segmented download unavailable ({e}), using one stream")
+            handle = None
+        if handle is not None:
+            return handle
+
+    # Backends that expose the data hash it in memory as it's written
+    handle = get_backend().download(url, filepath, resume=True, sink=hasher.feed)
+    # Backend handles have no completion callback, so they are polled at the
+    # channel's coalescing interval
+    poll_into(handle, channel)
+    return handle
+
+
+def _monitor_download(
+    download_handle: Any,
+    channel: ProgressChannel,
+    filename: str,
+    progress_callback: Callable[[DownloadProgress], None] | None,
+    hasher: StreamingHasher,
+    transfer: Transfer | None = None,
+) -> None:
+    """
+    Report progress and hash as the download advances, until it finishes.
+
+    Wakes only when *channel* delivers a (coalesced) update, and returns as
+    soon as the download signals completion, after a final report.
+    """
+    reported = None
+    finished = False
+    while not finished:
+        finished = channel.wait()
+        progress_info = download_handle.get_progress()
+        downloaded = progress_info.get("downloaded", 0)
+
+        # Hash the part of the file that is final while it's still cached
+        if isinstance(download_handle, segmented_download.SegmentedDownload):
+            hasher.advance_to(download_handle.contiguous_bytes)
+        else:
+            hasher.advance_to(downloaded)
+            if transfer:
+                # Segment workers throttle themselves; a backend stream can
+                # only tell the scheduler how much bandwidth it is using
+                if reported is not None:
+                    transfer.record(max(0, downloaded - reported))
+                reported = downloaded
+
+        if progress_callback:
+            total = progress_info.get("total", 0)
+            speed = progress_info.get("speed", 0.0)
+            eta = progress_info.get("eta", 0.0)
+
+            percentage = (downloaded / total) * 100 if total and total > 0 else 0.0
+
+            progress = DownloadProgress(
+                filename=filename,
+                downloaded_bytes=downloaded,
+                total_bytes=total,
+                speed_bytes_per_sec=speed,
+                eta_seconds=eta,
+                percentage=percentage,
+            )
+
+            progress_callback(progress)
+
 
-        logging.debug(
-            f"Hash verification: calculated={calculated_hash}, expected={expected_hash}"
+def stream_download(
+    url: str,
+    sink: Callable[[bytes], None],
+    expected_hash: str | None = None,
+    progress_callback: Callable[[DownloadProgress], None] | None = None,
+    transfer: Transfer | None = None,
+    mirror_count: int = 0,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ranges: list[tuple[int, int]] | None = None,
+) -> str:
+    """
+    Download a file in order into *sink* instead of a file on disk.
+
+    The SHA256 is computed on the same stream. A dropped connection is
+    resumed with a Range request from where it stopped, so *sink* sees every
+    byte exactly once.
+
+    Args:
+        url: URL to download from
+        sink: Called with each piece of the file, in order
+        expected_hash: Optional SHA256 to verify once the stream ends
+        progress_callback: Optional callback for progress updates
+        transfer: Optional share of a BandwidthScheduler to throttle to
+        mirror_count: Number of mirrors to race for the fastest one
+        progress_interval: Minimum seconds between progress callbacks
+        ranges: Only download these (offset, length) ranges of the file, in
+            order, as if they were one file
+
+    Returns:
+        SHA256 of the streamed data (lowercase hex)
+
+    Raises:
+        HashVerificationError: If the data doesn't match *expected_hash*
+        RuntimeError: If the download fails
+    """
+    url = mirrors.rank_mirrors(url, mirror_count)[0]
+    filename = url.split("?")[0].rsplit("/", 1)[-1]
+    digest = hashlib.sha256()
+    received = 0
+    total = sum(length for _, length in ranges) if ranges else 0
+    retries = 0
+    began = time.monotonic()
+    last_report = 0.0
+    spans: list[tuple[int, int | None]] = list(ranges) if ranges else [(0, None)]
+    for offset, span_length in spans:
+        span_received = 0
+        while span_length is None or span_received < span_length:
+            start = offset + span_received
+            end = None if span_length is None else offset + span_length
+            ranged = start > 0 or end is not None
+            try:
+                with segmented_download.open_url(
+                    url, start if ranged else None, end
+                ) as response:
+                    if ranged and response.status != 206:
+                        msg = f"Cannot stream part of {url}: no Range support"
+                        raise RuntimeError(msg)
+                    length = response.headers.get("Content-Length", "")
+                    if not total and length.isdigit():
+                        total = received + int(length)
+                    while True:
+                        size = STREAM_CHUNK_SIZE
+                        if span_length is not None:
+                            size = min(size, span_length - span_received)
+                        if not size or not (data := response.read(size)):
+                            break
+                        if transfer:
+                            transfer.consume(len(data))
+                        digest.update(data)
+                        sink(data)
+                        received += len(data)
+                        span_received += len(data)
+                        retries = 0
+                        now = time.monotonic()
+                        if progress_callback and now - last_report >= progress_interval:
+                            last_report = now
+                            progress_callback(
+                                _stream_progress(filename, received, total, now - began)
+                            )
+                if span_length is None:
+                    if total and received < total:
+                        msg = f"Connection closed at {received} of {total} bytes"
+                        raise ConnectionError(msg)
+                    break
+                if span_received < span_length:
+                    msg = (
+                        f"Connection closed at {span_received} of {span_length} "
+                        f"bytes from offset {offset}"
+                    )
+                    raise ConnectionError(msg)
+            except OSError as e:
+                retries += 1
+                if retries > STREAM_RETRIES:
+                    msg = f"Failed to stream {url}: {e}"
+                    raise RuntimeError(msg) from e
+                logging.warning(
+                    f"Stream of {url} interrupted at {received} ({e}), resuming"
+                )
+                time.sleep(retries)
+
+    if progress_callback:
+        progress_callback(
+            _stream_progress(filename, received, received, time.monotonic() - began)
         )
-        return calculated_hash == expected_hash
+    actual_hash = digest.hexdigest()
+    if expected_hash and actual_hash != expected_hash.lower().strip():
+        raise HashVerificationError(url, expected_hash, actual_hash)
+    logging.info(f"Streamed and verified {filename} ({received} bytes)")
+    return actual_hash
 
-    except Exception as e:
-        logging.error(f"Hash verification failed: {e}")
-        return False
 
+def _stream_progress(
+    filename: str, received: int, total: int, elapsed: float
+) -> DownloadProgress:
+    speed = received / elapsed if elapsed > 0 else 0.0
+    return DownloadProgress(
+        filename=filename,
+        downloaded_bytes=received,
+        total_bytes=total,
+        speed_bytes_per_sec=speed,
+        eta_seconds=(total - received) / speed if speed and total else 0.0,
+        percentage=received / total * 100 if total else 0.0,
+    )
 
-def fetch_json(url: str) -> Any:
+
+def fetch_json(url: str, on_update: Callable[[Any], None] | None = None) -> Any:
     """
-    Fetch and parse JSON from a URL using the Rust downloader.
+    Fetch and parse JSON from a URL, serving a cached copy when there is one.
+
+    A cached copy is returned immediately and revalidated in the background
+    with a conditional request (ETag / Last-Modified). If the server has
+    newer data, the cache is updated and *on_update* is called with it from
+    the background thread.
 
     Args:
         url: URL to fetch JSON from
+        on_update: Optional callback for data that changed on revalidation
 
     Returns:
         Parsed JSON data
     """
+    cache = get_http_cache()
+    cached = cache.load(url)
+    if cached is not None:
+        logging.info(f"Using cached JSON for {url}, revalidating in background")
+        threading.Thread(
+            target=_revalidate_json, args=(url, cached, on_update), daemon=True
+        ).start()
+        return cached.data
+
     try:
         logging.info(f"Fetching JSON from: {url}")
-        headers = {"User-Agent": "WinGone/1.0"}
-        response = requers.get(url, headers=headers, timeout=30.0)
-        response.raise_for_status()
-
-        data = response.json()
+        response = _request_json(url)
+        if response is None:  # Unconditional requests can't be "not modified"
+            msg = f"Unexpected 304 response from {url}"
+            raise RuntimeError(msg)
+        cache.save(response)
         logging.debug(f"Successfully fetched JSON data from {url}")
-        return data
+        return response.data
     except Exception as e:
         msg = f"Failed to fetch JSON from {url}"
         raise RuntimeError(msg) from e
+
+
+def _request_json(
+    url: str, cached: CachedResponse | None = None
+) -> CachedResponse | None:
+    """
+    GET *url* as JSON, conditionally on *cached* if given.
+
+    Returns:
+        The fresh response, or None if the server says *cached* is current
+    """
+    headers = {"Accept": "application/json"}
+    if cached:
+        headers.update(cached.conditional_headers())
+    response = get_backend().get(url, headers=headers)
+    if response.status == 304:
+        return None
+    return CachedResponse(
+        url=url,
+        data=json.loads(response.body),
+        etag=response.headers.get("etag", ""),
+        last_modified=response.headers.get("last-modified", ""),
+        fetched_at=time.time(),
+    )
+
+
+def _revalidate_json(
+    url: str, cached: CachedResponse, on_update: Callable[[Any], None] | None
+) -> None:
+    """Refresh a cached JSON response, reporting changed data to *on_update*."""
+    cache = get_http_cache()
+    try:
+        response = _request_json(url, cached)
+    except Exception as e:
+        logging.warning(f"Could not revalidate {url}, keeping cached copy: {e}")
+        return
+
+    if response is None:
+        logging.debug(f"Cached JSON for {url} is current")
+        cache.touch(cached)
+        return
+
+    cache.save(response)
+    if response.data == cached.data:
+        return
+    logging.info(f"JSON at {url} changed since it was cached")
+    if on_update:
+        on_update(response.data)
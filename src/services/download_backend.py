@@ -0,0 +1,442 @@
+"""
+Pluggable downloader backends.
+Single-stream downloads, file hashing and plain GET requests go through a
+DownloadBackend, so the native ``requers`` module can be swapped for the
+pure-Python asyncio engine (for profiling, or where the wheel isn't
+available).
+"""
+
+import asyncio
+import hashlib
+import logging
+import ssl
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = "WinGone/1.0"
+STREAM_CHUNK_SIZE = 256 * 1024
+MAX_REDIRECTS = 10
+REQUEST_TIMEOUT = 30.0
+_SPEED_WINDOW = 3.0  # seconds of samples used for the speed estimate
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class DownloadHandle(Protocol):
+    """A running single-stream download."""
+
+    def is_finished(self) -> bool: ...
+
+    def is_successful(self) -> bool: ...
+
+    def get_progress(self) -> dict[str, Any]:
+        """Get ``downloaded``, ``total``, ``speed`` and ``eta``."""
+        ...
+
+
+@dataclass
+class Response:
+    """A complete (non-streamed) HTTP response."""
+
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)  # Lowercase names
+    body: bytes = b""
+
+
+class HttpStatusError(OSError):
+    """Raised for an HTTP error status."""
+
+    def __init__(self, url: str, status: int):
+        self.url = url
+        self.status = status
+        super().__init__(f"HTTP {status} for {url}")
+
+
+class DownloadBackend(ABC):
+    """Interface every downloader backend implements."""
+
+    name: str = ""
+
+    @abstractmethod
+    def download(
+        self,
+        url: str,
+        filepath: Path,
+        resume: bool = True,
+        sink: Callable[[int, bytes], None] | None = None,
+    ) -> DownloadHandle:
+        """
+        Start downloading *url* to *filepath* in the background.
+
+        Args:
+            url: URL to download from
+            filepath: Target file path
+            resume: Continue an existing partial file with a Range request
+            sink: Optional callback receiving ``(offset, data)`` as data is
+                written, e.g. StreamingHasher.feed. Backends that can't
+                expose their data ignore it.
+
+        Returns:
+            Handle to poll for progress and completion
+        """
+
+    @abstractmethod
+    def hash_file(self, filepath: Path) -> str:
+        """Get the lowercase hex SHA256 of a file."""
+
+    @abstractmethod
+    def get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> Response:
+        """
+        GET *url* into memory, following redirects.
+
+        Returns:
+            The response; 2xx and 304 are returned, other statuses raise
+
+        Raises:
+            HttpStatusError: For other HTTP error statuses
+        """
+
+
+class RequersBackend(DownloadBackend):
+    """The native Rust downloader (``requers``)."""
+
+    name = "requers"
+
+    def __init__(self):
+        import requers
+
+        self._requers = requers
+
+    def download(
+        self,
+        url: str,
+        filepath: Path,
+        resume: bool = True,
+        sink: Callable[[int, bytes], None] | None = None,  # noqa: ARG002
+    ) -> DownloadHandle:
+        # requers writes the file itself, so *sink* can't be fed
+        return self._requers.download_file(url, str(filepath), resume)
+
+    def hash_file(self, filepath: Path) -> str:
+        return self._requers.hash_file(str(filepath)).lower()
+
+    def get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> Response:
+        response = self._requers.get(
+            url,
+            headers={"User-Agent": USER_AGENT, **(headers or {})},
+            timeout=timeout,
+        )
+        status = response.status_code
+        if status >= 400:
+            raise HttpStatusError(url, status)
+        return Response(
+            status=status,
+            headers={k.lower(): v for k, v in dict(response.headers).items()},
+            body=response.content,
+        )
+
+
+class AsyncioBackend(DownloadBackend):
+    """
+    Pure-Python HTTP/1.1 engine on asyncio streams.
+
+    All transfers run on one event loop in a background thread. Supports
+    redirects, chunked and identity bodies, Range resume and streaming data
+    to a sink while it is written.
+    """
+
+    name = "asyncio"
+
+    def __init__(self):
+        self._ssl_context = ssl.create_default_context()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="asyncio-downloads", daemon=True
+        ).start()
+
+    def download(
+        self,
+        url: str,
+        filepath: Path,
+        resume: bool = True,
+        sink: Callable[[int, bytes], None] | None = None,
+    ) -> DownloadHandle:
+        handle = AsyncioDownload()
+        handle.future = asyncio.run_coroutine_threadsafe(
+            self._download(handle, url, filepath, resume, sink), self._loop
+        )
+        return handle
+
+    def hash_file(self, filepath: Path) -> str:
+        with filepath.open("rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    def get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> Response:
+        return asyncio.run_coroutine_threadsafe(
+            self._get(url, headers or {}, timeout), self._loop
+        ).result()
+
+    async def _get(self, url: str, headers: dict[str, str], timeout: float) -> Response:
+        status, response_headers, reader, writer, url = await self._open(
+            url, headers, timeout
+        )
+        try:
+            if status >= 400:
+                raise HttpStatusError(url, status)
+            body = bytearray()
+            async for data in _iter_body(reader, response_headers, status, timeout):
+                body += data
+            return Response(status, response_headers, bytes(body))
+        finally:
+            writer.close()
+
+    async def _download(
+        self,
+        handle: "AsyncioDownload",
+        url: str,
+        filepath: Path,
+        resume: bool,
+        sink: Callable[[int, bytes], None] | None,
+    ) -> None:
+        offset = filepath.stat().st_size if resume and filepath.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        status, response_headers, reader, writer, url = await self._open(
+            url, headers, REQUEST_TIMEOUT
+        )
+        try:
+            if status == 416 and offset:
+                # Nothing left past our offset: the partial file is complete
+                handle.total = handle.downloaded = offset
+                return
+            if status >= 400:
+                raise HttpStatusError(url, status)
+            if status != 206:
+                offset = 0  # Server ignored Range; start over
+
+            length = response_headers.get("content-length", "")
+            handle.total = offset + int(length) if length.isdigit() else 0
+            handle.downloaded = offset
+            with filepath.open("r+b" if offset else "wb") as f:
+                f.seek(offset)
+                async for data in _iter_body(
+                    reader, response_headers, status, REQUEST_TIMEOUT
+                ):
+                    f.write(data)
+                    if sink:
+                        sink(handle.downloaded, data)
+                    handle.downloaded += len(data)
+            if handle.total and handle.downloaded != handle.total:
+                msg = f"Connection closed at {handle.downloaded} of {handle.total}"
+                raise ConnectionError(msg)
+        finally:
+            writer.close()
+
+    async def _open(
+        self, url: str, headers: dict[str, str], timeout: float
+    ) -> tuple[int, dict[str, str], asyncio.StreamReader, asyncio.StreamWriter, str]:
+        """Send a GET and read the response head, following redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            secure = parts.scheme == "https"
+            port = parts.port or (443 if secure else 80)
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    parts.hostname,
+                    port,
+                    ssl=self._ssl_context if secure else None,
+                    limit=STREAM_CHUNK_SIZE,
+                ),
+                timeout,
+            )
+            target = parts.path or "/"
+            if parts.query:
+                target += f"?{parts.query}"
+            lines = [
+                f"GET {target} HTTP/1.1",
+                f"Host: {parts.netloc}",
+                f"User-Agent: {USER_AGENT}",
+                "Accept-Encoding: identity",
+                "Connection: close",
+                *(f"{name}: {value}" for name, value in headers.items()),
+            ]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                writer.close()
+                msg = f"Malformed HTTP status line from {url}: {status_line!r}"
+                raise ConnectionError(msg) from None
+            response_headers: dict[str, str] = {}
+            while line := (await asyncio.wait_for(reader.readline(), timeout)).strip():
+                name, _sep, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+
+            location = response_headers.get("location")
+            if status in _REDIRECT_STATUSES and location:
+                writer.close()
+                url = urljoin(url, location)
+                continue
+            return status, response_headers, reader, writer, url
+
+        msg = f"Too many redirects for {url}"
+        raise ConnectionError(msg)
+
+
+async def _iter_body(
+    reader: asyncio.StreamReader,
+    headers: dict[str, str],
+    status: int,
+    timeout: float,
+) -> AsyncIterator[bytes]:
+    """Yield a response body as it arrives (chunked, sized or until EOF)."""
+    if status in {204, 304}:
+        return
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), timeout)
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                return
+            remaining = size
+            while remaining:
+                data = await asyncio.wait_for(
+                    reader.read(min(remaining, STREAM_CHUNK_SIZE)), timeout
+                )
+                if not data:
+                    msg = "Connection closed inside a chunk"
+                    raise ConnectionError(msg)
+                remaining -= len(data)
+                yield data
+            await reader.readline()  # CRLF after the chunk
+        return
+
+    length = headers.get("content-length", "")
+    remaining = int(length) if length.isdigit() else None
+    while remaining is None or remaining > 0:
+        size = (
+            STREAM_CHUNK_SIZE
+            if remaining is None
+            else min(remaining, STREAM_CHUNK_SIZE)
+        )
+        data = await asyncio.wait_for(reader.read(size), timeout)
+        if not data:
+            return
+        if remaining is not None:
+            remaining -= len(data)
+        yield data
+
+
+class AsyncioDownload:
+    """Handle for a download running on the AsyncioBackend's loop."""
+
+    def __init__(self):
+        self.future: Any = None
+        self.total = 0
+        self.downloaded = 0
+        self._samples: deque[tuple[float, int]] = deque()
+
+    @property
+    def error(self) -> BaseException | None:
+        if self.future is None or not self.future.done():
+            return None
+        return self.future.exception()
+
+    def is_finished(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def is_successful(self) -> bool:
+        return self.is_finished() and self.error is None
+
+    def get_progress(self) -> dict[str, Any]:
+        """Get progress in the same shape as the requers handle."""
+        downloaded = self.downloaded
+        now = time.monotonic()
+        self._samples.append((now, downloaded))
+        while len(self._samples) > 2 and now - self._samples[0][0] > _SPEED_WINDOW:
+            self._samples.popleft()
+        first_time, first_bytes = self._samples[0]
+        elapsed = now - first_time
+        speed = (downloaded - first_bytes) / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - downloaded) / speed if speed > 0 and self.total else 0.0
+        return {
+            "downloaded": downloaded,
+            "total": self.total,
+            "speed": speed,
+            "eta": eta,
+        }
+
+
+BACKENDS: dict[str, type[DownloadBackend]] = {
+    RequersBackend.name: RequersBackend,
+    AsyncioBackend.name: AsyncioBackend,
+}
+
+# Global backend instance
+_backend: DownloadBackend | None = None
+
+
+def create_backend(name: str) -> DownloadBackend:
+    """
+    Create a backend by name.
+
+    Raises:
+        ValueError: If no backend has that name
+        ImportError: If the backend's native module isn't available
+    """
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        msg = f"Unknown download backend: {name}"
+        raise ValueError(msg) from None
+    return backend_class()
+
+
+def get_backend() -> DownloadBackend:
+    """
+    Get the global download backend.
+
+    Uses ``AppConfig.download_backend``, falling back to the asyncio engine
+    if the configured backend can't be loaded.
+    """
+    global _backend
+    if _backend is None:
+        from core.settings import get_config
+
+        name = get_config().app.download_backend
+        try:
+            _backend = create_backend(name)
+        except ImportError as e:
+            logging.warning(f"Download backend {name} unavailable ({e}), using asyncio")
+            _backend = AsyncioBackend()
+        logging.info(f"Using {_backend.name} download backend")
+    return _backend
+
+
+def set_backend(backend: DownloadBackend) -> None:
+    """Set the global download backend (for testing and benchmarks)."""
+    global _backend
+    _backend = backend
@@ -0,0 +1,391 @@
+"""
+Hardware-free dry runs of the installation.
+Runs every installation stage with stand-ins for the disk, the firmware
+boot entries and elevation, so nothing on the machine changes. The images
+really are downloaded and extracted, into a scratch directory that is
+deleted afterwards. Each stage's wall time and I/O volume go into a JSON
+report, to benchmark a release's images before users get them.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import stat
+import tempfile
+import time
+import uuid
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+
+from models.spin import Spin
+from services.disk import Partition
+from services.fat32_image import ImageFile, write_saved_image
+from services.stages import Stage
+from services.storage import StorageBackend
+
+_REPORT_FILE_NAME = "dry_run_report.json"
+_SCRATCH_DIR_PREFIX = "WinGone_dry_run_"
+_DISK_SIZE = 512 * 1024**3  # Of the simulated system disk
+_EFI_SIZE = 260 * 1024**2
+_ALIGNMENT = 1024**2
+_SECTOR_SIZE = 512
+_GPT_PARTITION_STYLE = 2  # MSFT_Disk.PartitionStyle of a GPT disk
+_VOLUME_PREFIX = "dry-run:"
+_UNPACK_READ_SIZE = 4 * 1024 * 1024
+
+
+class DryRunStorage(StorageBackend):
+    """
+    Simulated system disk; volumes are directories in a scratch directory.
+
+    The partition table only exists in memory. Mounting a volume moves its
+    files into the mount directory and unmounting moves them back, which is
+    a rename when both are on the same file system (the scratch directory
+    is in the temp folder, like the mount directories). Raw image writes go
+    to an image file next to the volume's directory, and the image's files
+    are unpacked into the directory, as mounting the volume would show them.
+    """
+
+    name = "dry-run"
+
+    def __init__(self, root: Path, disk_size: int = _DISK_SIZE):
+        """
+        Args:
+            root: Directory to keep the volumes in
+            disk_size: Size of the simulated disk in bytes
+        """
+        self.root = root
+        self.disk_size = disk_size
+        self.disk_guid = str(uuid.uuid4())
+        self.boot_entries: list[str] = []
+        self._partitions: list[Partition] = []
+        self._mounts: dict[str, str] = {}  # Mount path -> volume unique ID
+        self._efi_guid = self._add_partition(_ALIGNMENT, _EFI_SIZE, formatted=True)
+        self._windows_guid = self._add_partition(
+            _ALIGNMENT + _EFI_SIZE,
+            disk_size - _EFI_SIZE - 2 * _ALIGNMENT,
+            drive_letter="C",
+        )
+
+    def get_windows_partition(self) -> Partition:
+        return self.get_partition_by_guid(self._windows_guid)
+
+    def get_efi_partition(self) -> Partition:
+        return self.get_partition_by_guid(self._efi_guid)
+
+    def get_partition_by_guid(self, guid: str) -> Partition:
+        # A copy, like every WMI query returns
+        return replace(self._partition(guid))
+
+    def new_partition(
+        self,
+        disk_number: int,  # noqa: ARG002 - there is only one disk
+        size: int,
+        filesystem: str | None = None,
+        label: str | None = None,  # noqa: ARG002
+        allocation_unit_size: int | None = None,  # noqa: ARG002
+    ) -> Partition:
+        # First free space that fits, like Windows picks
+        offset = _ALIGNMENT
+        for partition in sorted(self._partitions, key=lambda p: p.offset):
+            if partition.offset - offset >= size:
+                break
+            offset = _align_up(partition.offset + partition.size)
+        if offset + size > self.disk_size:
+            msg = f"Not enough free space on the disk for {size} bytes"
+            raise RuntimeError(msg)
+        guid = self._add_partition(offset, size, formatted=filesystem is not None)
+        return self.get_partition_by_guid(guid)
+
+    def resize_partition(self, guid: str, new_size: int) -> None:
+        partition = self._partition(guid)
+        end = min(
+            [p.offset for p in self._partitions if p.offset > partition.offset]
+            + [self.disk_size]
+        )
+        if partition.offset + new_size > end:
+            msg = f"Not enough free space after partition {guid} to grow it"
+            raise RuntimeError(msg)
+        partition.size = new_size
+        partition.size_lba = new_size // _SECTOR_SIZE
+
+    def delete_partition(self, guid: str) -> None:
+        self._partitions.remove(self._partition(guid))
+        _delete_tree(self._volume_dir(guid))
+        self._volume_image(guid).unlink(missing_ok=True)
+
+    def mount_volume(self, volume_unique_id: str, mount_path: str) -> None:
+        volume_dir = self._volume_dir(self._volume_guid(volume_unique_id))
+        Path(mount_path).mkdir(parents=True, exist_ok=True)
+        _move_entries(volume_dir, Path(mount_path))
+        self._mounts[os.path.normcase(mount_path)] = volume_unique_id
+
+    def unmount_volume(self, mount_path: str) -> None:
+        volume_unique_id = self._mounts.pop(os.path.normcase(mount_path), None)
+        if volume_unique_id is None:
+            msg = f"No partition found mounted at {mount_path}"
+            raise RuntimeError(msg)
+        volume_dir = self._volume_dir(self._volume_guid(volume_unique_id))
+        _move_entries(Path(mount_path), volume_dir)
+
+    def write_fat32_image(self, volume_unique_id: str, image_file: str) -> None:
+        guid = self._volume_guid(volume_unique_id)
+        with self._volume_image(guid).open("wb") as f:
+            image = write_saved_image(Path(image_file), f.write)
+        # The image replaces whatever the volume held
+        volume_dir = self._volume_dir(guid)
+        _delete_tree(volume_dir)
+        volume_dir.mkdir(parents=True)
+        for image_file_entry in image.files:
+            _unpack_file(image_file_entry, volume_dir)
+
+    def get_disk_media_type(self, disk_number: int) -> str:  # noqa: ARG002
+        return "unknown"
+
+    def create_boot_entry(self, efi_partition: Partition) -> int:
+        """Remember the boot entry instead of writing firmware variables."""
+        self.boot_entries.append(efi_partition.partition_guid)
+        return len(self.boot_entries) - 1
+
+    def _add_partition(
+        self,
+        offset: int,
+        size: int,
+        formatted: bool = False,
+        drive_letter: str | None = None,
+    ) -> str:
+        guid = str(uuid.uuid4())
+        self._partitions.append(
+            Partition(
+                partition_guid=guid,
+                partition_number=max(
+                    (p.partition_number for p in self._partitions), default=0
+                )
+                + 1,
+                disk_number=0,
+                disk_guid=self.disk_guid,
+                offset=offset,
+                size=size,
+                logical_sector_size=_SECTOR_SIZE,
+                start_lba=offset // _SECTOR_SIZE,
+                size_lba=size // _SECTOR_SIZE,
+                disk_partition_style=_GPT_PARTITION_STYLE,
+                drive_letter=drive_letter,
+                volume_unique_id=f"{_VOLUME_PREFIX}{guid}",
+            )
+        )
+        if formatted:
+            volume_dir = self._volume_dir(guid)
+            _delete_tree(volume_dir)
+            volume_dir.mkdir(parents=True)
+        return guid
+
+    def _partition(self, guid: str) -> Partition:
+        guid = guid.strip("{}").lower()
+        for partition in self._partitions:
+            if partition.partition_guid == guid:
+                return partition
+        msg = f"No partition found with GUID {guid}"
+        raise RuntimeError(msg)
+
+    def _volume_guid(self, volume_unique_id: str) -> str:
+        return volume_unique_id.removeprefix(_VOLUME_PREFIX)
+
+    def _volume_dir(self, guid: str) -> Path:
+        return self.root / guid
+
+    def _volume_image(self, guid: str) -> Path:
+        return self.root / f"{guid}.img"
+
+
+def run_dry_run(
+    spin_name: str | None = None,
+    version: str | None = None,
+    report_file: Path | None = None,
+) -> bool:
+    """
+    Install a spin with stand-ins for the disk, firmware and elevation.
+
+    The work directory (downloads, ISO index, stage timings, journal) is a
+    scratch directory, so nothing of the real installations is used or
+    changed, and every image is downloaded again.
+
+    Args:
+        spin_name: Name of the spin to install (default: the default spin)
+        version: Fedora version to take it from (default: the supported one)
+        report_file: Where to write the report (default: in the work dir)
+
+    Returns:
+        Whether the installation succeeded
+    """
+    from core.settings import ConfigManager, PathConfig, get_config, set_config
+    from core.state import StateManager, get_state, set_state_manager
+    from models.installation_context import InstallationContext
+    from models.kickstart import KickstartConfig
+    from models.partition import PartitioningMethod
+    from services.installation_service import (
+        InstallationService,
+        predict_tmp_partition_size,
+    )
+    from services.privilege_manager import set_use_helper
+    from services.storage import set_storage_backend
+
+    if report_file is None:
+        report_file = get_config().paths.work_dir / _REPORT_FILE_NAME
+    scratch_dir = Path(tempfile.mkdtemp(prefix=_SCRATCH_DIR_PREFIX))
+    logging.info(f"Dry run in {scratch_dir}")
+    try:
+        config = ConfigManager()
+        config.paths = PathConfig(work_dir_override=scratch_dir / "work")
+        set_config(config)
+        set_state_manager(StateManager())
+        storage = DryRunStorage(scratch_dir / "disk")
+        set_storage_backend(storage)
+        set_use_helper(False)
+
+        state = get_state()
+        state.spins.use_dummy = False
+        state.spins.set_accepted_spins(version)
+        spin = _find_spin(state.spins.accepted_spins, spin_name)
+        state.set_selected_spin(spin)
+        state.installation.install_options.partition_method = PartitioningMethod.CUSTOM
+        state.installation.kickstart = KickstartConfig()
+        state.installation.partition.tmp_part_size = predict_tmp_partition_size(
+            spin, state.spins.live_os_installer_spin
+        )
+        context = InstallationContext.from_application_state(state)
+
+        service = InstallationService()
+        began = time.monotonic()
+        result = service.install(context)
+        seconds = time.monotonic() - began
+
+        report = {
+            "created": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "spin": {"name": spin.name, "version": spin.full_version},
+            "images": [
+                {"url": f.download_url, "size": f.size_bytes}
+                for f in context.downloadable_files
+            ],
+            "options": {
+                "stream_iso_to_partition": config.app.stream_iso_to_partition,
+                "write_tmp_part_image": config.app.write_tmp_part_image,
+            },
+            "success": result.success,
+            "error": result.error_message,
+            "seconds": seconds,
+            "tmp_part_size": context.partition.tmp_part_size,
+            "stages": _stage_report(service.stages),
+        }
+        report_file.parent.mkdir(parents=True, exist_ok=True)
+        report_file.write_text(json.dumps(report, indent=1), encoding="utf-8")
+        _log_report(report)
+        logging.info(f"Dry run report written to {report_file}")
+        return result.success
+    finally:
+        _delete_tree(scratch_dir)
+
+
+def _find_spin(spins: list[Spin], name: str | None) -> Spin:
+    """Get the spin called *name*, or the default one."""
+    if not spins:
+        msg = "No spins available to install"
+        raise RuntimeError(msg)
+    if name is None:
+        return next((spin for spin in spins if spin.is_default), spins[0])
+    for spin in spins:
+        if spin.name.lower() == name.lower():
+            return spin
+    msg = f"No spin called {name}; available: {', '.join(s.name for s in spins)}"
+    raise ValueError(msg)
+
+
+def _stage_report(stages: list[Stage]) -> list[dict]:
+    """Get what each stage measured; start times are from the first start."""
+    origin = min((s.started for s in stages if s.started is not None), default=0.0)
+    return [
+        {
+            "name": stage.name,
+            "started": None if stage.started is None else stage.started - origin,
+            "seconds": stage.seconds,
+            "expected_seconds": stage.expected_seconds,
+            "work": stage.work,
+            "io_bytes": stage.io_bytes,
+            "bytes_per_second": (
+                stage.io_bytes / stage.seconds if stage.seconds else None
+            ),
+        }
+        for stage in stages
+    ]
+
+
+def _log_report(report: dict) -> None:
+    from utils import format_bytes, format_speed
+
+    status = "succeeded" if report["success"] else f"failed: {report['error']}"
+    logging.info(
+        f"Dry run of {report['spin']['name']} {report['spin']['version']} "
+        f"{status} in {report['seconds']:.1f} s"
+    )
+    for stage in report["stages"]:
+        if stage["seconds"] is None:
+            logging.info(f"  {stage['name']:<15} did not run")
+            continue
+        speed = stage["bytes_per_second"]
+        logging.info(
+            f"  {stage['name']:<15} +{stage['started']:6.1f} s {stage['seconds']:7.1f} s"
+            f" (expected {stage['expected_seconds']:.1f} s)"
+            f"  {format_bytes(stage['io_bytes']):>10}"
+            + (f"  {format_speed(speed)}" if stage["io_bytes"] and speed else "")
+        )
+
+
+def _move_entries(source: Path, target: Path) -> None:
+    """Move everything in *source* into *target*."""
+    for entry in list(source.iterdir()):
+        destination = target / entry.name
+        try:
+            entry.replace(destination)
+        except OSError:
+            # Another file system
+            shutil.move(entry, destination)
+
+
+def _unpack_file(image_file: ImageFile, volume_dir: Path) -> None:
+    """Write a file of a FAT32 image into the volume's directory."""
+    target = volume_dir / image_file.path.lstrip("/")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with Path(image_file.source).open("rb") as source, target.open("wb") as f:
+        for offset, length in image_file.extents:
+            source.seek(offset)
+            remaining = length
+            while remaining:
+                data = source.read(min(remaining, _UNPACK_READ_SIZE))
+                if not data:
+                    msg = f"{image_file.source} ended inside {image_file.path}"
+                    raise OSError(msg)
+                f.write(data)
+                remaining -= len(data)
+    if image_file.read_only:
+        target.chmod(stat.S_IRUSR)
+
+
+def _delete_tree(path: Path) -> None:
+    """Delete a directory, read-only files included, if it exists."""
+
+    def make_writable(func, failed_path: str, _exc) -> None:  # type: ignore[no-untyped-def]
+        with contextlib.suppress(OSError):
+            Path(failed_path).chmod(stat.S_IWUSR | stat.S_IRUSR)
+            func(failed_path)
+
+    if path.exists():
+        shutil.rmtree(path, onexc=make_writable)
+
+
+def _align_up(value: int) -> int:
+    return -(-value // _ALIGNMENT) * _ALIGNMENT
@@ -0,0 +1,168 @@
+"""
+Copying byte ranges between files.
+Uses the kernel's file-to-file copy (copy_file_range / sendfile) where the
+OS has one, and large aligned readinto (into one reused buffer per thread)
+or mmap transfers otherwise, e.g. on Windows.
+"""
+
+import errno
+import mmap
+import os
+import sys
+import threading
+from typing import BinaryIO
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # Aligned to this, so reads stay page-aligned
+_MMAP_WINDOW = 64 * 1024 * 1024
+# Errors meaning "this copy method doesn't work for these files"; the next
+# method is tried instead
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+    errno.ENOTSOCK,
+}
+_buffers = threading.local()
+
+
+def available_methods() -> list[str]:
+    """Get the copy methods this platform has, fastest first."""
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append("copy_file_range")
+    # sendfile only takes a regular file as output on Linux
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        methods.append("sendfile")
+    methods += ["readinto", "mmap"]
+    return methods
+
+
+def copy_range(
+    source: BinaryIO,
+    target: BinaryIO,
+    offset: int,
+    length: int,
+    methods: list[str] | None = None,
+) -> None:
+    """
+    Copy *length* bytes at *offset* of *source* to the position of *target*.
+
+    *target* must be positioned where the data goes; it is left after it.
+    Each method is tried in turn until one works for these two files.
+
+    Args:
+        source: File opened for binary reading
+        target: File opened for binary writing
+        offset: Position of the data in *source*
+        length: Number of bytes to copy
+        methods: Methods to try (default: available_methods())
+
+    Raises:
+        EOFError: If *source* ends before *offset* + *length*
+        OSError: If reading or writing fails
+    """
+    if length <= 0:
+        return
+    for method in methods or available_methods():
+        target_offset = target.tell()
+        try:
+            _COPIERS[method](source, target, offset, length)
+            return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            # Start over with the next method from where this one began
+            target.seek(target_offset)
+    msg = f"No copy method works for {getattr(target, 'name', target)}"
+    raise OSError(msg)
+
+
+def _copy_file_range(source: BinaryIO, target: BinaryIO, offset: int, length: int):
+    target.flush()
+    out_offset = target.tell()
+    copied = 0
+    while copied < length:
+        count = os.copy_file_range(
+            source.fileno(),
+            target.fileno(),
+            min(length - copied, COPY_CHUNK_SIZE * 16),
+            offset + copied,
+            out_offset + copied,
+        )
+        if count == 0:
+            raise EOFError(_eof_message(source, offset + copied))
+        copied += count
+    target.seek(out_offset + copied)
+
+
+def _sendfile(source: BinaryIO, target: BinaryIO, offset: int, length: int):
+    target.flush()
+    out_offset = target.tell()
+    os.lseek(target.fileno(), out_offset, os.SEEK_SET)
+    copied = 0
+    while copied < length:
+        count = os.sendfile(
+            target.fileno(),
+            source.fileno(),
+            offset + copied,
+            min(length - copied, COPY_CHUNK_SIZE * 16),
+        )
+        if count == 0:
+            raise EOFError(_eof_message(source, offset + copied))
+        copied += count
+    target.seek(out_offset + copied)
+
+
+def _readinto(source: BinaryIO, target: BinaryIO, offset: int, length: int):
+    buffer = _buffer()
+    source.seek(offset)
+    copied = 0
+    while copied < length:
+        # Align reads after the first one to the chunk size
+        position = offset + copied
+        size = min(length - copied, COPY_CHUNK_SIZE - position % COPY_CHUNK_SIZE)
+        view = buffer[:size]
+        read = source.readinto(view)
+        if not read:
+            raise EOFError(_eof_message(source, position))
+        target.write(view[:read])
+        copied += read
+
+
+def _mmap(source: BinaryIO, target: BinaryIO, offset: int, length: int):
+    position = offset
+    end = offset + length
+    while position < end:
+        # Mappings must start at a multiple of the allocation granularity
+        map_start = position - position % mmap.ALLOCATIONGRANULARITY
+        map_size = min(end - map_start, _MMAP_WINDOW)
+        try:
+            mapping = mmap.mmap(
+                source.fileno(), map_size, offset=map_start, access=mmap.ACCESS_READ
+            )
+        except ValueError as e:  # Mapping past the end of the file
+            raise EOFError(_eof_message(source, position)) from e
+        with mapping, memoryview(mapping) as view, view[position - map_start :] as data:
+            target.write(data)
+        position = map_start + map_size
+
+
+def _buffer() -> memoryview:
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = memoryview(bytearray(COPY_CHUNK_SIZE))
+    return buffer
+
+
+def _eof_message(source: BinaryIO, position: int) -> str:
+    return f"{getattr(source, 'name', source)} ends before byte {position}"
+
+
+_COPIERS = {
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "readinto": _readinto,
+    "mmap": _mmap,
+}
@@ -0,0 +1,205 @@
+"""
+Exact FAT32 sizing for the temporary partition.
+Computes how big a FAT32 volume must be to hold a given file tree: every
+file and directory rounded up to whole clusters, directory entries
+(including long file names), both FATs and the reserved sectors. The
+layouts of mkfs.fat and of the Microsoft FAT specification are both
+modeled, and the volume is sized for whichever leaves fewer clusters.
+"""
+
+from collections.abc import Mapping
+from typing import NamedTuple
+
+SECTOR_SIZE = 512
+CLUSTER_SIZE = 4096  # Allocation unit the temporary partition is formatted with
+RESERVED_SECTORS = 32  # Boot sector, FSInfo and their backups
+FAT_COUNT = 2
+DATA_ALIGNMENT = 1024 * 1024  # Some formatters start the data region on 1 MiB
+
+_DIR_ENTRY_SIZE = 32
+_LFN_CHARS = 13  # UTF-16 code units per long file name entry
+_MAX_NAME_ENTRIES = 1 + -(-255 // _LFN_CHARS)  # For a 255 character long name
+_MIN_CLUSTERS = 65526  # With fewer clusters, Windows takes a volume for FAT16
+_SHORT_NAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&'()-@^_`{}~")
+
+
+class Layout(NamedTuple):
+    """Where the regions of a FAT32 volume are, in sectors."""
+
+    reserved_sectors: int
+    fat_sectors: int  # Of each FAT
+    cluster_count: int
+    sectors_per_cluster: int
+
+    @property
+    def data_start(self) -> int:
+        """First sector of cluster 2."""
+        return self.reserved_sectors + FAT_COUNT * self.fat_sectors
+
+
+def layout(sectors: int, cluster_size: int = CLUSTER_SIZE) -> Layout:
+    """
+    Lay out a FAT32 volume of *sectors* sectors the way mkfs.fat does.
+
+    The reserved sectors and each FAT are aligned to whole clusters, so the
+    clusters are aligned as well.
+    """
+    per_cluster = cluster_size // SECTOR_SIZE
+    reserved = _align(RESERVED_SECTORS, per_cluster)
+    fat_data = sectors - reserved
+    # Estimate the cluster count, size the FATs for it, then recount
+    estimate = (fat_data * SECTOR_SIZE + FAT_COUNT * 8) // (
+        cluster_size + FAT_COUNT * 4
+    )
+    fat_sectors = _align(clusters((estimate + 2) * 4, SECTOR_SIZE), per_cluster)
+    cluster_count = min(
+        (fat_data - FAT_COUNT * fat_sectors) // per_cluster,
+        fat_sectors * SECTOR_SIZE // 4 - 2,
+    )
+    return Layout(reserved, fat_sectors, cluster_count, per_cluster)
+
+
+def clusters(size: int, cluster_size: int = CLUSTER_SIZE) -> int:
+    """Get the clusters a file of *size* bytes occupies (none if it's empty)."""
+    return -(-size // cluster_size)
+
+
+def dir_entries(name: str) -> int:
+    """
+    Get the directory entries a file or directory name takes.
+
+    Names that aren't upper case 8.3 names get long file name entries next
+    to their short entry. Windows can store all lower case 8.3 names without
+    them, but Linux and mtools don't, so they are always counted.
+    """
+    if is_short_name(name):
+        return 1
+    units = len(name.encode("utf-16-le")) // 2
+    return 1 + -(-units // _LFN_CHARS)
+
+
+def tree_clusters(files: Mapping[str, int], cluster_size: int = CLUSTER_SIZE) -> int:
+    """
+    Get the clusters a file tree occupies on a FAT32 volume.
+
+    Args:
+        files: Path of every file ("/EFI/BOOT/BOOTX64.EFI") -> its size;
+            directories are implied by the paths
+        cluster_size: Cluster size of the volume
+
+    Returns:
+        Clusters of the files, of every directory and of the root directory
+        (which holds the volume label)
+    """
+    # Directory path -> entries in it; "." and ".." in all but the root
+    entries = {"": 1}
+    total = 0
+    for path, size in files.items():
+        total += clusters(size, cluster_size)
+        parent = ""
+        *dirs, name = path.strip("/").split("/")
+        for dir_name in dirs:
+            child = f"{parent}/{dir_name}"
+            if child not in entries:
+                entries[child] = 2
+                entries[parent] += dir_entries(dir_name)
+            parent = child
+        entries[parent] += dir_entries(name)
+    return total + sum(
+        max(1, clusters(count * _DIR_ENTRY_SIZE, cluster_size))
+        for count in entries.values()
+    )
+
+
+def volume_size(data_clusters: int, cluster_size: int = CLUSTER_SIZE) -> int:
+    """
+    Get the smallest FAT32 volume with at least *data_clusters* clusters.
+
+    Args:
+        data_clusters: Clusters the contents need
+        cluster_size: Cluster size the volume is formatted with
+
+    Returns:
+        Size in bytes (a whole number of sectors)
+    """
+    per_cluster = cluster_size // SECTOR_SIZE
+    needed = max(data_clusters, _MIN_CLUSTERS)
+    # Start from the tightest possible layout, then grow a cluster at a time
+    fat_sectors = clusters((needed + 2) * 4, SECTOR_SIZE)
+    sectors = RESERVED_SECTORS + FAT_COUNT * fat_sectors + needed * per_cluster
+    while formatted_clusters(sectors, cluster_size) < needed:
+        sectors += per_cluster
+    return sectors * SECTOR_SIZE
+
+
+def formatted_clusters(sectors: int, cluster_size: int = CLUSTER_SIZE) -> int:
+    """
+    Get the clusters a FAT32 formatter makes on a volume of *sectors* sectors.
+
+    This is the lowest of the counts given by the mkfs.fat layout (FATs
+    aligned to clusters), by the Microsoft FAT specification's and by
+    FatFs' (both with the data region aligned to ``DATA_ALIGNMENT``).
+    """
+    per_cluster = cluster_size // SECTOR_SIZE
+    mkfs_clusters = layout(sectors, cluster_size).cluster_count
+
+    # Microsoft FAT specification: FAT size from the volume size alone
+    divisor = (256 * per_cluster + FAT_COUNT) // 2
+    spec_fat_sectors = clusters(sectors - RESERVED_SECTORS, divisor)
+    # FatFs: a FAT entry for every cluster the whole volume would hold
+    fatfs_fat_sectors = clusters(sectors // per_cluster * 4 + 8, SECTOR_SIZE)
+
+    return min(
+        mkfs_clusters,
+        _aligned_data_clusters(sectors, spec_fat_sectors, per_cluster),
+        _aligned_data_clusters(sectors, fatfs_fat_sectors, per_cluster),
+    )
+
+
+def tree_volume_size(files: Mapping[str, int], cluster_size: int = CLUSTER_SIZE) -> int:
+    """Get the smallest FAT32 volume that holds a file tree (see tree_clusters)."""
+    return volume_size(tree_clusters(files, cluster_size), cluster_size)
+
+
+def estimate_volume_size(
+    content_size: int, file_count: int, cluster_size: int = CLUSTER_SIZE
+) -> int:
+    """
+    Get a FAT32 volume size that holds files whose paths aren't known.
+
+    Every file is assumed to waste a cluster and to sit alone in its own
+    directory, a child of the root directory with the longest possible
+    name. So this is an upper bound for *file_count* files totalling
+    *content_size* bytes, in at most as many directories.
+    """
+    # The volume label, then an entry for each directory
+    root_entries = 1 + file_count * _MAX_NAME_ENTRIES
+    return volume_size(
+        clusters(content_size, cluster_size)
+        + 2 * file_count
+        + clusters(root_entries * _DIR_ENTRY_SIZE, cluster_size),
+        cluster_size,
+    )
+
+
+def is_short_name(name: str) -> bool:
+    """Whether *name* is an upper case 8.3 name."""
+    base, dot, extension = name.partition(".")
+    return (
+        0 < len(base) <= 8
+        and len(extension) <= 3
+        and (not dot or bool(extension))
+        and all(char in _SHORT_NAME_CHARS for char in base + extension)
+    )
+
+
+def _aligned_data_clusters(sectors: int, fat_sectors: int, per_cluster: int) -> int:
+    """Get the clusters after the FATs, with the data region aligned."""
+    data_start = _align(
+        RESERVED_SECTORS + FAT_COUNT * fat_sectors, DATA_ALIGNMENT // SECTOR_SIZE
+    )
+    return (sectors - data_start) // per_cluster
+
+
+def _align(value: int, alignment: int) -> int:
+    return -(-value // alignment) * alignment
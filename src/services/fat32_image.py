@@ -0,0 +1,587 @@
+"""
+Building FAT32 volumes in userspace.
+Lays out a whole FAT32 file system from a list of files and where their data
+is: boot sectors, both FATs, every directory, and each file in one
+contiguous run of clusters. The volume is then produced as one sequential
+stream, so it can be written to a partition in large writes instead of
+file by file through a mounted volume.
+"""
+
+import contextlib
+import json
+import struct
+import threading
+import time
+from bisect import bisect_right
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from services import fat32
+from services.progress import DEFAULT_PROGRESS_INTERVAL
+
+_ENTRY_SIZE = 32
+_LFN_CHARS = 13
+_ATTR_READ_ONLY = 0x01
+_ATTR_VOLUME_ID = 0x08
+_ATTR_DIRECTORY = 0x10
+_ATTR_ARCHIVE = 0x20
+_ATTR_LONG_NAME = 0x0F
+_END_OF_CHAIN = 0x0FFFFFFF
+_MEDIA_FIXED = 0xF8
+_ROOT_CLUSTER = 2
+_FSINFO_SECTOR = 1
+_BACKUP_BOOT_SECTOR = 6
+_MAX_FILE_SIZE = 0xFFFFFFFF
+_READ_SIZE = 1024 * 1024  # Bytes read from a source at once
+_WRITE_SIZE = 4 * 1024 * 1024  # Bytes passed to the writer at once
+_BOOT_SECTOR = struct.Struct("<3s8sHBHBHHBHHHIIIHHIHH12sBBBI11s8s")
+_DIR_ENTRY = struct.Struct("<11sBBBHHHHHHHI")
+_SHORT_NAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&'()-@^_`{}~")
+
+
+@dataclass
+class ImageFile:
+    """A file to put in the image, and where its data is read from."""
+
+    path: str  # Path in the volume ("/EFI/BOOT/BOOTX64.EFI")
+    source: str  # Local file holding the data
+    extents: list[tuple[int, int]]  # (offset, length) runs of *source*, in order
+    read_only: bool = False
+
+    @property
+    def size(self) -> int:
+        return sum(length for _, length in self.extents)
+
+    @classmethod
+    def from_file(cls, path: str, source: Path, read_only: bool = False) -> "ImageFile":
+        """Put the whole local file *source* at *path*."""
+        return cls(path, str(source), [(0, source.stat().st_size)], read_only)
+
+
+@dataclass
+class _Directory:
+    path: str
+    parent: "_Directory | None"
+    entries: list[tuple[str, "_Directory | ImageFile"]] = field(default_factory=list)
+    cluster: int = 0
+    cluster_count: int = 0
+    table: bytes = b""
+
+
+class _Segment(NamedTuple):
+    """A run of the image: literal bytes, bytes of a source file, or zeros."""
+
+    offset: int
+    length: int
+    data: bytes | None = None
+    source: str | None = None
+    source_offset: int = 0
+
+
+class Fat32Image:
+    """
+    A FAT32 volume laid out in memory, holding the given files.
+
+    Directories come first, then every file in one run of clusters, in the
+    order of their data in the sources, so the sources are read sequentially
+    too. Only the used part of the volume is produced; the free clusters are
+    left as they are.
+    """
+
+    def __init__(
+        self,
+        files: list[ImageFile],
+        size: int,
+        label: str = "NO NAME",
+        cluster_size: int = fat32.CLUSTER_SIZE,
+        hidden_sectors: int = 0,
+        volume_id: int | None = None,
+        timestamp: float | None = None,
+    ):
+        """
+        Args:
+            files: Files to put in the volume; directories are implied by
+                their paths
+            size: Size of the volume in bytes
+            label: Volume label (at most 11 characters are kept)
+            cluster_size: Cluster size to format with
+            hidden_sectors: Sectors before the volume on its disk
+            volume_id: Volume serial number; derived from *timestamp* if None
+            timestamp: Modification time of every entry; now if None
+
+        Raises:
+            ValueError: If the files don't fit in the volume, or one is too
+                big for FAT32
+        """
+        # A later file replaces an earlier one at the same path
+        self.files = list({f.path.upper(): f for f in files}.values())
+        self.size = size
+        self.label = label.upper()[:11]
+        self.cluster_size = cluster_size
+        self.hidden_sectors = hidden_sectors
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.volume_id = (
+            int(self.timestamp * 1000) & 0xFFFFFFFF if volume_id is None else volume_id
+        )
+        self.sectors = size // fat32.SECTOR_SIZE
+        self.layout = fat32.layout(self.sectors, cluster_size)
+        self._date, self._time = _dos_datetime(self.timestamp)
+
+        self._root = self._build_tree(self.files)
+        self._file_clusters: dict[int, tuple[int, int]] = {}  # id -> (first, count)
+        self.used_clusters = self._allocate()
+        if self.used_clusters > self.layout.cluster_count:
+            msg = (
+                f"Files need {self.used_clusters} clusters, "
+                f"a volume of {size} bytes has {self.layout.cluster_count}"
+            )
+            raise ValueError(msg)
+        self._segments = self._build_segments()
+        self._offsets = [segment.offset for segment in self._segments]
+
+    @property
+    def used_size(self) -> int:
+        """Bytes from the start of the volume to the end of its last used cluster."""
+        return self._cluster_offset(_ROOT_CLUSTER + self.used_clusters)
+
+    def write(
+        self,
+        write: Callable[[bytes], object],
+        start: int = 0,
+        end: int | None = None,
+    ) -> None:
+        """
+        Produce bytes [start, end) of the volume, in order.
+
+        Args:
+            write: Called with consecutive chunks of at most 4 MiB; all but
+                the last are whole sectors
+            start: First byte to produce
+            end: End of the bytes to produce (default: ``used_size``)
+        """
+        end = self.used_size if end is None else min(end, self.used_size)
+        buffer = bytearray()
+        with contextlib.ExitStack() as stack:
+            sources: dict[str, BinaryIO] = {}
+            index = max(0, bisect_right(self._offsets, start) - 1)
+            for segment in self._segments[index:]:
+                if segment.offset >= end:
+                    break
+                skip = max(0, start - segment.offset)
+                length = min(segment.length, end - segment.offset) - skip
+                for chunk in self._segment_data(segment, skip, length, sources, stack):
+                    buffer += chunk
+                    if len(buffer) >= _WRITE_SIZE:
+                        write(bytes(buffer[:_WRITE_SIZE]))
+                        del buffer[:_WRITE_SIZE]
+            if buffer:
+                write(bytes(buffer))
+
+    def save(self, path: Path) -> None:
+        """Save what the image is built from, so load() rebuilds it identically."""
+        plan = {
+            "size": self.size,
+            "label": self.label,
+            "cluster_size": self.cluster_size,
+            "hidden_sectors": self.hidden_sectors,
+            "volume_id": self.volume_id,
+            "timestamp": self.timestamp,
+            "files": [[f.path, f.source, f.extents, f.read_only] for f in self.files],
+        }
+        path.write_text(json.dumps(plan), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "Fat32Image":
+        """Rebuild an image saved with save()."""
+        plan = json.loads(path.read_text(encoding="utf-8"))
+        files = [
+            ImageFile(file_path, source, [tuple(e) for e in extents], read_only)
+            for file_path, source, extents, read_only in plan.pop("files")
+        ]
+        return cls(files, **plan)
+
+    def _build_tree(self, files: list[ImageFile]) -> _Directory:
+        root = _Directory("", None)
+        directories = {"": root}
+        for image_file in files:
+            if image_file.size > _MAX_FILE_SIZE:
+                msg = f"{image_file.path} is too big for FAT32"
+                raise ValueError(msg)
+            parent = root
+            *dir_names, name = image_file.path.strip("/").split("/")
+            for dir_name in dir_names:
+                dir_path = f"{parent.path}/{dir_name}"
+                key = dir_path.upper()
+                if key not in directories:
+                    directories[key] = _Directory(dir_path, parent)
+                    parent.entries.append((dir_name, directories[key]))
+                parent = directories[key]
+            parent.entries.append((name, image_file))
+        return root
+
+    def _directories(self) -> list[_Directory]:
+        """All directories, breadth first from the root."""
+        directories = [self._root]
+        for directory in directories:
+            directories.extend(
+                entry for _, entry in directory.entries if isinstance(entry, _Directory)
+            )
+        return directories
+
+    def _allocate(self) -> int:
+        """Give every directory and file its clusters; return how many are used."""
+        next_cluster = _ROOT_CLUSTER
+        directories = self._directories()
+        for directory in directories:
+            count = 1 if directory is self._root else 2  # Label, or "." and ".."
+            count += sum(fat32.dir_entries(name) for name, _ in directory.entries)
+            directory.cluster_count = max(
+                1, fat32.clusters(count * _ENTRY_SIZE, self.cluster_size)
+            )
+            directory.cluster = next_cluster
+            next_cluster += directory.cluster_count
+        for image_file in sorted(
+            (f for f in self.files if f.size), key=lambda f: (f.source, f.extents[0])
+        ):
+            count = fat32.clusters(image_file.size, self.cluster_size)
+            self._file_clusters[id(image_file)] = (next_cluster, count)
+            next_cluster += count
+        for directory in directories:
+            directory.table = self._directory_table(directory)
+        return next_cluster - _ROOT_CLUSTER
+
+    def _directory_table(self, directory: _Directory) -> bytes:
+        table = bytearray()
+        if directory is self._root:
+            table += self._entry(self.label.ljust(11).encode("ascii"), _ATTR_VOLUME_ID)
+        else:
+            parent = directory.parent
+            # ".." of a directory in the root points to cluster 0
+            parent_cluster = 0 if parent is self._root or not parent else parent.cluster
+            table += self._entry(b".".ljust(11), _ATTR_DIRECTORY, directory.cluster)
+            table += self._entry(b"..".ljust(11), _ATTR_DIRECTORY, parent_cluster)
+        taken = {
+            _pack_short_name(name)
+            for name, _ in directory.entries
+            if fat32.is_short_name(name)
+        }
+        for name, entry in directory.entries:
+            if isinstance(entry, _Directory):
+                attributes, cluster, size = _ATTR_DIRECTORY, entry.cluster, 0
+            else:
+                attributes = _ATTR_ARCHIVE | (_ATTR_READ_ONLY if entry.read_only else 0)
+                cluster = self._file_clusters.get(id(entry), (0, 0))[0]
+                size = entry.size
+            if fat32.is_short_name(name):
+                short_name = _pack_short_name(name)
+            else:
+                short_name = _unique_short_name(name, taken)
+                table += _long_name_entries(name, short_name)
+                taken.add(short_name)
+            table += self._entry(short_name, attributes, cluster, size)
+        return bytes(table.ljust(directory.cluster_count * self.cluster_size, b"\0"))
+
+    def _entry(
+        self, short_name: bytes, attributes: int, cluster: int = 0, size: int = 0
+    ) -> bytes:
+        return _DIR_ENTRY.pack(
+            short_name,
+            attributes,
+            0,
+            0,
+            self._time,
+            self._date,
+            self._date,
+            cluster >> 16,
+            self._time,
+            self._date,
+            cluster & 0xFFFF,
+            size,
+        )
+
+    def _fat(self) -> bytes:
+        fat = bytearray(self.layout.fat_sectors * fat32.SECTOR_SIZE)
+        struct.pack_into("<II", fat, 0, 0x0FFFFF00 | _MEDIA_FIXED, _END_OF_CHAIN)
+        runs = [(d.cluster, d.cluster_count) for d in self._directories()]
+        runs += self._file_clusters.values()
+        for first, count in runs:
+            last = first + count - 1
+            struct.pack_into(
+                f"<{count}I", fat, first * 4, *range(first + 1, last + 1), _END_OF_CHAIN
+            )
+        return bytes(fat)
+
+    def _reserved_region(self) -> bytes:
+        layout = self.layout
+        boot = bytearray(fat32.SECTOR_SIZE)
+        _BOOT_SECTOR.pack_into(
+            boot,
+            0,
+            b"\xeb\x58\x90",
+            b"MSWIN4.1",
+            fat32.SECTOR_SIZE,
+            layout.sectors_per_cluster,
+            layout.reserved_sectors,
+            fat32.FAT_COUNT,
+            0,  # No fixed root directory
+            0,
+            _MEDIA_FIXED,
+            0,
+            63,  # Sectors per track and heads, for old BIOSes only
+            255,
+            self.hidden_sectors,
+            self.sectors,
+            layout.fat_sectors,
+            0,
+            0,
+            _ROOT_CLUSTER,
+            _FSINFO_SECTOR,
+            _BACKUP_BOOT_SECTOR,
+            b"",
+            0x80,
+            0,
+            0x29,
+            self.volume_id,
+            self.label.ljust(11).encode("ascii"),
+            b"FAT32   ",
+        )
+        boot[510:512] = b"\x55\xaa"
+
+        fsinfo = bytearray(fat32.SECTOR_SIZE)
+        struct.pack_into("<I", fsinfo, 0, 0x41615252)
+        struct.pack_into(
+            "<III",
+            fsinfo,
+            484,
+            0x61417272,
+            layout.cluster_count - self.used_clusters,
+            _ROOT_CLUSTER + self.used_clusters,
+        )
+        struct.pack_into("<I", fsinfo, 508, 0xAA550000)
+
+        region = bytearray(layout.reserved_sectors * fat32.SECTOR_SIZE)
+        for sector, data in (
+            (0, boot),
+            (_FSINFO_SECTOR, fsinfo),
+            (_BACKUP_BOOT_SECTOR, boot),
+            (_BACKUP_BOOT_SECTOR + _FSINFO_SECTOR, fsinfo),
+        ):
+            offset = sector * fat32.SECTOR_SIZE
+            region[offset : offset + fat32.SECTOR_SIZE] = data
+        return bytes(region)
+
+    def _build_segments(self) -> list[_Segment]:
+        segments: list[_Segment] = []
+
+        def add(length: int, **kwargs: object) -> None:
+            offset = segments[-1].offset + segments[-1].length if segments else 0
+            segments.append(_Segment(offset, length, **kwargs))  # type: ignore[arg-type]
+
+        reserved = self._reserved_region()
+        add(len(reserved), data=reserved)
+        fat = self._fat()
+        for _ in range(fat32.FAT_COUNT):
+            add(len(fat), data=fat)
+        for directory in self._directories():
+            add(len(directory.table), data=directory.table)
+        for image_file in sorted(
+            (f for f in self.files if id(f) in self._file_clusters),
+            key=lambda f: self._file_clusters[id(f)][0],
+        ):
+            for offset, length in image_file.extents:
+                add(length, source=image_file.source, source_offset=offset)
+            slack = -image_file.size % self.cluster_size
+            if slack:
+                add(slack)
+        return segments
+
+    def _segment_data(
+        self,
+        segment: _Segment,
+        skip: int,
+        length: int,
+        sources: dict[str, BinaryIO],
+        stack: contextlib.ExitStack,
+    ) -> Iterator[bytes]:
+        """Yield *length* bytes of *segment* from *skip* on."""
+        if segment.data is not None:
+            yield segment.data[skip : skip + length]
+        elif segment.source is None:
+            yield bytes(length)
+        else:
+            source = sources.get(segment.source)
+            if source is None:
+                # Closed by *stack*, once the whole range is produced
+                source = stack.enter_context(Path(segment.source).open("rb"))  # noqa: SIM115
+                sources[segment.source] = source
+            source.seek(segment.source_offset + skip)
+            while length > 0:
+                data = source.read(min(length, _READ_SIZE))
+                if not data:
+                    msg = f"{segment.source} ended before the image's data"
+                    raise OSError(msg)
+                length -= len(data)
+                yield data
+
+    def _cluster_offset(self, cluster: int) -> int:
+        sector = self.layout.data_start + (cluster - _ROOT_CLUSTER) * (
+            self.layout.sectors_per_cluster
+        )
+        return sector * fat32.SECTOR_SIZE
+
+
+def write_saved_image(image_file: Path, write: Callable[[bytes], object]) -> Fat32Image:
+    """
+    Produce an image saved with Fat32Image.save(), keeping count of the bytes.
+
+    The count is kept in a file next to *image_file*, so that
+    follow_write_progress can report it from another process (the elevated
+    helper writes the image).
+
+    Args:
+        image_file: Saved image
+        write: Called with consecutive chunks of the volume
+
+    Returns:
+        The image
+    """
+    image = Fat32Image.load(image_file)
+    progress_file = _progress_file(image_file)
+    written = 0
+    last_saved = 0.0
+
+    def write_and_count(data: bytes) -> None:
+        nonlocal written, last_saved
+        write(data)
+        written += len(data)
+        now = time.monotonic()
+        if now - last_saved >= DEFAULT_PROGRESS_INTERVAL:
+            last_saved = now
+            _save_progress(progress_file, written)
+
+    image.write(write_and_count)
+    _save_progress(progress_file, written)
+    return image
+
+
+@contextlib.contextmanager
+def follow_write_progress(
+    image_file: Path, on_progress: Callable[[int], None]
+) -> Iterator[None]:
+    """
+    Report the progress of write_saved_image(*image_file*) during the block.
+
+    Args:
+        image_file: Saved image being written
+        on_progress: Called from a polling thread with the bytes written so
+            far, whenever they have grown
+    """
+    progress_file = _progress_file(image_file)
+    progress_file.unlink(missing_ok=True)
+    stop = threading.Event()
+
+    def poll() -> None:
+        reported = 0
+        while True:
+            stopping = stop.wait(DEFAULT_PROGRESS_INTERVAL)
+            written = _load_progress(progress_file)
+            if written > reported:
+                reported = written
+                on_progress(written)
+            if stopping:
+                return
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        progress_file.unlink(missing_ok=True)
+
+
+def _progress_file(image_file: Path) -> Path:
+    return image_file.with_name(image_file.name + ".progress")
+
+
+def _save_progress(progress_file: Path, written: int) -> None:
+    # Replaced whole, so it is never read half-written; progress is best effort
+    tmp_file = progress_file.with_name(progress_file.name + ".tmp")
+    with contextlib.suppress(OSError):
+        tmp_file.write_text(str(written), encoding="ascii")
+        tmp_file.replace(progress_file)
+
+
+def _load_progress(progress_file: Path) -> int:
+    try:
+        return int(progress_file.read_text(encoding="ascii"))
+    except (OSError, ValueError):
+        return 0
+
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    """Get the (date, time) words of *timestamp* in local time."""
+    t = time.localtime(max(timestamp, 315532800))  # Not before 1980
+    date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return date, (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+
+
+def _pack_short_name(name: str) -> bytes:
+    base, _, extension = name.partition(".")
+    return (base.ljust(8) + extension.ljust(3)).encode("ascii")
+
+
+def _unique_short_name(name: str, taken: set[bytes]) -> bytes:
+    """Make the ``BASIS~N.EXT`` short name of a long name, unique in *taken*."""
+    base, dot, extension = name.lstrip(". ").rpartition(".")
+    if not dot:
+        base, extension = extension, ""
+
+    def clean(part: str) -> str:
+        return "".join(
+            char if char in _SHORT_NAME_CHARS else "_"
+            for char in part.upper()
+            if char not in " ."
+        )
+
+    base, extension = clean(base) or "_", clean(extension)[:3]
+    for number in range(1, 1_000_000):
+        tail = f"~{number}"
+        candidate = _pack_short_name(f"{base[: 8 - len(tail)]}{tail}.{extension}")
+        if candidate not in taken:
+            return candidate
+    msg = f"No short name left for {name}"
+    raise ValueError(msg)
+
+
+def _long_name_entries(name: str, short_name: bytes) -> bytes:
+    """Get the long file name entries of *name*, in the order they're stored."""
+    checksum = 0
+    for byte in short_name:
+        checksum = (((checksum & 1) << 7) + (checksum >> 1) + byte) & 0xFF
+    units = name.encode("utf-16-le")
+    count = -(-len(units) // (2 * _LFN_CHARS))
+    # NUL terminated unless the name fills the last entry, then padded with 0xFFFF
+    padded = units if len(units) % (2 * _LFN_CHARS) == 0 else units + b"\0\0"
+    padded = padded.ljust(count * 2 * _LFN_CHARS, b"\xff")
+    entries = []
+    for index in range(count):
+        part = padded[index * 2 * _LFN_CHARS : (index + 1) * 2 * _LFN_CHARS]
+        order = index + 1 | (0x40 if index == count - 1 else 0)
+        entries.append(
+            struct.pack(
+                "<B10sBBB12sH4s",
+                order,
+                part[:10],
+                _ATTR_LONG_NAME,
+                0,
+                checksum,
+                part[10:22],
+                0,
+                part[22:26],
+            )
+        )
+    return b"".join(reversed(entries))
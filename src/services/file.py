@@ -4,10 +4,17 @@ Handles file operations, hashing, copying, etc.
 """
 
 import os
+import shutil
+from collections.abc import Callable
 from pathlib import Path
 from urllib.parse import urlparse
 
-import requers
+from services import chunk_manifest, extent_copy, iso_store
+from services.chunk_manifest import ChunkManifest, discard_manifest
+from services.download_backend import get_backend
+from services.hash_cache import get_hash_cache
+
+COPY_STEP_SIZE = 64 * 1024 * 1024  # Bytes copied between progress reports
 
 
 def get_sha256_hash(file_path: str) -> str:
@@ -20,7 +27,30 @@ def get_sha256_hash(file_path: str) -> str:
     Returns:
         SHA256 hash as hexadecimal string
     """
-    return requers.hash_file(file_path)
+    return get_backend().hash_file(Path(file_path))
+
+
+def get_cached_sha256_hash(file_path: str) -> str:
+    """
+    Get the SHA256 hash of a file, reusing a cached result if it is unchanged.
+
+    A file whose size, modification time and file ID match the verified-hash
+    cache is not read at all. Otherwise it is hashed and the cache updated.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        SHA256 hash as lowercase hexadecimal string
+    """
+    cache = get_hash_cache()
+    cached = cache.lookup(Path(file_path))
+    if cached:
+        return cached
+
+    file_hash = get_sha256_hash(file_path).lower()
+    cache.store(Path(file_path), file_hash)
+    return file_hash
 
 
 def set_file_readonly(filepath: str, is_readonly: bool) -> None:
@@ -37,6 +67,50 @@ def set_file_readonly(filepath: str, is_readonly: bool) -> None:
         Path(filepath).chmod(0o666)  # Read-write
 
 
+def copy_file(
+    source: Path, target: Path, on_copied: Callable[[int], None] | None = None
+) -> None:
+    """
+    Copy a file's data and modification time, reporting progress as it goes.
+
+    Args:
+        source: File to copy
+        target: Where to copy it (replaced if it exists)
+        on_copied: Called with the number of bytes of each copied step
+    """
+    size = source.stat().st_size
+    with source.open("rb") as src, target.open("wb") as dst:
+        for offset in range(0, size, COPY_STEP_SIZE):
+            length = min(COPY_STEP_SIZE, size - offset)
+            extent_copy.copy_range(src, dst, offset, length)
+            if on_copied:
+                on_copied(length)
+    shutil.copystat(source, target)
+
+
+def copy_tree(
+    source: Path, target: Path, on_copied: Callable[[int], None] | None = None
+) -> None:
+    """
+    Copy a directory tree into *target*, reporting progress as it goes.
+
+    Args:
+        source: Directory to copy
+        target: Directory to copy into (merged with what's there)
+        on_copied: Called with the number of bytes of each copied step
+    """
+
+    def copy_function(src: str, dst: str) -> None:
+        copy_file(Path(src), Path(dst), on_copied)
+
+    shutil.copytree(source, target, copy_function=copy_function, dirs_exist_ok=True)
+
+
+def get_tree_size(path: Path) -> int:
+    """Get the total size of the files under *path* (0 if it doesn't exist)."""
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
 def get_file_name_from_url(url: str) -> str:
     """
     Extract filename from a URL.
@@ -68,23 +142,57 @@ def find_file_by_name(name: str, lookup_dir: str) -> str | None:
     return None
 
 
-def check_valid_existing_file(file_path: str, file_hash: str) -> bool | None:
+def repair_file(file_path: str, file_hash: str, url: str) -> bool:
+    """
+    Try to fix a file that fails its hash by re-fetching only its damaged chunks.
+
+    Needs a verified chunk manifest recorded when the file was downloaded.
+
+    Args:
+        file_path: Path to the file to repair
+        file_hash: Expected SHA256 hash
+        url: URL the file was downloaded from
+
+    Returns:
+        True if the file now matches file_hash
+    """
+    manifest = ChunkManifest.load(Path(file_path))
+    if manifest is None or not manifest.verified:
+        return False
+    # Damaged chunks are rewritten in place
+    iso_store.detach_from_store(Path(file_path))
+    result = chunk_manifest.repair_file(Path(file_path), url, file_hash, manifest)
+    if result is None:
+        return False
+    get_hash_cache().store(Path(file_path), result.sha256)
+    return True
+
+
+def check_valid_existing_file(
+    file_path: str, file_hash: str, url: str | None = None
+) -> bool | None:
     """
     Check if a file exists and has the correct hash.
 
     Args:
         file_path: Path to the file to check
         file_hash: Expected SHA256 hash
+        url: Optional URL the file came from, used to repair damaged chunks
+            instead of removing the file
 
     Returns:
-        True if file exists and hash matches,
+        True if file exists and hash matches (possibly after a repair),
         False if file doesn't exist,
         None if file exists but hash doesn't match (file is removed)
     """
     if not Path(file_path).is_file():
         return False
 
-    if get_sha256_hash(file_path).lower() == file_hash.lower():
+    if get_cached_sha256_hash(file_path) == file_hash.lower():
+        return True
+    if url and repair_file(file_path, file_hash, url):
         return True
+    get_hash_cache().forget(Path(file_path))
     Path(file_path).unlink()
+    discard_manifest(Path(file_path))
     return None
@@ -0,0 +1,123 @@
+"""
+Persistent cache of verified file hashes.
+Lets a file that was hashed before be accepted instantly on the next launch,
+as long as its size, modification time and file ID are unchanged.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+_CACHE_FILE_NAME = "verified_hashes.json"
+
+
+def file_fingerprint(path: Path) -> dict[str, int | str]:
+    """Get the metadata that must be unchanged for a cached hash to apply."""
+    st = path.stat()
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        # st_ino is the NTFS file index on Windows, so replacing the file
+        # with another one of the same size and mtime still invalidates it
+        "file_id": f"{st.st_dev}:{st.st_ino}",
+    }
+
+
+class VerifiedHashCache:
+    """On-disk map of file path -> (fingerprint, sha256)."""
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        # When set, lookups always miss so every file is fully rehashed
+        self.reverify = False
+        self._entries: dict[str, dict] | None = None
+        self._lock = threading.Lock()
+
+    def lookup(self, path: Path) -> str | None:
+        """
+        Get the cached SHA256 of *path* if the file is unchanged since it was hashed.
+
+        Args:
+            path: File to look up
+
+        Returns:
+            Lowercase hex digest, or None if unknown, changed or reverifying
+        """
+        if self.reverify:
+            return None
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._load().get(_key(path))
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        logging.debug(f"Using cached hash for {path}")
+        return entry["sha256"]
+
+    def store(self, path: Path, sha256: str) -> None:
+        """Remember that *path*, as it is on disk now, hashes to *sha256*."""
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            return
+        with self._lock:
+            self._load()[_key(path)] = {
+                "fingerprint": fingerprint,
+                "sha256": sha256.lower().strip(),
+            }
+            self._save()
+
+    def forget(self, path: Path) -> None:
+        """Drop the entry for *path*, if any."""
+        with self._lock:
+            if self._load().pop(_key(path), None) is not None:
+                self._save()
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.cache_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(self._entries, indent=1), encoding="utf-8")
+            tmp_file.replace(self.cache_file)
+        except OSError as e:
+            logging.warning(f"Could not save hash cache {self.cache_file}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
+
+
+def _key(path: Path) -> str:
+    return os.path.normcase(str(Path(path).resolve()))
+
+
+# Global cache instance (lives next to the downloads it describes)
+_hash_cache: VerifiedHashCache | None = None
+
+
+def get_hash_cache() -> VerifiedHashCache:
+    """Get the global verified-hash cache."""
+    global _hash_cache
+    if _hash_cache is None:
+        from core.settings import get_config
+
+        _hash_cache = VerifiedHashCache(get_config().paths.work_dir / _CACHE_FILE_NAME)
+    return _hash_cache
+
+
+def set_hash_cache(cache: VerifiedHashCache) -> None:
+    """Set the global verified-hash cache (for testing)."""
+    global _hash_cache
+    _hash_cache = cache
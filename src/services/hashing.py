@@ -0,0 +1,98 @@
+"""
+Streaming hash computation.
+Hashes a file incrementally while it is being downloaded, so the finished
+file never has to be read back from disk just to verify it.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from services.chunk_manifest import ChunkRecorder
+
+READ_BACK_CHUNK_SIZE = 1024 * 1024
+
+
+class StreamingHasher:
+    """
+    Incremental SHA-256 of a file that is being written.
+
+    Bytes are consumed strictly in file order. Writers hand over data that is
+    still in memory with :meth:`feed`; anything that arrived out of order (or
+    before the hasher existed, e.g. a resumed download's prefix) is picked up
+    by :meth:`advance_to`, which reads it back while it is still in the OS
+    page cache.
+
+    An optional ChunkRecorder is fed with the same bytes, so the per-chunk
+    manifest costs no extra reads either.
+    """
+
+    def __init__(self, filepath: Path, recorder: "ChunkRecorder | None" = None):
+        self.filepath = filepath
+        self.recorder = recorder
+        self._digest = hashlib.sha256()
+        self._position = 0
+        if self.recorder:
+            self.recorder.reset()
+        self._lock = threading.Lock()
+
+    @property
+    def position(self) -> int:
+        """Number of leading bytes of the file hashed so far."""
+        return self._position
+
+    def feed(self, offset: int, data: bytes | memoryview) -> None:
+        """
+        Hash in-memory data written at *offset*, if it is next in order.
+
+        Data that is not next in order is ignored; :meth:`advance_to` reads
+        it back later.
+        """
+        with self._lock:
+            if offset == self._position:
+                self._update(data)
+
+    def advance_to(self, watermark: int) -> None:
+        """
+        Hash the file up to *watermark*, reading back what wasn't fed.
+
+        Args:
+            watermark: Offset up to which the file content is final
+        """
+        with self._lock:
+            if self._position >= watermark:
+                return
+            try:
+                size = self.filepath.stat().st_size
+            except OSError:
+                return
+            if size < self._position:
+                # File was truncated (e.g. a download restarted from scratch)
+                self._reset()
+
+            with self.filepath.open("rb") as f:
+                f.seek(self._position)
+                while self._position < watermark:
+                    data = f.read(min(READ_BACK_CHUNK_SIZE, watermark - self._position))
+                    if not data:
+                        break  # Not flushed to disk yet; retry on the next call
+                    self._update(data)
+
+    def hexdigest(self) -> str:
+        """Get the digest of everything hashed so far."""
+        with self._lock:
+            return self._digest.hexdigest()
+
+    def _update(self, data: bytes | memoryview) -> None:
+        if self.recorder:
+            self.recorder.update(self._position, data)
+        self._digest.update(data)
+        self._position += len(data)
+
+    def _reset(self) -> None:
+        self._digest = hashlib.sha256()
+        self._position = 0
+        if self.recorder:
+            self.recorder.reset()
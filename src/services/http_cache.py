@@ -0,0 +1,96 @@
+"""
+On-disk cache of JSON API responses.
+Keeps the last body of each URL with its ETag and Last-Modified validators,
+so it can be served instantly and revalidated with a conditional request.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+_CACHE_DIR_NAME = "http_cache"
+
+
+@dataclass
+class CachedResponse:
+    """A cached JSON response and its validators."""
+
+    url: str
+    data: Any
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: float = 0.0  # time.time() of the last successful validation
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Get the headers that make a request conditional on this copy."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """One JSON file per cached URL."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def load(self, url: str) -> CachedResponse | None:
+        """Get the cached response for *url*, if any."""
+        try:
+            with self._lock:
+                entry = json.loads(self._path_for(url).read_text(encoding="utf-8"))
+            return CachedResponse(**entry)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, response: CachedResponse) -> None:
+        """Store *response*, replacing any previous copy atomically."""
+        path = self._path_for(response.url)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with self._lock:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_text(json.dumps(asdict(response)), encoding="utf-8")
+                tmp_path.replace(path)
+        except OSError as e:
+            logging.warning(f"Could not cache response of {response.url}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_path.unlink()
+
+    def touch(self, response: CachedResponse) -> None:
+        """Record that *response* was just revalidated unchanged."""
+        response.fetched_at = time.time()
+        self.save(response)
+
+    def _path_for(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
+
+
+# Global cache instance
+_http_cache: HttpCache | None = None
+
+
+def get_http_cache() -> HttpCache:
+    """Get the global HTTP response cache."""
+    global _http_cache
+    if _http_cache is None:
+        from core.settings import get_config
+
+        _http_cache = HttpCache(get_config().paths.work_dir / _CACHE_DIR_NAME)
+    return _http_cache
+
+
+def set_http_cache(cache: HttpCache) -> None:
+    """Set the global HTTP response cache (for testing)."""
+    global _http_cache
+    _http_cache = cache
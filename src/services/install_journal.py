@@ -0,0 +1,116 @@
+"""
+Journal of an installation's completed stages.
+Written to work_dir after every stage, so an installation interrupted by a
+crash or a reboot can be resumed: on the next start, each stage completed
+before is validated cheaply and skipped instead of being redone.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import asdict
+from pathlib import Path
+
+from models.installation_context import InstallationContext
+
+_JOURNAL_FILE_NAME = "install_journal.json"
+_JOURNAL_VERSION = 1
+
+
+def installation_key(context: InstallationContext) -> str:
+    """
+    Identify an installation by what it installs and how it partitions.
+
+    The temporary partition's size is left out: it is re-predicted on every
+    launch, and the prediction improves once the images are indexed.
+    """
+    partition = asdict(context.partition)
+    partition.pop("tmp_part_size")
+    identity = {
+        "files": [[f.file_name, f.expected_hash] for f in context.downloadable_files],
+        "partition": partition,
+        "method": context.kickstart.partitioning.method,
+    }
+    encoded = json.dumps(identity, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class InstallJournal:
+    """On-disk record of the completed stages of one installation."""
+
+    def __init__(self, journal_file: Path, key: str):
+        """
+        Open the journal of the installation identified by *key*.
+
+        A journal left by another installation (other images or options) is
+        ignored, and replaced once a stage completes.
+
+        Args:
+            journal_file: Where the journal is kept
+            key: installation_key of the installation
+        """
+        self.journal_file = journal_file
+        self.key = key
+        self._stages: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        try:
+            saved = json.loads(journal_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if saved.get("version") == _JOURNAL_VERSION and saved.get("key") == key:
+            self._stages = saved["stages"]
+        else:
+            logging.info("Ignoring the journal of a different installation")
+
+    @classmethod
+    def for_context(cls, context: InstallationContext) -> "InstallJournal":
+        """Open the journal of *context*'s installation in its work_dir."""
+        return cls(
+            Path(context.paths.work_dir) / _JOURNAL_FILE_NAME,
+            installation_key(context),
+        )
+
+    @property
+    def stages(self) -> list[str]:
+        """Names of the completed stages, in the order they completed."""
+        with self._lock:
+            return list(self._stages)
+
+    def completed(self, stage: str) -> dict | None:
+        """Get what *stage* recorded when it completed, or None if it didn't."""
+        with self._lock:
+            return self._stages.get(stage)
+
+    def record(self, stage: str, data: dict | None = None) -> None:
+        """Record that *stage* completed, with what is needed to skip it."""
+        with self._lock:
+            self._stages.pop(stage, None)
+            self._stages[stage] = data or {}
+            self._save()
+
+    def forget(self, stage: str) -> None:
+        """Drop the record of *stage*, whose results are gone."""
+        with self._lock:
+            if self._stages.pop(stage, None) is not None:
+                self._save()
+
+    def clear(self) -> None:
+        """Delete the journal, once the installation is done or rolled back."""
+        with self._lock:
+            self._stages.clear()
+            with contextlib.suppress(OSError):
+                self.journal_file.unlink()
+
+    def _save(self) -> None:
+        tmp_file = self.journal_file.with_name(self.journal_file.name + ".tmp")
+        journal = {"version": _JOURNAL_VERSION, "key": self.key, "stages": self._stages}
+        try:
+            self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(journal, indent=1), encoding="utf-8")
+            tmp_file.replace(self.journal_file)
+        except OSError as e:
+            logging.warning(f"Could not save install journal {self.journal_file}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
@@ -9,35 +9,182 @@ import logging
 import os
 import shutil
 import stat
+import threading
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from functools import partial
 from pathlib import Path
 
 from core.settings import get_config
 from core.state import get_state
-from models.downloadable_file import DownloadableFile
+from models.downloadable_file import LIVE_SQUASHFS_PATH, DownloadableFile
 from models.installation_context import (
     InstallationContext,
     InstallationResult,
     InstallationStage,
 )
 from models.partition import PartitioningMethod
-from services import config_builders, disk, elevated
+from models.spin import Spin
+from services import config_builders, disk, elevated, fat32, storage
 from services import file as file_service
-from services.disk import Partition
-from services.download import DownloadProgress, download_file
-from services.partition import partition_procedure
+from services.bandwidth import BandwidthScheduler, Transfer
+from services.download import (
+    DownloadProgress,
+    HashVerificationError,
+    download_file,
+    stream_download,
+)
+from services.fat32_image import Fat32Image, ImageFile, follow_write_progress
+from services.hash_cache import file_fingerprint, get_hash_cache
+from services.install_journal import InstallJournal
+from services.iso9660 import IsoStreamExtractor, get_iso_image
+from services.iso_index import get_iso_index
+from services.iso_store import get_iso_store
+from services.partition import PartitioningResult, partition_procedure
+from services.progress import ByteProgress
+from services.remote_iso import open_remote_iso
+from services.stages import (
+    Stage,
+    StageScheduler,
+    count_stage_io,
+    current_stage,
+    get_stage_timings,
+)
+from utils import format_bytes, format_eta, format_speed
+
+# Bandwidth share of the file needed first, relative to the others
+PRIMARY_DOWNLOAD_WEIGHT = 4.0
+# Concurrent file writers when extracting onto a drive of each media type
+EXTRACT_WORKERS_BY_MEDIA = {"ssd": 8, "hdd": 2, "unknown": 4}
+# Files assumed in the images when sizing the partition before they're indexed
+UNINDEXED_IMAGE_FILE_COUNT = 2000
+# Expected speeds of the installation stages, until they have been measured
+DEFAULT_DOWNLOAD_RATE = 10 * 1024 * 1024  # bytes/s, unless rate limited
+DEFAULT_COPY_RATE = 100 * 1024 * 1024  # bytes/s
+DEFAULT_STAGE_SECONDS = {
+    "prepare_efi": 2.0,
+    "partition": 30.0,
+    "render_configs": 1.0,
+    "fit_partition": 1.0,
+    "boot_entry": 3.0,
+}
+
+
+def _is_liveos_path(iso_path: str) -> bool:
+    return iso_path.startswith("/LiveOS/")
+
+
+# Files written next to the images on the temporary partition, with room to
+# spare: the GRUB config, the kickstart entries and their includes
+_GENERATED_FILES = {
+    "/EFI/BOOT/grub.cfg": 64 * 1024,
+    "/ks.cfg": 64 * 1024,
+    "/autoinstall.ks": 64 * 1024,
+    "/ks_includes/autoinstall.ks": 64 * 1024,
+    **{f"/ks_includes/autoinstall_incl/section-{i}.ks": 64 * 1024 for i in range(8)},
+}
+# Created by Windows on every FAT volume it mounts
+_WINDOWS_SYSTEM_FILES = {
+    "/System Volume Information/IndexerVolumeGuid": 76,
+    "/System Volume Information/WPSettings.dat": 12,
+}
+
+
+def get_indexed_partition_size(
+    installer_hash: str, live_hash: str | None = None
+) -> int | None:
+    """
+    Get the exact size of the temporary partition, from the ISO index.
+
+    It holds every file of the installer image, plus the live image's
+    LiveOS directory for a live image installation.
+
+    Args:
+        installer_hash: SHA256 of the installer image
+        live_hash: SHA256 of the live image, if there is one
+
+    Returns:
+        Size in bytes, or None if an image isn't indexed
+    """
+    index = get_iso_index()
+    installer_files = index.lookup(installer_hash)
+    if installer_files is None:
+        return None
+    tree = {path: iso_file.size for path, iso_file in installer_files.items()}
+    if live_hash is not None:
+        live_files = index.lookup(live_hash)
+        if live_files is None:
+            return None
+        tree.update(
+            (path, iso_file.size)
+            for path, iso_file in live_files.items()
+            if _is_liveos_path(path)
+        )
+    return get_tmp_partition_size(tree)
+
+
+def get_tmp_partition_size(image_tree: dict[str, int]) -> int:
+    """
+    Get the size of a FAT32 temporary partition holding the image files.
+
+    That is the smallest FAT32 volume holding them.
+
+    Args:
+        image_tree: Path on the partition of every file from the images ->
+            its size; the install helpers and generated files are added
+
+    Returns:
+        Size in bytes
+    """
+    tree = {**image_tree, **_added_partition_files()}
+    return fat32.tree_volume_size(tree)
+
+
+def _added_partition_files() -> dict[str, int]:
+    """Get the files put on the temporary partition besides the images'."""
+    files = {**_GENERATED_FILES, **_WINDOWS_SYSTEM_FILES}
+    helpers_dir = get_config().paths.install_helpers_dir
+    if helpers_dir.exists():
+        files.update(
+            (
+                f"/install-helpers/{path.relative_to(helpers_dir).as_posix()}",
+                path.stat().st_size,
+            )
+            for path in helpers_dir.rglob("*")
+            if path.is_file()
+        )
+    return files
+
+
+def predict_tmp_partition_size(spin: Spin, installer_spin: Spin | None = None) -> int:
+    """
+    Predict the size of the temporary partition for installing a spin.
 
+    Exact when the images are in the ISO index, estimated from the
+    published image sizes otherwise.
 
-class HashVerificationError(Exception):
-    """Raised when file hash verification fails."""
+    Args:
+        spin: Spin to install
+        installer_spin: Netinstall spin providing the installer of a live image
 
-    def __init__(self, file_path: str, expected: str, actual: str):
-        self.file_path = file_path
-        self.expected = expected
-        self.actual = actual
-        super().__init__(
-            f"Hash mismatch for {file_path}: expected {expected}, got {actual}"
+    Returns:
+        Size in bytes
+    """
+    if spin.is_live_img and installer_spin:
+        size = get_indexed_partition_size(installer_spin.hash256, spin.hash256)
+        image_size = spin.size + installer_spin.size
+    else:
+        size = get_indexed_partition_size(spin.hash256)
+        image_size = spin.size
+    if size is None:
+        # The images' contents are smaller than the images themselves
+        added_files = _added_partition_files()
+        size = fat32.estimate_volume_size(
+            image_size + sum(added_files.values()),
+            UNINDEXED_IMAGE_FILE_COUNT + len(added_files),
         )
+    return int(size)
 
 
 def _handle_remove_readonly(func, path: str, _exc) -> None:  # type: ignore[no-untyped-def]
@@ -61,69 +208,41 @@ def _force_delete_directory(dir_path: str) -> None:
         shutil.rmtree(dir_path, onexc=_handle_remove_readonly)
 
 
-def _create_boot_entry(efi_partition: Partition) -> int:
-    """Create boot entry. Requires elevated privileges."""
-    import uuid
-
-    import firmware_variables as fwvars
-
-    if not efi_partition:
-        msg = "Could not get EFI partition information"
-        raise RuntimeError(msg)
-
-    # Find the entry with "Windows Boot Manager" to duplicate
-    windows_entry_id = None
-    with fwvars.adjust_privileges():
-        for entry_id in fwvars.get_boot_order():
-            entry = fwvars.get_parsed_boot_entry(entry_id)
-            if "windows boot manager" in entry.description.lower():
-                windows_entry_id = entry_id
-                break
-        if windows_entry_id is None:
-            msg = "Windows Boot Manager entry not found"
-            raise RuntimeError(msg)
-
-        # Duplicate the entry
-        new_entry = fwvars.get_parsed_boot_entry(windows_entry_id)
-        new_entry.description = "WinGone Installer"
-        new_entry.optional_data = b""
-
-        # Edit the duplicate entry to point to our EFI file on EFI partition
-        for path in new_entry.file_path_list.paths:
-            if path.is_file_path():
-                path.set_file_path("\\EFI\\wingone\\BOOT\\BOOTX64.EFI")
-            elif path.is_hard_drive():
-                hd_node = path.get_hard_drive_node()
-                if hd_node:
-                    # Set to EFI partition instead of temp partition
-                    hd_node.partition_guid = efi_partition.partition_guid
-                    hd_node.partition_number = efi_partition.partition_number
-                    hd_node.partition_start_lba = efi_partition.start_lba
-                    hd_node.partition_size_lba = efi_partition.size_lba
-                    hd_node.partition_signature = uuid.UUID(
-                        efi_partition.partition_guid
-                    ).bytes_le
-                    path.set_hard_drive_node(hd_node)
-
-        # Find an unused entry_id for the new entry
-        new_entry_id = None
-        for i in range(50):
-            try:
-                fwvars.get_boot_entry(i)
-            except OSError as e:
-                if hasattr(e, "winerror") and e.winerror == 203:
-                    new_entry_id = i
-                    break
-                # else: skip unknown errors
-        if new_entry_id is None:
-            new_entry_id = 16  # fallback
+def _tree_manifest(directory: str) -> dict[str, int]:
+    """Get the size of every file under *directory*, by relative POSIX path."""
+    root = Path(directory)
+    manifest = {}
+    for dir_path, dir_names, file_names in os.walk(directory):
+        if Path(dir_path) == root:
+            # Written by Windows, and not readable
+            dir_names[:] = [d for d in dir_names if d != "System Volume Information"]
+        for name in file_names:
+            path = Path(dir_path) / name
+            manifest[path.relative_to(root).as_posix()] = path.stat().st_size
+    return manifest
+
+
+def _local_image_files(directory: Path, prefix: str) -> list[ImageFile]:
+    """Get the files under a local directory, to put under *prefix* in an image."""
+    if not directory.exists():
+        return []
+    return [
+        ImageFile.from_file(
+            f"{prefix}/{path.relative_to(directory).as_posix()}",
+            path,
+            read_only=not path.stat().st_mode & stat.S_IWRITE,
+        )
+        for path in sorted(directory.rglob("*"))
+        if path.is_file()
+    ]
 
-        fwvars.set_parsed_boot_entry(new_entry_id, new_entry)
 
-        # Set the new entry as BootNext
-        fwvars.set_boot_next(new_entry_id)
+class _StageFailedError(Exception):
+    """A scheduled stage returned a failed InstallationResult."""
 
-    return new_entry_id
+    def __init__(self, result: InstallationResult):
+        super().__init__(result.error_message)
+        self.result = result
 
 
 class InstallationService:
@@ -150,51 +269,62 @@ class InstallationService:
         self.state = get_state()
         self.progress_callback = progress_callback
         self.download_callback = download_callback
-        self._download_index: int = 0
+        # Per-file (downloaded, total) bytes of the running downloads
+        self._file_progress: dict[int, tuple[int, int]] = {}
+        self._progress_lock = threading.Lock()
+        # Bandwidth scheduler of the running downloads, to cancel them
+        self._scheduler: BandwidthScheduler | None = None
+        self._downloads_cancelled = threading.Event()
+        # Scheduler of the running installation, and its stage downloading
+        self._stage_scheduler: StageScheduler | None = None
+        self._download_stage: Stage | None = None
+        # Completed stages of the running installation, to resume it
+        self._journal: InstallJournal | None = None
+        # Stages of the last installation, with what they measured
+        self.stages: list[Stage] = []
 
     def install(self, context: InstallationContext) -> InstallationResult:
         """
         Execute the complete installation process.
 
+        The installation runs as a graph of stages (see _installation_stages).
+        If any of them fails, the partitions created so far are removed.
+        Completed stages are journaled in work_dir: if the app is closed or
+        crashes, the next installation of the same images with the same
+        options resumes after them.
+
         Args:
             context: Type-safe installation context with all needed data
 
         Returns:
             InstallationResult indicating success/failure and details
         """
+        results: dict[str, InstallationResult] = {}
+        journal = InstallJournal.for_context(context)
+        self._journal = journal
         try:
+            resumed = journal.stages
+            if resumed:
+                logging.info(f"Resuming the installation after: {', '.join(resumed)}")
             self._update_progress(
                 context,
                 InstallationStage.INITIALIZING,
                 0,
-                "Initializing installation...",
+                "Resuming interrupted installation..."
+                if resumed
+                else "Initializing installation...",
             )
 
             # Prepare work directory
             Path(context.paths.work_dir).mkdir(parents=True, exist_ok=True)
 
-            # Download required files
-            download_result = self._download_files(context)
-            if not download_result.success:
-                return download_result
-
-            # Recalculate partition size if live image installation
-            self._update_tmp_partition_size(context)
-
-            # Execute partitioning
-            partition_result = self._setup_partitioning(context)
-            if not partition_result.success:
-                return partition_result
-
-            # Copy installation files
-            copy_result = self._copy_installation_files(context)
-            if not copy_result.success:
-                return copy_result
-
-            # Create boot entry
-            boot_result = self._create_boot_entry(context)
-            if not boot_result.success:
-                return boot_result
+            self._downloads_cancelled.clear()
+            self.stages = self._installation_stages(context, results)
+            self._stage_scheduler = StageScheduler(self.stages, get_stage_timings())
+            try:
+                self._stage_scheduler.run()
+            finally:
+                self._stage_scheduler = None
 
             self._update_progress(
                 context,
@@ -202,11 +332,19 @@ class InstallationService:
                 100,
                 "Installation completed successfully!",
             )
-            return InstallationResult.success_result(boot_result.boot_entry_created)
+            journal.clear()
+            return InstallationResult.success_result(
+                results["boot_entry"].boot_entry_created
+            )
 
         except Exception as e:
-            logging.exception("Installation failed")
-            error_msg = f"Unexpected error during installation: {e!s}"
+            if isinstance(e, _StageFailedError):
+                failed_stage = e.result.stage_completed
+                error_msg = e.result.error_message or "Installation failed"
+            else:
+                logging.exception("Installation failed")
+                failed_stage = context.current_stage
+                error_msg = f"Unexpected error during installation: {e!s}"
 
             # Cleanup temporary partition if it was created
             cleanup_error = None
@@ -219,46 +357,345 @@ class InstallationService:
 
             if cleanup_error:
                 error_msg += f"\n\nCleanup also failed: {cleanup_error}"
+            else:
+                # Nothing left to resume; otherwise, the next run checks the
+                # partitions again and rolls them back if need be
+                journal.clear()
+
+            return InstallationResult.error_result(failed_stage, error_msg)
 
-            return InstallationResult.error_result(context.current_stage, error_msg)
+        finally:
+            _force_delete_directory(str(self._generated_dir(context)))
 
-    def _download_files(self, context: InstallationContext) -> InstallationResult:
-        """Download all required files."""
+    def _installation_stages(
+        self, context: InstallationContext, results: dict[str, InstallationResult]
+    ) -> list[Stage]:
+        """
+        Declare the installation as a graph of stages.
+
+        The EFI partition is prepared, the partitions created and the
+        configuration rendered while the images download. The download and
+        copy stages are weighted by the images' size, the others by fixed
+        estimates, until earlier runs have measured them.
+
+        Args:
+            context: Installation context
+            results: Filled with the result of each stage, by name
+        """
+
+        # What completed stages journal, and how that is checked on resume
+        journaled: dict[str, tuple[Callable[[], dict], Callable[[dict], bool]]] = {
+            "prepare_efi": (dict, lambda _data: True),
+            "partition": (
+                partial(self._partitioning_record, context),
+                partial(self._restore_partitions, context),
+            ),
+            "download": (
+                partial(self._downloads_record, context),
+                partial(self._restore_downloads, context),
+            ),
+            "copy": (
+                partial(self._tmp_part_files_record, context),
+                partial(self._restore_tmp_part_files, context),
+            ),
+        }
+        journaled["stream"] = journaled["copy"]
+
+        def checked(name: str, step: Callable[[], InstallationResult]) -> Callable:
+            def run() -> None:
+                results[name] = step()
+                if not results[name].success:
+                    raise _StageFailedError(results[name])
+                if name in journaled and self._journal:
+                    self._journal.record(name, journaled[name][0]())
+
+            return run
+
+        def restore(name: str) -> Callable[[], bool] | None:
+            if name not in journaled or not self._journal:
+                return None
+            journal = self._journal
+
+            def run() -> bool:
+                data = journal.completed(name)
+                return data is not None and journaled[name][1](data)
+
+            return run
+
+        def fixed(
+            name: str,
+            step: Callable[[], InstallationResult],
+            needs: tuple[str, ...] = (),
+            provides: tuple[str, ...] = (),
+        ) -> Stage:
+            return Stage(
+                name,
+                checked(name, step),
+                needs,
+                provides,
+                seconds_per_unit=DEFAULT_STAGE_SECONDS[name],
+                restore=restore(name),
+            )
+
+        images_size = sum(f.size_bytes for f in context.downloadable_files)
+        download_rate = self.config.app.download_rate_limit or DEFAULT_DOWNLOAD_RATE
+        stages = [
+            fixed(
+                "prepare_efi", self._prepare_efi_partition, provides=("efi_partition",)
+            ),
+            fixed(
+                "partition",
+                partial(self._create_partitions, context),
+                provides=("tmp_part",),
+            ),
+            fixed(
+                "render_configs",
+                partial(self._render_config_files, context),
+                needs=("tmp_part",),  # The kickstart names the partitions
+                provides=("configs",),
+            ),
+        ]
+        if self.config.app.stream_iso_to_partition:
+            # The images are extracted onto the partition as they download
+            stages.append(
+                Stage(
+                    "stream",
+                    checked(
+                        "stream", partial(self._stream_installation_files, context)
+                    ),
+                    needs=("tmp_part", "configs", "efi_partition"),
+                    provides=("files",),
+                    work=images_size,
+                    seconds_per_unit=1 / download_rate,
+                    cancel=self._cancel_downloads,
+                    restore=restore("stream"),
+                )
+            )
+        else:
+            stages += [
+                Stage(
+                    "download",
+                    checked("download", partial(self._download_files, context)),
+                    provides=("images",),
+                    work=self._missing_download_size(context),
+                    seconds_per_unit=1 / download_rate,
+                    cancel=self._cancel_downloads,
+                    restore=restore("download"),
+                ),
+                fixed(
+                    "fit_partition",
+                    partial(self._fit_tmp_partition, context),
+                    needs=("images", "tmp_part", "configs"),
+                    provides=("sized_tmp_part",),
+                ),
+                Stage(
+                    "copy",
+                    checked("copy", partial(self._copy_installation_files, context)),
+                    needs=("sized_tmp_part", "configs", "efi_partition"),
+                    provides=("files",),
+                    work=images_size,
+                    seconds_per_unit=1 / DEFAULT_COPY_RATE,
+                    restore=restore("copy"),
+                ),
+            ]
+        stages.append(
+            fixed(
+                "boot_entry",
+                partial(self._create_boot_entry, context),
+                needs=("files",),
+                provides=("boot_entry",),
+            )
+        )
+        return stages
+
+    @staticmethod
+    def _missing_download_size(context: InstallationContext) -> int:
+        """Get the bytes of the images that have no local copy yet."""
+        store = get_iso_store()
+        return sum(
+            f.size_bytes
+            for f in context.downloadable_files
+            if not f.full_path.exists()
+            and not (f.expected_hash and store.lookup(f.expected_hash))
+        )
+
+    def _cancel_downloads(self) -> None:
+        """Stop the running downloads, or the ones about to start."""
+        self._downloads_cancelled.set()
+        if self._scheduler:
+            self._scheduler.cancel()
+
+    @staticmethod
+    def _partitioning_record(context: InstallationContext) -> dict:
+        """Journal the created partitions, to roll them back or reuse them."""
+        return (
+            asdict(context.partitioning_result) if context.partitioning_result else {}
+        )
+
+    def _restore_partitions(self, context: InstallationContext, data: dict) -> bool:
+        """
+        Reuse the partitions an interrupted installation created, if unchanged.
+
+        Partitions that went missing or changed are rolled back instead, so
+        the stage starts over from the original layout.
+        """
+        result = PartitioningResult.from_dict(data)
+        guids = [
+            guid
+            for guid in (
+                result.partition_guids.root_guid,
+                result.partition_guids.boot_guid,
+            )
+            if guid
+        ]
         try:
-            for i, file_info in enumerate(context.downloadable_files):
-                context.current_file_index = i
-
-                # Create destination directory
-                Path(file_info.destination_dir).mkdir(parents=True, exist_ok=True)
-
-                # Check if file already exists with correct hash
-                if file_info.full_path.exists():
-                    self._update_progress(
-                        context,
-                        InstallationStage.VERIFYING_CHECKSUM,
-                        10,
-                        f"Verifying existing file: {file_info.file_name}",
-                    )
-                    if self._verify_file_hash(file_info):
-                        self._download_index += 1
-                        continue  # File is already downloaded and verified
-
-                # Download the file
-                self._download_single_file(file_info)
-
-                # Verify downloaded file
-                if file_info.expected_hash and not self._verify_file_hash(file_info):
-                    actual_hash = file_service.get_sha256_hash(str(file_info.full_path))
-                    raise HashVerificationError(
-                        str(file_info.full_path), file_info.expected_hash, actual_hash
+            for guid in guids:
+                elevated.call(storage.get_partition_by_guid, args=(guid,))
+            tmp_part = elevated.call(
+                storage.get_partition_by_guid, args=(result.tmp_part.partition_guid,)
+            )
+            windows_partition = elevated.call(
+                storage.get_partition_by_guid,
+                args=(result.windows_partition.partition_guid,),
+            )
+            unchanged = (
+                tmp_part.offset == result.tmp_part.offset
+                and tmp_part.size == result.tmp_part.size
+                and windows_partition.size < result.sys_drive_original_size
+            )
+        except Exception as e:
+            logging.warning(f"Partitions of the interrupted installation: {e}")
+            unchanged = False
+
+        if not unchanged:
+            logging.warning(
+                "Partitions of the interrupted installation changed, rolling back"
+            )
+            context.partitioning_result = result
+            self._remove_partitions(context)
+            return False
+
+        logging.info(f"Reusing temporary partition {tmp_part.partition_guid}")
+        result.tmp_part = tmp_part  # With its current volume ID
+        self._use_partitioning_result(context, result)
+        return True
+
+    @staticmethod
+    def _downloads_record(context: InstallationContext) -> dict:
+        """Journal the verified files' hashes and fingerprints."""
+        files = {}
+        for file_info in context.downloadable_files:
+            path = file_info.needed_file_path or file_info.full_path
+            files[file_info.file_name] = {
+                "verified_hash": file_info.verified_hash,
+                "needed_file_path": str(file_info.needed_file_path or ""),
+                "fingerprint": file_fingerprint(path),
+            }
+        return {"files": files}
+
+    @staticmethod
+    def _restore_downloads(context: InstallationContext, data: dict) -> bool:
+        """Trust the files an interrupted installation verified, if unchanged."""
+        records = data["files"]
+        for file_info in context.downloadable_files:
+            record = records.get(file_info.file_name)
+            if not record:
+                return False
+            path = Path(record["needed_file_path"] or file_info.full_path)
+            try:
+                if file_fingerprint(path) != record["fingerprint"]:
+                    return False
+            except OSError:
+                return False
+
+        for file_info in context.downloadable_files:
+            record = records[file_info.file_name]
+            file_info.verified_hash = record["verified_hash"]
+            if record["needed_file_path"]:
+                file_info.needed_file_path = Path(record["needed_file_path"])
+        return True
+
+    @staticmethod
+    def _tmp_part_files_record(context: InstallationContext) -> dict:
+        """Journal the files copied to the temporary partition."""
+        return {"manifest": context.tmp_part_manifest}
+
+    def _restore_tmp_part_files(self, context: InstallationContext, data: dict) -> bool:
+        """
+        Skip the copy if an interrupted installation completed it.
+
+        Every file it copied must still be on the temporary partition, at its
+        size, and the EFI files on the EFI partition.
+        """
+        manifest: dict[str, int] = data["manifest"]
+        if not manifest or not context.tmp_part:
+            return False
+        with context.tmp_part.mount() as destination:
+            found = _tree_manifest(destination)
+        if any(found.get(path) != size for path, size in manifest.items()):
+            return False
+        with self.state.installation.efi_partition.mount() as efi_mount:
+            efi_dst = Path(efi_mount) / "EFI" / "wingone"
+            if not efi_dst.is_dir() or not any(efi_dst.iterdir()):
+                return False
+        context.tmp_part_manifest = manifest
+        return True
+
+    def _download_files(
+        self, context: InstallationContext, stream_to: str | None = None
+    ) -> InstallationResult:
+        """
+        Download all required files concurrently.
+
+        The downloads share one BandwidthScheduler; the first file in
+        ``context.downloadable_files`` is the one the next stage needs first
+        and gets the largest share.
+
+        Args:
+            context: Installation context
+            stream_to: Directory to extract the images into while they
+                download, instead of saving them to work_dir
+        """
+        files = context.downloadable_files
+        scheduler = BandwidthScheduler(self.config.app.download_rate_limit)
+        self._scheduler = scheduler
+        if self._downloads_cancelled.is_set():
+            scheduler.cancel()
+        self._download_stage = current_stage()
+        fetched = self._missing_download_size(context)
+        with self._progress_lock:
+            self._file_progress = {
+                i: (0, file_info.size_bytes) for i, file_info in enumerate(files)
+            }
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(1, len(files)), thread_name_prefix="download"
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        self._fetch_file, context, scheduler, i, file_info, stream_to
                     )
-                self._download_index += 1
+                    for i, file_info in enumerate(files)
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    # Stop the other downloads; their partial files are kept
+                    scheduler.cancel()
+                    raise
+
+            count_stage_io(fetched)
+
+            # Make room for the next version by dropping images not used lately
+            get_iso_store().evict(
+                keep={f.expected_hash for f in files if f.expected_hash}
+            )
 
-            progress = 40  # Downloads complete at 40%
             self._update_progress(
                 context,
                 InstallationStage.VERIFYING_CHECKSUM,
-                progress,
+                100,
                 "All files downloaded and verified",
             )
             return InstallationResult.success_result()
@@ -272,43 +709,399 @@ class InstallationService:
                 InstallationStage.DOWNLOADING, f"Download failed: {e!s}"
             )
 
-    def _update_tmp_partition_size(self, context: InstallationContext) -> None:
-        """Recalculate partition size for live image installations using accurate content sizes."""
-        if not context.is_live_image_installation():
+    def _create_partitions(self, context: InstallationContext) -> InstallationResult:
+        """
+        Create the partitions, sizing the temporary one before the images
+        are downloaded.
+
+        The size is predicted from the spins or the ISO index, and checked by
+        _fit_tmp_partition once the images are there. When streaming, the
+        published image sizes are used as they are.
+        """
+        if not self.config.app.stream_iso_to_partition:
+            self._update_tmp_partition_size(context, measure=False)
+        return self._setup_partitioning(context)
+
+    def _fit_tmp_partition(self, context: InstallationContext) -> InstallationResult:
+        """
+        Re-create the partitions if the downloaded images need more space
+        than was predicted.
+
+        The new partitions have new GUIDs, so the configuration is rendered
+        again.
+        """
+        self._update_tmp_partition_size(context)
+        if (
+            context.tmp_part
+            and context.partition.tmp_part_size <= context.tmp_part.size
+        ):
+            return InstallationResult.success_result()
+
+        logging.info(
+            f"Images need {context.partition.tmp_part_size} bytes, more than "
+            "predicted; re-creating the partitions"
+        )
+        self._remove_partitions(context)
+        partition_result = self._setup_partitioning(context)
+        if not partition_result.success:
+            return partition_result
+        if self._journal:
+            self._journal.record("partition", self._partitioning_record(context))
+        return self._render_config_files(context)
+
+    def _fetch_file(
+        self,
+        context: InstallationContext,
+        scheduler: BandwidthScheduler,
+        index: int,
+        file_info: DownloadableFile,
+        stream_to: str | None = None,
+    ) -> None:
+        """
+        Make one file available, reusing or repairing an existing copy.
+
+        With *stream_to*, the image is extracted into that directory instead:
+        from the verified copy on disk if there is one, otherwise straight
+        from the network.
+        """
+        # Create destination directory
+        Path(file_info.destination_dir).mkdir(parents=True, exist_ok=True)
+
+        if self._reuse_local_file(context, file_info):
+            if stream_to:
+                disk.extract_iso_to_dir(
+                    str(file_info.full_path),
+                    stream_to,
+                    filter_func=self._iso_filter(context, file_info),
+                    workers=self._extract_workers(context),
+                    sha256=file_info.expected_hash,
+                )
+            self._record_needed_file_hash(file_info)
+            self._file_done(context, index, file_info)
             return
 
-        installer_iso_path = context.get_installer_iso_path()
-        live_iso_path = context.get_live_iso_path()
-        if not installer_iso_path or not live_iso_path:
+        weight = PRIMARY_DOWNLOAD_WEIGHT if index == 0 else 1.0
+        progress_callback = partial(self.progress_adapter, context, index)
+        if self._fetch_needed_file(
+            file_info, scheduler, weight, progress_callback, stream_to
+        ):
+            self._file_done(context, index, file_info)
             return
 
-        installer_size = disk.get_iso_contents_size(str(installer_iso_path))
-        squashfs_size = disk.get_file_size_in_iso(
-            str(live_iso_path), "/LiveOS/squashfs.img"
+        # Download the file (verified against the hash computed in-flight)
+        transfer = scheduler.register(file_info.file_name, weight)
+        try:
+            if stream_to:
+                self._stream_single_file(
+                    context, file_info, stream_to, progress_callback, transfer
+                )
+            else:
+                self._download_single_file(file_info, progress_callback, transfer)
+        finally:
+            transfer.close()
+        if not stream_to:
+            self._store_file(file_info)
+        self._record_needed_file_hash(file_info, stream_to)
+        self._file_done(context, index, file_info)
+
+    def _fetch_needed_file(
+        self,
+        file_info: DownloadableFile,
+        scheduler: BandwidthScheduler,
+        weight: float,
+        progress_callback: Callable[[DownloadProgress], None],
+        stream_to: str | None = None,
+    ) -> bool:
+        """
+        Fetch only the file of an image the installation needs, if possible.
+
+        That takes the file's own SHA256, known once its image has been
+        downloaded and verified whole, and a server that serves byte ranges.
+
+        Returns:
+            True if the file is now at ``file_info.needed_file_path``, False
+            if the whole image has to be downloaded instead
+        """
+        local_path = file_info.needed_file_local_path
+        if local_path is None or not file_info.expected_hash:
+            return False
+        expected_hash = get_iso_index().file_hash(
+            file_info.expected_hash, file_info.needed_file
         )
-        total_size = installer_size + squashfs_size
-        # Add 50MB fixed buffer
-        buffer = 50 * 1024 * 1024  # 50MB in bytes
-        new_tmp_part_size = total_size + buffer
-        context.partition.tmp_part_size = new_tmp_part_size
+        if not expected_hash:
+            return False
+        target = local_path
+        if stream_to:
+            target = Path(stream_to) / file_info.needed_file.lstrip("/")
+
+        # Fetched on its own by an earlier run
+        if (
+            local_path.exists()
+            and file_service.get_cached_sha256_hash(str(local_path)) == expected_hash
+        ):
+            if target != local_path:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(local_path, target)
+            file_info.needed_file_path = target
+            return True
+
+        image = open_remote_iso(
+            file_info.download_url, file_info.needed_file, file_info.expected_hash
+        )
+        if image is None or file_info.needed_file not in image.files:
+            return False
+        if file_info.size_bytes and image.size != file_info.size_bytes:
+            logging.warning(
+                f"{file_info.download_url} is {image.size} bytes, expected "
+                f"{file_info.size_bytes}; downloading it whole"
+            )
+            return False
 
-    def _download_single_file(self, file_info: DownloadableFile) -> None:
+        transfer = scheduler.register(file_info.file_name, weight)
+        try:
+            sha256 = image.fetch_file(
+                file_info.needed_file,
+                target,
+                expected_hash,
+                progress_callback,
+                transfer,
+                self.config.app.download_progress_interval,
+            )
+        except (HashVerificationError, RuntimeError) as e:
+            logging.warning(
+                f"Fetching {file_info.needed_file} alone failed ({e}), "
+                "downloading the whole image"
+            )
+            return False
+        finally:
+            transfer.close()
+        get_hash_cache().store(target, sha256)
+        file_info.needed_file_path = target
+        return True
+
+    def _record_needed_file_hash(
+        self, file_info: DownloadableFile, stream_to: str | None = None
+    ) -> None:
+        """
+        Remember the SHA256 of the needed file of a verified image.
+
+        Next time, that file can be fetched and verified without the rest
+        of the image.
+        """
+        if not file_info.needed_file or not file_info.expected_hash:
+            return
+        index = get_iso_index()
+        if index.file_hash(file_info.expected_hash, file_info.needed_file):
+            return
+        try:
+            if stream_to:
+                sha256 = file_service.get_sha256_hash(
+                    str(Path(stream_to) / file_info.needed_file.lstrip("/"))
+                )
+            else:
+                sha256 = get_iso_image(
+                    file_info.full_path, file_info.expected_hash
+                ).hash_file(file_info.needed_file)
+        except (OSError, KeyError, ValueError) as e:
+            logging.warning(f"Could not hash {file_info.needed_file}: {e}")
+            return
+        index.record_file_hash(file_info.expected_hash, file_info.needed_file, sha256)
+
+    def _reuse_local_file(
+        self, context: InstallationContext, file_info: DownloadableFile
+    ) -> bool:
+        """Check for a verified copy of a file in the store or work_dir."""
+        # An identical image may be stored already, whatever it was named
+        store = get_iso_store()
+        if file_info.expected_hash and store.materialize(
+            file_info.expected_hash, file_info.full_path
+        ):
+            file_info.verified_hash = file_info.expected_hash.lower().strip()
+            return True
+
+        # Check if file already exists with correct hash
+        if file_info.full_path.exists():
+            self._update_progress(
+                context,
+                InstallationStage.VERIFYING_CHECKSUM,
+                0,  # Counted in bytes, as the files are done
+                f"Verifying existing file: {file_info.file_name}",
+                self._download_stage,
+            )
+            # Accept it as is, or after re-fetching only its damaged chunks
+            if self._verify_file_hash(file_info) or self._repair_file(file_info):
+                self._store_file(file_info)
+                return True
+        return False
+
+    def _store_file(self, file_info: DownloadableFile) -> None:
+        """Add a verified file to the image store."""
+        if file_info.expected_hash:
+            get_iso_store().add(file_info.full_path, file_info.expected_hash)
+
+    def _file_done(
+        self, context: InstallationContext, index: int, file_info: DownloadableFile
+    ) -> None:
+        """Count a file as fully downloaded."""
+        if file_info.needed_file_path:
+            size = file_info.needed_file_path.stat().st_size
+        elif file_info.full_path.exists():
+            size = file_info.full_path.stat().st_size
+        else:
+            # Streamed without a local copy
+            with self._progress_lock:
+                size = self._file_progress.get(index, (0, file_info.size_bytes))[1]
+        self._set_file_progress(context, index, size, size)
+        if self.download_callback:
+            self.download_callback(index, file_info.file_name, 100.0, 0.0, 0.0)
+
+    def _set_file_progress(
+        self, context: InstallationContext, index: int, downloaded: int, total: int
+    ) -> None:
+        """Record one file's progress and update the context's download totals."""
+        with self._progress_lock:
+            if total <= 0:
+                total = self._file_progress.get(index, (0, 0))[1]
+            self._file_progress[index] = (downloaded, total)
+            context.downloaded_size = sum(d for d, _ in self._file_progress.values())
+            context.total_download_size = sum(
+                t for _, t in self._file_progress.values()
+            )
+            # Weighted into the overall progress, which the GUI shows while
+            # it displays the downloads themselves
+            if self._download_stage and context.total_download_size:
+                self._download_stage.report(
+                    context.downloaded_size / context.total_download_size
+                )
+                if self._stage_scheduler:
+                    context.update_progress(
+                        InstallationStage.DOWNLOADING,
+                        self._stage_scheduler.progress() * 100,
+                    )
+
+    def _update_tmp_partition_size(
+        self, context: InstallationContext, measure: bool = True
+    ) -> None:
+        """
+        Recalculate the temporary partition size from the images' contents.
+
+        The sizes come from the ISO index when the images are known, so this
+        doesn't have to wait for them to be downloaded and parsed.
+
+        Args:
+            context: Installation context
+            measure: Whether the images are downloaded, and may be parsed
+                if they aren't in the ISO index
+        """
+        installer_file = context.get_installer_file()
+        if not installer_file:
+            return
+        live_file = None
+        if context.is_live_image_installation():
+            live_file = context.get_live_file()
+            if not live_file:
+                return
+
+        tmp_part_size = get_indexed_partition_size(
+            installer_file.expected_hash, live_file.expected_hash if live_file else None
+        )
+        if tmp_part_size is None:
+            if not measure:
+                return  # Keep the size predicted from the spins
+            # Parsing the images adds them to the ISO index
+            installer_files = get_iso_image(
+                str(installer_file.full_path), installer_file.expected_hash
+            ).files
+            tree = {path: iso_file.size for path, iso_file in installer_files.items()}
+            if live_file and live_file.needed_file_path:
+                tree[LIVE_SQUASHFS_PATH] = live_file.needed_file_path.stat().st_size
+            elif live_file:
+                live_files = get_iso_image(
+                    str(live_file.full_path), live_file.expected_hash
+                ).files
+                tree.update(
+                    (path, iso_file.size)
+                    for path, iso_file in live_files.items()
+                    if _is_liveos_path(path)
+                )
+            tmp_part_size = get_tmp_partition_size(tree)
+        context.partition.tmp_part_size = tmp_part_size
+
+    def _download_single_file(
+        self,
+        file_info: DownloadableFile,
+        progress_callback: Callable[[DownloadProgress], None],
+        transfer: Transfer | None = None,
+    ) -> None:
         """Download a single file with progress tracking."""
 
         # Use the new download service
-        download_file(
+        downloaded = download_file(
             url=file_info.download_url,
             destination=file_info.destination_dir,
             filename=file_info.file_name,
             expected_hash=file_info.expected_hash,
-            progress_callback=self.progress_adapter,
+            progress_callback=progress_callback,
+            segments=self.config.app.download_segments,
+            transfer=transfer,
+            mirror_count=self.config.app.mirror_race_count,
+            min_speed=self.config.app.mirror_min_speed,
+            progress_interval=self.config.app.download_progress_interval,
         )
+        file_info.verified_hash = downloaded.sha256
 
-    def progress_adapter(self, progress: DownloadProgress) -> None:
+    def _stream_single_file(
+        self,
+        context: InstallationContext,
+        file_info: DownloadableFile,
+        destination: str,
+        progress_callback: Callable[[DownloadProgress], None],
+        transfer: Transfer | None = None,
+    ) -> None:
+        """Extract an image into *destination* as it downloads."""
+        extractor = IsoStreamExtractor(
+            Path(destination),
+            self._iso_filter(context, file_info),
+            spill_dir=Path(destination),
+        )
+        try:
+            file_info.verified_hash = stream_download(
+                url=file_info.download_url,
+                sink=extractor.feed,
+                expected_hash=file_info.expected_hash,
+                progress_callback=progress_callback,
+                transfer=transfer,
+                mirror_count=self.config.app.mirror_race_count,
+                progress_interval=self.config.app.download_progress_interval,
+            )
+        except BaseException:
+            extractor.abort()
+            raise
+        extractor.close()
+
+    @staticmethod
+    def _iso_filter(
+        context: InstallationContext, file_info: DownloadableFile
+    ) -> Callable[[str], bool] | None:
+        """Select the files of an image that go onto the temporary partition."""
+        if file_info.file_hint == "live_img_iso":
+            return _is_liveos_path
+        if context.is_live_image_installation():
+            # The live image's LiveOS replaces the installer's; both images
+            # are extracted at once, so the installer's is left out
+            return lambda path: not _is_liveos_path(path)
+        return None
+
+    def progress_adapter(
+        self, context: InstallationContext, index: int, progress: DownloadProgress
+    ) -> None:
         """Adapt DownloadProgress to download callback format."""
+        self._set_file_progress(
+            context, index, progress.downloaded_bytes, progress.total_bytes
+        )
         if self.download_callback:
             self.download_callback(
-                self._download_index,
+                index,
                 progress.filename,
                 progress.percentage,
                 progress.speed_bytes_per_sec,
@@ -323,16 +1116,31 @@ class InstallationService:
         if not file_info.full_path.exists():
             return False
 
-        actual_hash = file_service.get_sha256_hash(str(file_info.full_path))
+        # Reuse the digest computed while downloading, or one cached by a
+        # previous run if the file is unchanged since
+        actual_hash = file_info.verified_hash or file_service.get_cached_sha256_hash(
+            str(file_info.full_path)
+        )
         return actual_hash.lower().strip() == file_info.expected_hash.lower().strip()
 
+    def _repair_file(self, file_info: DownloadableFile) -> bool:
+        """Re-fetch only the damaged chunks of an existing file that failed its hash."""
+        if not file_info.expected_hash:
+            return False
+        if not file_service.repair_file(
+            str(file_info.full_path), file_info.expected_hash, file_info.download_url
+        ):
+            return False
+        file_info.verified_hash = file_info.expected_hash.lower().strip()
+        return True
+
     def _setup_partitioning(self, context: InstallationContext) -> InstallationResult:
         """Set up partitioning for installation."""
         try:
             self._update_progress(
                 context,
                 InstallationStage.CREATING_TMP_PART,
-                50,
+                0,
                 "Creating temporary partition...",
             )
             # Execute partitioning using the partition context
@@ -340,35 +1148,12 @@ class InstallationService:
                 partition_procedure, kwargs={"options": context.partition}
             )
 
-            # Store the temporary partition information for later use
-            context.tmp_part = partitioning_results.tmp_part
-            context.tmp_part_already_created = True
-            context.partitioning_result = partitioning_results
-
-            # Set partition GUIDs in kickstart for auto-install
-            context.kickstart.partitioning.root_guid = (
-                partitioning_results.partition_guids.root_guid
-            )
-            context.kickstart.partitioning.boot_guid = (
-                partitioning_results.partition_guids.boot_guid
-            )
-            context.kickstart.partitioning.sys_drive_uuid = (
-                self.state.installation.windows_partition.partition_guid
-            )
-            context.kickstart.partitioning.sys_disk_uuid = (
-                self.state.installation.windows_partition.disk_guid
-            )
-            context.kickstart.partitioning.sys_efi_uuid = (
-                self.state.installation.efi_partition.partition_guid
-            )
-            context.kickstart.partitioning.tmp_part_uuid = (
-                partitioning_results.tmp_part.partition_guid
-            )
+            self._use_partitioning_result(context, partitioning_results)
 
             self._update_progress(
                 context,
                 InstallationStage.CREATING_TMP_PART,
-                60,
+                100,
                 "Temporary partition created",
             )
             return InstallationResult.success_result()
@@ -378,6 +1163,80 @@ class InstallationService:
                 InstallationStage.CREATING_TMP_PART, f"Partitioning failed: {e!s}"
             )
 
+    def _use_partitioning_result(
+        self, context: InstallationContext, partitioning_results: PartitioningResult
+    ) -> None:
+        """Use created partitions for the rest of the installation."""
+        # Store the temporary partition information for later use
+        context.tmp_part = partitioning_results.tmp_part
+        context.tmp_part_already_created = True
+        context.partitioning_result = partitioning_results
+
+        # Set partition GUIDs in kickstart for auto-install
+        context.kickstart.partitioning.root_guid = (
+            partitioning_results.partition_guids.root_guid
+        )
+        context.kickstart.partitioning.boot_guid = (
+            partitioning_results.partition_guids.boot_guid
+        )
+        context.kickstart.partitioning.sys_drive_uuid = (
+            self.state.installation.windows_partition.partition_guid
+        )
+        context.kickstart.partitioning.sys_disk_uuid = (
+            self.state.installation.windows_partition.disk_guid
+        )
+        context.kickstart.partitioning.sys_efi_uuid = (
+            self.state.installation.efi_partition.partition_guid
+        )
+        context.kickstart.partitioning.tmp_part_uuid = (
+            partitioning_results.tmp_part.partition_guid
+        )
+
+    def _stream_installation_files(
+        self, context: InstallationContext
+    ) -> InstallationResult:
+        """
+        Extract the images onto the temporary partition as they download.
+
+        The partition is sized from the spins' published image sizes, so
+        no copy of an image has to fit on the Windows drive.
+        """
+        try:
+            if not context.tmp_part:
+                msg = "Partitioning succeeded but temporary partition info is missing"
+                raise RuntimeError(msg)
+
+            with context.tmp_part.mount() as destination:
+                download_result = self._download_files(context, stream_to=destination)
+                if not download_result.success:
+                    return download_result
+
+                self._update_progress(
+                    context,
+                    InstallationStage.COPYING_TO_TMP_PART,
+                    0,
+                    "Copying installation files...",
+                )
+                # The images are on the partition already
+                progress = self._copy_progress(
+                    context,
+                    file_service.get_tree_size(get_config().paths.install_helpers_dir)
+                    + file_service.get_tree_size(Path(destination) / "EFI"),
+                )
+                self._copy_additional_files(context, destination, progress)
+                self._copy_config_files(context, destination)
+                self._copy_efi_to_system_partition(destination, progress)
+                context.tmp_part_manifest = _tree_manifest(destination)
+                progress.finish()
+
+            return self._files_copied(context)
+
+        except Exception as e:
+            return InstallationResult.error_result(
+                InstallationStage.COPYING_TO_TMP_PART,
+                f"File copying failed: {e!s}",
+            )
+
     def _copy_installation_files(
         self, context: InstallationContext
     ) -> InstallationResult:
@@ -386,13 +1245,13 @@ class InstallationService:
             self._update_progress(
                 context,
                 InstallationStage.COPYING_TO_TMP_PART,
-                70,
+                0,
                 "Copying installation files...",
             )
 
             # Get file paths
-            installer_iso_path = context.get_installer_iso_path()
-            if not installer_iso_path:
+            installer_file = context.get_installer_file()
+            if not installer_file:
                 return InstallationResult.error_result(
                     InstallationStage.COPYING_TO_TMP_PART, "No installer ISO found"
                 )
@@ -401,28 +1260,55 @@ class InstallationService:
                 msg = "Partitioning succeeded but temporary partition info is missing"
                 raise RuntimeError(msg)
 
+            live_file = context.get_live_file()
+            if not context.is_live_image_installation():
+                live_file = None
+            if self.config.app.write_tmp_part_image:
+                self._write_tmp_part_image(context, installer_file, live_file)
+                return self._files_copied(context)
+            progress = self._copy_progress(
+                context, self._copy_stage_size(installer_file, live_file)
+            )
+
             with context.tmp_part.mount() as destination:
                 # Extract installer ISO contents directly to temp partition
-                disk.extract_iso_to_dir(str(installer_iso_path), destination)
+                workers = self._extract_workers(context)
+                with progress.stage("Installer image extraction"):
+                    disk.extract_iso_to_dir(
+                        str(installer_file.full_path),
+                        destination,
+                        workers=workers,
+                        progress_callback=progress.step_callback(),
+                        sha256=installer_file.expected_hash,
+                    )
 
                 # Handle live image if needed
-                if context.is_live_image_installation():
-                    live_iso_path = context.get_live_iso_path()
-                    if live_iso_path:
-                        self._extract_liveos_from_iso(str(live_iso_path), destination)
-
-                # Copy additional files and generate configurations
-                self._copy_additional_files(context, destination)
-                self._generate_config_files(context, destination)
-                self._copy_efi_to_system_partition(destination)
-
-            self._update_progress(
-                context,
-                InstallationStage.COPYING_TO_TMP_PART,
-                85,
-                "Files copied successfully",
-            )
-            return InstallationResult.success_result()
+                if live_file:
+                    with progress.stage("Live image copy"):
+                        if live_file.needed_file_path:
+                            # Fetched without the rest of the live ISO
+                            target = Path(destination) / LIVE_SQUASHFS_PATH.lstrip("/")
+                            target.parent.mkdir(parents=True, exist_ok=True)
+                            file_service.copy_file(
+                                live_file.needed_file_path, target, progress.advance
+                            )
+                        else:
+                            self._extract_liveos_from_iso(
+                                str(live_file.full_path),
+                                destination,
+                                workers,
+                                live_file.expected_hash,
+                                progress.step_callback(),
+                            )
+
+                # Copy additional files and the rendered configurations
+                self._copy_additional_files(context, destination, progress)
+                self._copy_config_files(context, destination)
+                self._copy_efi_to_system_partition(destination, progress)
+                context.tmp_part_manifest = _tree_manifest(destination)
+                progress.finish()
+
+            return self._files_copied(context)
 
         except Exception as e:
             return InstallationResult.error_result(
@@ -430,20 +1316,180 @@ class InstallationService:
                 f"File copying failed: {e!s}",
             )
 
-    def _extract_liveos_from_iso(self, iso_path: str, target_dir: str) -> None:
+    def _files_copied(self, context: InstallationContext) -> InstallationResult:
+        self._update_progress(
+            context,
+            InstallationStage.COPYING_TO_TMP_PART,
+            100,
+            "Files copied successfully",
+        )
+        return InstallationResult.success_result()
+
+    def _write_tmp_part_image(
+        self,
+        context: InstallationContext,
+        installer_file: DownloadableFile,
+        live_file: DownloadableFile | None,
+    ) -> None:
+        """
+        Build the temporary partition's file system in userspace, and write it.
+
+        The FAT32 image is laid out from the images' trees with every file
+        contiguous, then written over the partition sequentially by the
+        elevated helper, in one call that reports its progress through a
+        file next to the saved image. The partition is mounted only
+        afterwards, to copy the EFI files from it.
+        """
+        image_file = Path(context.paths.work_dir) / "tmp_part_image.json"
+        try:
+            installer_path = str(installer_file.full_path)
+            installer_tree = get_iso_image(installer_path, installer_file.expected_hash)
+            files = [
+                ImageFile(path, installer_path, iso_file.extents)
+                for path, iso_file in installer_tree.files.items()
+            ]
+            if live_file and live_file.needed_file_path:
+                files.append(
+                    ImageFile.from_file(LIVE_SQUASHFS_PATH, live_file.needed_file_path)
+                )
+            elif live_file:
+                live_path = str(live_file.full_path)
+                live_tree = get_iso_image(live_path, live_file.expected_hash)
+                files += [
+                    ImageFile(path, live_path, iso_file.extents)
+                    for path, iso_file in live_tree.files.items()
+                    if _is_liveos_path(path)
+                ]
+            files += _local_image_files(
+                get_config().paths.install_helpers_dir, "/install-helpers"
+            )
+            # Replacing the ISO's
+            files += _local_image_files(self._generated_dir(context), "")
+
+            tmp_part = context.tmp_part
+            image = Fat32Image(
+                files,
+                tmp_part.size,
+                context.partition.temp_part_label,
+                hidden_sectors=tmp_part.start_lba,
+            )
+            image.save(image_file)
+            efi_size = sum(
+                f.size for f in image.files if f.path.upper().startswith("/EFI/")
+            )
+            progress = self._copy_progress(context, image.used_size + efi_size)
+
+            with progress.stage("Temporary partition image write"):
+                report = progress.step_callback()
+                # One call, so the volume stays locked until it is all written
+                with follow_write_progress(
+                    image_file, lambda written: report(written, image.used_size)
+                ):
+                    elevated.call(
+                        storage.write_fat32_image,
+                        args=(tmp_part.volume_unique_id, str(image_file)),
+                    )
+                report(image.used_size, image.used_size)
+            with tmp_part.mount() as destination:
+                self._copy_efi_to_system_partition(destination, progress)
+                context.tmp_part_manifest = _tree_manifest(destination)
+            progress.finish()
+        finally:
+            image_file.unlink(missing_ok=True)
+
+    def _extract_liveos_from_iso(
+        self,
+        iso_path: str,
+        target_dir: str,
+        workers: int = 1,
+        sha256: str | None = None,
+        progress_callback: Callable[[int, int], None] | None = None,
+    ) -> None:
         """
         Extract only the LiveOS directory from an ISO file.
 
         Args:
             iso_path: Path to the ISO file
             target_dir: Directory to extract LiveOS contents to
+            workers: Number of files written concurrently
+            sha256: Verified digest of the image, to use its indexed tree
+            progress_callback: Called with (bytes extracted, total bytes)
         """
         disk.extract_iso_to_dir(
-            iso_path, target_dir, filter_func=lambda p: p.startswith("/LiveOS/")
+            iso_path,
+            target_dir,
+            filter_func=_is_liveos_path,
+            workers=workers,
+            progress_callback=progress_callback,
+            sha256=sha256,
         )
 
+    def _copy_stage_size(
+        self, installer_file: DownloadableFile, live_file: DownloadableFile | None
+    ) -> int:
+        """Get the bytes the copy stage writes, from the ISO index."""
+        installer_path = str(installer_file.full_path)
+        size = disk.get_iso_contents_size(
+            installer_path, sha256=installer_file.expected_hash
+        )
+        # The EFI files are copied once more, to the EFI partition
+        size += disk.get_iso_contents_size(
+            installer_path,
+            lambda path: path.startswith("/EFI/"),
+            sha256=installer_file.expected_hash,
+        )
+        size += file_service.get_tree_size(get_config().paths.install_helpers_dir)
+        if live_file and live_file.needed_file_path:
+            size += live_file.needed_file_path.stat().st_size
+        elif live_file:
+            size += disk.get_iso_contents_size(
+                str(live_file.full_path),
+                _is_liveos_path,
+                sha256=live_file.expected_hash,
+            )
+        return size
+
+    def _copy_progress(self, context: InstallationContext, total: int) -> ByteProgress:
+        """Report the copy stage's bytes, speed and ETA."""
+
+        def on_update(done: int, total: int, speed: float, eta: float) -> None:
+            fraction = min(1.0, done / total) if total else 1.0
+            self._update_progress(
+                context,
+                InstallationStage.COPYING_TO_TMP_PART,
+                100 * fraction,
+                f"Copying installation files... {format_bytes(done)} of "
+                f"{format_bytes(total)} - {format_speed(speed)} - "
+                f"ETA: {format_eta(eta)}",
+            )
+
+        return ByteProgress(
+            total, on_update, self.config.app.download_progress_interval
+        )
+
+    @staticmethod
+    def _extract_workers(context: InstallationContext) -> int:
+        """
+        Get how many files to write to the temporary partition at once.
+
+        SSDs keep up with many concurrent writers, while on a spinning disk
+        each extra one mostly adds seeks.
+        """
+        workers = get_config().app.extract_workers
+        if workers > 0:
+            return workers
+        media_type = "unknown"
+        if context.tmp_part:
+            media_type = storage.get_disk_media_type(context.tmp_part.disk_number)
+        workers = EXTRACT_WORKERS_BY_MEDIA[media_type]
+        logging.info(f"Extracting with {workers} writers ({media_type} target)")
+        return workers
+
     def _copy_additional_files(
-        self, _context: InstallationContext, destination: str
+        self,
+        _context: InstallationContext,
+        destination: str,
+        progress: ByteProgress,
     ) -> None:
         """Copy additional files for installation."""
         destination_path = Path(destination)
@@ -452,64 +1498,116 @@ class InstallationService:
         install_helpers_dir = get_config().paths.install_helpers_dir
         if install_helpers_dir.exists():
             install_helpers_dst = destination_path / "install-helpers"
-            shutil.copytree(
-                str(install_helpers_dir),
-                str(install_helpers_dst),
-                dirs_exist_ok=True,
-            )
+            with progress.stage("Install helpers copy"):
+                file_service.copy_tree(
+                    install_helpers_dir, install_helpers_dst, progress.advance
+                )
 
-    def _generate_config_files(
-        self, context: InstallationContext, destination: str
-    ) -> None:
-        """Generate GRUB and kickstart configuration files."""
-        destination_path = Path(destination)
+    @staticmethod
+    def _generated_dir(context: InstallationContext) -> Path:
+        """Get where the configuration files are rendered before being copied."""
+        return Path(context.paths.work_dir) / "tmp_part_generated"
 
-        # Generate GRUB config
-        grub_cfg_path = destination_path / context.paths.grub_cfg_relative_path
-        grub_cfg_path.parent.mkdir(parents=True, exist_ok=True)
+    def _render_config_files(self, context: InstallationContext) -> InstallationResult:
+        """
+        Render the GRUB and kickstart configuration files into work_dir.
 
-        elevated.call(file_service.set_file_readonly, args=(str(grub_cfg_path), False))
+        They are copied over the images' files on the temporary partition
+        once those are there.
+        """
+        try:
+            destination_path = self._generated_dir(context)
+            _force_delete_directory(str(destination_path))
 
-        method = context.kickstart.partitioning.method
-        is_autoinstall = method != PartitioningMethod.CUSTOM
+            # Generate GRUB config
+            grub_cfg_path = destination_path / context.paths.grub_cfg_relative_path
+            grub_cfg_path.parent.mkdir(parents=True, exist_ok=True)
 
-        grub_cfg_content = config_builders.build_grub_cfg_file(
-            context.partition.temp_part_label,
-            is_autoinst=is_autoinstall,
-        )
-        grub_cfg_path.write_text(grub_cfg_content, encoding="utf-8", newline="")
-        elevated.call(file_service.set_file_readonly, args=(str(grub_cfg_path), True))
+            method = context.kickstart.partitioning.method
+            is_autoinstall = method != PartitioningMethod.CUSTOM
+
+            grub_cfg_content = config_builders.build_grub_cfg_file(
+                context.partition.temp_part_label,
+                is_autoinst=is_autoinstall,
+            )
+            grub_cfg_path.write_text(grub_cfg_content, encoding="utf-8", newline="")
+            file_service.set_file_readonly(str(grub_cfg_path), True)
+
+            # Generate kickstart config if needed
+            if is_autoinstall:
+                # Set live_img_url if installing a live image
+                if context.selected_spin.is_live_img:
+                    context.kickstart.live_img_url = get_config().app.live_img_url
 
-        # Generate kickstart config if needed
-        if is_autoinstall:
-            # Set live_img_url if installing a live image
-            if context.selected_spin.is_live_img:
-                context.kickstart.live_img_url = get_config().app.live_img_url
+                config_builders.write_ks_files(context.kickstart, destination_path)
+            return InstallationResult.success_result()
+
+        except Exception as e:
+            return InstallationResult.error_result(
+                InstallationStage.COPYING_TO_TMP_PART,
+                f"Configuration rendering failed: {e!s}",
+            )
 
-            config_builders.write_ks_files(context.kickstart, destination_path)
+    def _copy_config_files(
+        self, context: InstallationContext, destination: str
+    ) -> None:
+        """Copy the rendered configuration files over the images' ones."""
+        generated_dir = self._generated_dir(context)
+        for source in sorted(generated_dir.rglob("*")):
+            if not source.is_file():
+                continue
+            target = Path(destination) / source.relative_to(generated_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists():
+                elevated.call(file_service.set_file_readonly, args=(str(target), False))
+            file_service.copy_file(source, target)
+            if not source.stat().st_mode & stat.S_IWRITE:
+                elevated.call(file_service.set_file_readonly, args=(str(target), True))
+
+    def _prepare_efi_partition(self) -> InstallationResult:
+        """Remove the EFI files of an earlier installation from the EFI partition."""
+        try:
+            efi_partition = self.state.installation.efi_partition
+            with efi_partition.mount() as efi_mount:
+                efi_dst = Path(efi_mount) / "EFI" / "wingone"
+                if efi_dst.exists():
+                    msg = f"EFI wingone directory already exists at {efi_dst}, deleting..."
+                    logging.info(msg)
+                    elevated.call(_force_delete_directory, args=(str(efi_dst),))
+                    logging.info(f"Successfully deleted {efi_dst}")
+            return InstallationResult.success_result()
+
+        except Exception as e:
+            return InstallationResult.error_result(
+                InstallationStage.COPYING_TO_TMP_PART,
+                f"EFI partition preparation failed: {e!s}",
+            )
+
+    def _copy_efi_to_system_partition(
+        self, temp_destination: str, progress: ByteProgress
+    ) -> None:
+        """
+        Copy EFI directory to system EFI partition for proper booting.
 
-    def _copy_efi_to_system_partition(self, temp_destination: str) -> None:
-        """Copy EFI directory to system EFI partition for proper booting."""
+        The copy runs in the elevated helper, so it is counted in *progress*
+        once it is done. An earlier installation's files were removed by
+        _prepare_efi_partition.
+        """
         efi_partition = self.state.installation.efi_partition
 
         with efi_partition.mount() as efi_mount:
-            # Check if wingone directory already exists and delete it
-            efi_dst = Path(efi_mount) / "EFI" / "wingone"
-            if efi_dst.exists():
-                msg = f"EFI wingone directory already exists at {efi_dst}, deleting..."
-                logging.info(msg)
-                elevated.call(_force_delete_directory, args=(str(efi_dst),))
-                logging.info(f"Successfully deleted {efi_dst}")
-
             # Copy EFI directory to \EFI\wingone on EFI partition
             efi_src = Path(temp_destination) / "EFI"
+            efi_dst = Path(efi_mount) / "EFI" / "wingone"
             efi_dst.parent.mkdir(parents=True, exist_ok=True)
 
-            elevated.call(
-                shutil.copytree,
-                args=(str(efi_src), str(efi_dst)),
-                kwargs={"dirs_exist_ok": True},
-            )
+            with progress.stage("EFI copy"):
+                elevated.call(
+                    shutil.copytree,
+                    args=(str(efi_src), str(efi_dst)),
+                    kwargs={"dirs_exist_ok": True},
+                )
+                progress.advance(file_service.get_tree_size(efi_src))
 
     def _create_boot_entry(self, context: InstallationContext) -> InstallationResult:
         """Create boot entry for the installation."""
@@ -517,12 +1615,14 @@ class InstallationService:
             self._update_progress(
                 context,
                 InstallationStage.ADDING_TMP_BOOT_ENTRY,
-                90,
+                0,
                 "Creating boot entry...",
             )
             efi_partition = self.state.installation.efi_partition
             # Run the entire boot entry creation with elevation
-            new_entry_id = elevated.call(_create_boot_entry, args=(efi_partition,))
+            new_entry_id = elevated.call(
+                storage.create_boot_entry, args=(efi_partition,)
+            )
 
             return InstallationResult.success_result(str(new_entry_id))
         except Exception as e:
@@ -542,8 +1642,13 @@ class InstallationService:
         self._update_progress(
             context, InstallationStage.CLEANUP, 0, "Cleaning up failed installation..."
         )
+        self._remove_partitions(context)
+        self._update_progress(
+            context, InstallationStage.CLEANUP, 100, "Cleanup completed"
+        )
 
-        # Delete created partitions and restore the system partition size
+    def _remove_partitions(self, context: InstallationContext) -> None:
+        """Delete the created partitions and restore the system partition size."""
         if context.partitioning_result:
             result = context.partitioning_result
 
@@ -557,14 +1662,14 @@ class InstallationService:
 
             for guid in guids_to_delete:
                 try:
-                    elevated.call(disk.delete_partition, args=(guid,))
+                    elevated.call(storage.delete_partition, args=(guid,))
                 except Exception:
                     logging.warning("Failed to delete partition %s", guid)
 
             # Extend the system partition back to its original size
             try:
                 elevated.call(
-                    disk.resize_partition,
+                    storage.resize_partition,
                     args=(
                         result.windows_partition.partition_guid,
                         result.sys_drive_original_size,
@@ -576,9 +1681,13 @@ class InstallationService:
                     result.sys_drive_original_size,
                 )
 
-        self._update_progress(
-            context, InstallationStage.CLEANUP, 100, "Cleanup completed"
-        )
+        context.tmp_part = None
+        context.tmp_part_already_created = False
+        context.partitioning_result = None
+        context.tmp_part_manifest = {}
+        if self._journal:
+            for stage in ("partition", "copy", "stream"):
+                self._journal.forget(stage)
 
     def _update_progress(
         self,
@@ -586,8 +1695,19 @@ class InstallationService:
         stage: InstallationStage,
         percent: float,
         message: str,
+        scheduled_stage: Stage | None = None,
     ) -> None:
-        """Update progress and notify callback."""
+        """
+        Update progress and notify callback.
+
+        Within a scheduled stage (the calling thread's, or *scheduled_stage*),
+        *percent* is that stage's own progress; the overall progress weighs
+        each stage by its expected duration.
+        """
+        scheduled_stage = scheduled_stage or current_stage()
+        if scheduled_stage and self._stage_scheduler:
+            scheduled_stage.report(percent / 100)
+            percent = self._stage_scheduler.progress() * 100
         context.update_progress(stage, percent)
 
         if self.progress_callback:
@@ -0,0 +1,777 @@
+"""
+ISO9660 / Joliet image parsing.
+Reads volume descriptors and directory records directly, so an image can be
+extracted from a sequential byte stream (e.g. while it downloads) without
+keeping a copy of the image itself, and an image file is parsed only once
+into a path -> extents index.
+"""
+
+import hashlib
+import heapq
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+from services import extent_copy
+
+SECTOR_SIZE = 2048
+_FIRST_DESCRIPTOR_SECTOR = 16
+_VD_PRIMARY = 1
+_VD_SUPPLEMENTARY = 2
+_VD_TERMINATOR = 255
+_JOLIET_ESCAPES = (b"%/@", b"%/C", b"%/E")
+_FLAG_DIRECTORY = 0x02
+_FLAG_ASSOCIATED = 0x04
+_FLAG_MULTI_EXTENT = 0x80
+_SPILL_MEMORY = 64 * 1024 * 1024  # Stream prefix kept in RAM before using disk
+LARGE_FILE_SIZE = 64 * 1024 * 1024  # Files extracted on their own
+_SMALL_BATCH_SIZE = 16 * 1024 * 1024  # Small files are extracted in batches
+_SMALL_BATCH_FILES = 64
+_PROGRESS_STEP = 64 * 1024 * 1024  # Bytes of a large file between reports
+
+
+class IsoFormatError(ValueError):
+    """Raised for data that is not a (supported) ISO9660 image."""
+
+
+@dataclass(frozen=True)
+class DirectoryRecord:
+    """One parsed directory record."""
+
+    name: str
+    extent: int  # Byte offset in the image
+    length: int
+    is_dir: bool
+    multi_extent: bool  # More extents of the same file follow
+
+
+@dataclass
+class IsoFile:
+    """A file in the image and where its data is."""
+
+    path: str  # Absolute, "/"-separated
+    extents: list[tuple[int, int]] = field(default_factory=list)  # (offset, length)
+
+    @property
+    def size(self) -> int:
+        return sum(length for _, length in self.extents)
+
+
+def parse_volume_descriptor(sector: bytes) -> tuple[int, DirectoryRecord | None, bool]:
+    """
+    Parse a volume descriptor sector.
+
+    Returns:
+        (descriptor type, root directory record or None, is Joliet)
+
+    Raises:
+        IsoFormatError: If the sector is not a volume descriptor
+    """
+    if sector[1:6] != b"CD001":
+        msg = "Not an ISO9660 image (no volume descriptor signature)"
+        raise IsoFormatError(msg)
+    vd_type = sector[0]
+    if vd_type not in {_VD_PRIMARY, _VD_SUPPLEMENTARY}:
+        return vd_type, None, False
+    block_size = int.from_bytes(sector[128:130], "little")
+    if block_size != SECTOR_SIZE:
+        msg = f"Unsupported ISO9660 logical block size {block_size}"
+        raise IsoFormatError(msg)
+    joliet = vd_type == _VD_SUPPLEMENTARY and any(
+        escape in sector[88:120] for escape in _JOLIET_ESCAPES
+    )
+    root = _parse_record(sector[156:190], joliet)
+    return vd_type, root, joliet
+
+
+def parse_directory(data: bytes, joliet: bool) -> Iterator[DirectoryRecord]:
+    """
+    Parse the records of a directory extent, skipping ``.``/``..``.
+
+    Hidden entries are included; associated files are not.
+    """
+    pos = 0
+    while pos < len(data):
+        record_length = data[pos]
+        if record_length == 0:
+            # Records don't cross sectors; the rest of this one is padding
+            pos = (pos // SECTOR_SIZE + 1) * SECTOR_SIZE
+            continue
+        record = data[pos : pos + record_length]
+        pos += record_length
+        name_length = record[32]
+        if name_length == 1 and record[33] in {0, 1}:
+            continue
+        if record[25] & _FLAG_ASSOCIATED:
+            continue
+        parsed = _parse_record(record, joliet)
+        if parsed is not None:
+            yield parsed
+
+
+def _parse_record(record: bytes, joliet: bool) -> DirectoryRecord | None:
+    if len(record) < 34:
+        return None
+    name_length = record[32]
+    raw_name = record[33 : 33 + name_length]
+    flags = record[25]
+    if joliet:
+        name = raw_name.decode("utf-16-be", errors="replace")
+    else:
+        name = raw_name.decode("ascii", errors="replace")
+    if not flags & _FLAG_DIRECTORY:
+        name = name.partition(";")[0]
+        if not joliet:
+            name = name.rstrip(".")
+    return DirectoryRecord(
+        name=name,
+        extent=int.from_bytes(record[2:6], "little") * SECTOR_SIZE,
+        length=int.from_bytes(record[10:14], "little"),
+        is_dir=bool(flags & _FLAG_DIRECTORY),
+        multi_extent=bool(flags & _FLAG_MULTI_EXTENT),
+    )
+
+
+def select_root(roots: dict[bool, DirectoryRecord]) -> tuple[DirectoryRecord, bool]:
+    """
+    Pick the directory tree to read once all volume descriptors are known.
+
+    The Joliet tree is preferred when there is one, for the same (long,
+    mixed-case) names the Windows-side tools see.
+
+    Args:
+        roots: Root directory record by "is Joliet"
+
+    Returns:
+        (root directory record, is Joliet)
+
+    Raises:
+        IsoFormatError: If there is no primary volume descriptor either
+    """
+    joliet = True in roots
+    root = roots.get(joliet)
+    if root is None:
+        msg = "ISO image has no primary volume descriptor"
+        raise IsoFormatError(msg)
+    return root, joliet
+
+
+def read_directory(
+    data: bytes, path: str, joliet: bool
+) -> tuple[list[tuple[str, DirectoryRecord]], list[IsoFile]]:
+    """
+    Parse a directory extent into its subdirectories and files.
+
+    Consecutive records of a multi-extent file are merged into one IsoFile.
+
+    Args:
+        data: The directory's extent
+        path: The directory's path in the image
+        joliet: Whether the records are from the Joliet tree
+
+    Returns:
+        ([(subdirectory path, record)], [files])
+    """
+    subdirs: list[tuple[str, DirectoryRecord]] = []
+    files: list[IsoFile] = []
+    pending: IsoFile | None = None
+    for record in parse_directory(data, joliet):
+        record_path = posixpath.join(path, record.name)
+        if record.is_dir:
+            subdirs.append((record_path, record))
+            continue
+        if pending is None or pending.path != record_path:
+            if pending is not None:
+                files.append(pending)
+            pending = IsoFile(record_path)
+        pending.extents.append((record.extent, record.length))
+        if not record.multi_extent:
+            files.append(pending)
+            pending = None
+    if pending is not None:
+        files.append(pending)
+    return subdirs, files
+
+
+def read_tree(
+    read_at: Callable[[int, int], bytes], name: str = "image"
+) -> dict[str, IsoFile]:
+    """
+    Read the volume descriptors and directory tree of an image.
+
+    Args:
+        read_at: Called with (offset, length) to read that part of the
+            image; may return less at the end of the image
+        name: Name of the image, for error messages
+
+    Returns:
+        Image path (e.g. "/LiveOS/squashfs.img") -> file
+
+    Raises:
+        IsoFormatError: If the image isn't a (supported) ISO9660 image
+    """
+    root, joliet = _read_root(read_at, name)
+    files: dict[str, IsoFile] = {}
+    pending = [("/", root)]
+    visited: set[int] = set()
+    while pending:
+        dir_path, record = pending.pop()
+        if record.extent in visited:
+            continue  # Guard against loops in a corrupt image
+        visited.add(record.extent)
+        subdirs, dir_files = read_directory(
+            read_at(record.extent, record.length), dir_path, joliet
+        )
+        pending.extend(subdirs)
+        files.update((iso_file.path, iso_file) for iso_file in dir_files)
+    return files
+
+
+def find_file(
+    read_at: Callable[[int, int], bytes], iso_path: str, name: str = "image"
+) -> IsoFile | None:
+    """
+    Locate one file, reading only the directories on its path.
+
+    Args:
+        read_at: Called with (offset, length) to read that part of the
+            image; may return less at the end of the image
+        iso_path: Path of the file (e.g. "/LiveOS/squashfs.img")
+        name: Name of the image, for error messages
+
+    Returns:
+        The file, or None if the image has no such file
+
+    Raises:
+        IsoFormatError: If the image isn't a (supported) ISO9660 image
+    """
+    record, joliet = _read_root(read_at, name)
+    *dir_names, file_name = iso_path.strip("/").split("/")
+    dir_path = "/"
+    for dir_name in dir_names:
+        subdirs, _ = read_directory(
+            read_at(record.extent, record.length), dir_path, joliet
+        )
+        dir_path = posixpath.join(dir_path, dir_name)
+        record = next((r for path, r in subdirs if path == dir_path), None)
+        if record is None:
+            return None
+    _, files = read_directory(read_at(record.extent, record.length), dir_path, joliet)
+    file_path = posixpath.join(dir_path, file_name)
+    return next((f for f in files if f.path == file_path), None)
+
+
+def _read_root(
+    read_at: Callable[[int, int], bytes], name: str
+) -> tuple[DirectoryRecord, bool]:
+    """Read the volume descriptors; returns the result of select_root."""
+    roots: dict[bool, DirectoryRecord] = {}
+    sector_number = _FIRST_DESCRIPTOR_SECTOR
+    while True:
+        sector = read_at(sector_number * SECTOR_SIZE, SECTOR_SIZE)
+        if len(sector) < SECTOR_SIZE:
+            msg = f"{name} ended inside its volume descriptors"
+            raise IsoFormatError(msg)
+        vd_type, root, joliet = parse_volume_descriptor(sector)
+        if vd_type == _VD_TERMINATOR:
+            break
+        if root is not None and joliet not in roots:
+            roots[joliet] = root
+        sector_number += 1
+    return select_root(roots)
+
+
+class _Output:
+    """A file being written from one or more extents."""
+
+    def __init__(self, local_path: Path, size: int):
+        self.local_path = local_path
+        self.remaining = size
+        self.file: BinaryIO | None = None
+
+    def write(self, file_offset: int, data: bytes | memoryview) -> None:
+        if self.file is None:
+            self.local_path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = self.local_path.open("wb")
+        self.file.seek(file_offset)
+        self.file.write(data)
+        self.remaining -= len(data)
+        if self.remaining <= 0:
+            self.close()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class IsoStreamExtractor:
+    """
+    Extracts an ISO image from its bytes as they arrive in order.
+
+    Volume descriptors and directories are parsed as the stream reaches
+    them and every file extent is written straight to *target_dir*. Until
+    the whole directory tree is known, the stream is also kept in a spill
+    file (in RAM up to a limit, then on disk) so extents found in a
+    directory that comes after them can still be extracted. Images built by
+    mkisofs/xorriso put all directories first, so only the first few
+    megabytes are spilled.
+    """
+
+    def __init__(
+        self,
+        target_dir: Path,
+        filter_func: Callable[[str], bool] | None = None,
+        spill_dir: Path | None = None,
+    ):
+        """
+        Args:
+            target_dir: Directory to extract into
+            filter_func: Optional predicate on the image path (e.g.
+                ``/LiveOS/squashfs.img``) selecting the files to extract
+            spill_dir: Where the spill file goes if it outgrows RAM
+                (default: the system temp directory)
+        """
+        self.target_dir = target_dir
+        self.filter_func = filter_func
+        self.position = 0
+        self.files_written = 0
+        self.bytes_extracted = 0
+        self._spill: tempfile.SpooledTemporaryFile | None = (
+            tempfile.SpooledTemporaryFile(  # noqa: SIM115 - closed once the tree is known
+                max_size=_SPILL_MEMORY, dir=spill_dir
+            )
+        )
+        # Metadata not parsed yet: offset -> (length, kind, directory path)
+        self._wanted: dict[int, tuple[int, str, str]] = {
+            _FIRST_DESCRIPTOR_SECTOR * SECTOR_SIZE: (SECTOR_SIZE, "vd", "")
+        }
+        self._metadata: dict[int, bytearray] = {}
+        self._roots: dict[bool, DirectoryRecord] = {}  # is Joliet -> root
+        self._joliet = False
+        # Extents not reached yet: (offset, length, file offset, output id)
+        self._queued: list[tuple[int, int, int, int]] = []
+        self._active: list[tuple[int, int, int, _Output]] = []
+        self._outputs: dict[int, _Output] = {}
+
+    @property
+    def tree_complete(self) -> bool:
+        """Whether every directory has been parsed."""
+        return not self._wanted
+
+    def feed(self, data: bytes | memoryview) -> None:
+        """
+        Consume the next bytes of the image.
+
+        Raises:
+            IsoFormatError: If the image can't be parsed
+        """
+        data = memoryview(data)
+        start = self.position
+        end = start + len(data)
+        if self._spill is not None:
+            self._spill.write(data)
+        self.position = end
+
+        # Extents beginning in this piece become active
+        while self._queued and self._queued[0][0] < end:
+            offset, length, file_offset, output_id = heapq.heappop(self._queued)
+            self._active.append(
+                (offset, offset + length, file_offset, self._outputs[output_id])
+            )
+        still_active = []
+        for ext_start, ext_end, file_offset, output in self._active:
+            lo = max(ext_start, start)
+            hi = min(ext_end, end)
+            if hi > lo:
+                output.write(
+                    file_offset + lo - ext_start, data[lo - start : hi - start]
+                )
+                self.bytes_extracted += hi - lo
+            if ext_end > end:
+                still_active.append((ext_start, ext_end, file_offset, output))
+        self._active = still_active
+
+        # Collect metadata that is (partly) in this piece. Files found in it
+        # catch up on the bytes streamed so far from the spill.
+        for offset, (length, _kind, _path) in list(self._wanted.items()):
+            if offset < end and offset + length > start:
+                lo = max(offset, start)
+                hi = min(offset + length, end)
+                buffer = self._metadata.setdefault(offset, bytearray())
+                buffer += data[lo - start : hi - start]
+                if len(buffer) == length:
+                    self._parse_metadata(offset)
+
+        if self._spill is not None and self.tree_complete:
+            self._spill.close()
+            self._spill = None
+
+    def close(self) -> None:
+        """
+        Finish extraction once the whole image was fed.
+
+        Raises:
+            IsoFormatError: If the stream ended before everything was extracted
+        """
+        for output in self._outputs.values():
+            output.close()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        if self._wanted:
+            msg = f"Image ended at {self.position} before its directories"
+            raise IsoFormatError(msg)
+        missing = [o for o in self._outputs.values() if o.remaining > 0]
+        if missing:
+            msg = (
+                f"Image ended at {self.position} before {len(missing)} file(s) "
+                f"were complete, e.g. {missing[0].local_path}"
+            )
+            raise IsoFormatError(msg)
+
+    def abort(self) -> None:
+        """Release open files and the spill file without checking completeness."""
+        for output in self._outputs.values():
+            output.close()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def _parse_metadata(self, offset: int) -> None:
+        _length, kind, path = self._wanted.pop(offset)
+        data = bytes(self._metadata.pop(offset))
+        if kind == "vd":
+            vd_type, root, joliet = parse_volume_descriptor(data)
+            if vd_type != _VD_TERMINATOR:
+                if root is not None and joliet not in self._roots:
+                    self._roots[joliet] = root
+                self._want(offset + SECTOR_SIZE, SECTOR_SIZE, "vd", "")
+                return
+            root, self._joliet = select_root(self._roots)
+            self._want(root.extent, root.length, "dir", "/")
+            return
+
+        subdirs, files = read_directory(data, path, self._joliet)
+        for subdir_path, record in subdirs:
+            self._want(record.extent, record.length, "dir", subdir_path)
+        for iso_file in files:
+            self._add_file(iso_file)
+
+    def _want(self, offset: int, length: int, kind: str, path: str) -> None:
+        if length == 0:
+            return
+        self._wanted[offset] = (length, kind, path)
+        if offset < self.position:
+            # Already streamed past it: take what we have from the spill
+            buffer = self._metadata.setdefault(offset, bytearray())
+            buffer += self._read_spill(offset, min(offset + length, self.position))
+            if len(buffer) == length:
+                self._parse_metadata(offset)
+
+    def _add_file(self, iso_file: IsoFile) -> None:
+        if self.filter_func and not self.filter_func(iso_file.path):
+            return
+        output = _Output(self.target_dir / iso_file.path.lstrip("/"), iso_file.size)
+        self._outputs[id(output)] = output
+        self.files_written += 1
+        if output.remaining == 0:
+            output.local_path.parent.mkdir(parents=True, exist_ok=True)
+            output.local_path.touch()
+            return
+        file_offset = 0
+        for offset, length in iso_file.extents:
+            if offset < self.position:
+                # Already streamed past (part of) it: copy that from the spill
+                seen = min(offset + length, self.position)
+                output.write(file_offset, self._read_spill(offset, seen))
+                self.bytes_extracted += seen - offset
+                if seen < offset + length:
+                    self._active.append((offset, offset + length, file_offset, output))
+            else:
+                heapq.heappush(self._queued, (offset, length, file_offset, id(output)))
+            file_offset += length
+
+    def _read_spill(self, start: int, end: int) -> bytes:
+        if self._spill is None:
+            msg = f"Image data at {start} was needed after it was discarded"
+            raise IsoFormatError(msg)
+        self._spill.seek(start)
+        data = self._spill.read(end - start)
+        self._spill.seek(0, 2)
+        return data
+
+
+def extract_stream(
+    chunks: Iterator[bytes],
+    target_dir: Path,
+    filter_func: Callable[[str], bool] | None = None,
+) -> IsoStreamExtractor:
+    """
+    Extract an image from an iterator of its bytes, in order.
+
+    Returns:
+        The finished extractor (for its counters)
+    """
+    extractor = IsoStreamExtractor(target_dir, filter_func)
+    try:
+        for chunk in chunks:
+            extractor.feed(chunk)
+    except BaseException:
+        extractor.abort()
+        raise
+    extractor.close()
+    logging.info(
+        f"Extracted {extractor.files_written} files "
+        f"({extractor.bytes_extracted} bytes) to {target_dir}"
+    )
+    return extractor
+
+
+class IsoImage:
+    """
+    An image file's directory tree, parsed once.
+
+    Keeps a path -> extents index, so sizing and listing need no further
+    reads and extraction seeks straight to each file's data.
+    """
+
+    def __init__(self, path: Path, files: dict[str, IsoFile]):
+        self.path = path
+        self.files = files  # Image path (e.g. "/LiveOS/squashfs.img") -> file
+
+    @classmethod
+    def parse(cls, path: Path) -> "IsoImage":
+        """
+        Read the volume descriptors and directory tree of an image file.
+
+        Raises:
+            IsoFormatError: If the file isn't a (supported) ISO9660 image
+            OSError: If the file can't be read
+        """
+        with path.open("rb") as f:
+
+            def read_at(offset: int, length: int) -> bytes:
+                f.seek(offset)
+                return f.read(length)
+
+            files = read_tree(read_at, str(path))
+        logging.debug(f"Indexed {len(files)} files of {path}")
+        return cls(path, files)
+
+    def get(self, iso_path: str) -> IsoFile | None:
+        """Get a file by its path in the image (e.g. ``/LiveOS/squashfs.img``)."""
+        return self.files.get(iso_path)
+
+    def file_size(self, iso_path: str) -> int:
+        """Get the size of a file in the image, or 0 if there is no such file."""
+        iso_file = self.files.get(iso_path)
+        return iso_file.size if iso_file else 0
+
+    def list_files(
+        self, filter_func: Callable[[str], bool] | None = None
+    ) -> list[IsoFile]:
+        """Get the files selected by *filter_func* (all by default)."""
+        return [
+            iso_file
+            for iso_path, iso_file in self.files.items()
+            if not filter_func or filter_func(iso_path)
+        ]
+
+    def contents_size(self, filter_func: Callable[[str], bool] | None = None) -> int:
+        """Get the total size of the files selected by *filter_func*."""
+        return sum(iso_file.size for iso_file in self.list_files(filter_func))
+
+    def hash_file(self, iso_path: str) -> str:
+        """
+        Get the SHA256 of a file in the image.
+
+        Raises:
+            KeyError: If there is no such file
+            IsoFormatError: If the image file is truncated
+        """
+        iso_file = self.files[iso_path]
+        digest = hashlib.sha256()
+        with self.path.open("rb") as f:
+            for offset, length in iso_file.extents:
+                f.seek(offset)
+                remaining = length
+                while remaining:
+                    data = f.read(min(remaining, extent_copy.COPY_CHUNK_SIZE))
+                    if not data:
+                        msg = f"Truncated image, {iso_path} incomplete"
+                        raise IsoFormatError(msg)
+                    digest.update(data)
+                    remaining -= len(data)
+        return digest.hexdigest()
+
+    def extract(
+        self,
+        target_dir: Path,
+        filter_func: Callable[[str], bool] | None = None,
+        methods: list[str] | None = None,
+        workers: int = 1,
+        progress_callback: Callable[[int, int], None] | None = None,
+    ) -> int:
+        """
+        Extract the files selected by *filter_func* into *target_dir*.
+
+        Each extent is copied straight from the image file, by the kernel
+        where the OS supports it (see extent_copy). With several *workers*,
+        large files get their own pool of a quarter of them (they are
+        bandwidth-bound, more would only add seeks) and the rest work
+        through the small files in batches, so per-file overhead overlaps
+        with the large transfers. Each file is written by one worker, so
+        the output is the same as a sequential extraction.
+
+        Args:
+            target_dir: Directory to extract into
+            filter_func: Optional predicate on the image path
+            methods: Copy methods to use (default: the fastest available)
+            workers: Number of files copied at once
+            progress_callback: Called with (bytes extracted, total bytes)
+                as the extraction advances, from the worker threads
+
+        Returns:
+            Number of bytes extracted
+
+        Raises:
+            IsoFormatError: If the image file is truncated
+        """
+        files = self.list_files(filter_func)
+        total = sum(iso_file.size for iso_file in files)
+        for directory in {
+            (target_dir / iso_file.path.lstrip("/")).parent for iso_file in files
+        }:
+            directory.mkdir(parents=True, exist_ok=True)
+
+        large = sorted(
+            (f for f in files if f.size >= LARGE_FILE_SIZE),
+            key=lambda f: f.size,
+            reverse=True,
+        )
+        small = [f for f in files if f.size < LARGE_FILE_SIZE]
+        large_batches = [[f] for f in large]
+        small_batches: list[list[IsoFile]] = []
+        batch: list[IsoFile] = []
+        batch_size = 0
+        for iso_file in small:
+            batch.append(iso_file)
+            batch_size += iso_file.size
+            if batch_size >= _SMALL_BATCH_SIZE or len(batch) >= _SMALL_BATCH_FILES:
+                small_batches.append(batch)
+                batch, batch_size = [], 0
+        if batch:
+            small_batches.append(batch)
+
+        extracted = 0
+        progress_lock = threading.Lock()
+
+        def report(nbytes: int) -> None:
+            nonlocal extracted
+            with progress_lock:
+                extracted += nbytes
+                if progress_callback:
+                    progress_callback(extracted, total)
+
+        def copy_batch(batch: list[IsoFile]) -> None:
+            with self.path.open("rb") as source:
+                for iso_file in batch:
+                    self._copy_file(source, iso_file, target_dir, methods, report)
+
+        if workers <= 1:
+            for batch in [*large_batches, *small_batches]:
+                copy_batch(batch)
+            return extracted
+
+        large_workers = max(1, workers // 4)
+        with (
+            ThreadPoolExecutor(large_workers, "extract-large") as large_pool,
+            ThreadPoolExecutor(
+                max(1, workers - large_workers), "extract-small"
+            ) as small_pool,
+        ):
+            futures = [large_pool.submit(copy_batch, b) for b in large_batches]
+            futures += [small_pool.submit(copy_batch, b) for b in small_batches]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return extracted
+
+    def _copy_file(
+        self,
+        source: BinaryIO,
+        iso_file: IsoFile,
+        target_dir: Path,
+        methods: list[str] | None,
+        report: Callable[[int], None],
+    ) -> None:
+        local_path = target_dir / iso_file.path.lstrip("/")
+        with local_path.open("wb") as target:
+            for offset, length in iso_file.extents:
+                # Copy large extents in steps, so progress keeps coming
+                for step in range(0, length, _PROGRESS_STEP):
+                    step_length = min(_PROGRESS_STEP, length - step)
+                    try:
+                        extent_copy.copy_range(
+                            source, target, offset + step, step_length, methods
+                        )
+                    except EOFError as e:
+                        msg = f"Truncated image, {iso_file.path} incomplete: {e}"
+                        raise IsoFormatError(msg) from e
+                    report(step_length)
+
+
+# Parsed images by (path, size, mtime), so reopening an unchanged image is free
+_images: dict[tuple[str, int, int], IsoImage] = {}
+_images_lock = threading.Lock()
+
+
+def get_iso_image(path: Path | str, sha256: str | None = None) -> IsoImage:
+    """
+    Get the parsed directory tree of an image file.
+
+    The index is parsed once per version of the file and reused by every
+    later call. With the image's verified *sha256*, the tree is taken from
+    the persistent ISO index instead, or parsed and added to it.
+
+    Raises:
+        IsoFormatError: If the file isn't a (supported) ISO9660 image
+        OSError: If the file can't be read
+    """
+    path = Path(path)
+    st = path.stat()
+    key = (os.path.normcase(str(path.resolve())), st.st_size, st.st_mtime_ns)
+    with _images_lock:
+        image = _images.get(key)
+    if image is None:
+        image = _load_image(path, sha256)
+        with _images_lock:
+            _images[key] = image
+    return image
+
+
+def _load_image(path: Path, sha256: str | None) -> IsoImage:
+    if not sha256:
+        return IsoImage.parse(path)
+    from services.iso_index import get_iso_index
+
+    index = get_iso_index()
+    files = index.lookup(sha256)
+    if files is not None:
+        logging.debug(f"Using indexed tree of {path}")
+        return IsoImage(path, files)
+    image = IsoImage.parse(path)
+    index.add(sha256, image.files)
+    return image
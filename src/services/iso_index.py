@@ -0,0 +1,158 @@
+"""
+Persistent index of ISO image contents, keyed by the image's SHA256.
+Holds each known image's file list with their extents, and the SHA256 of
+single files that can be fetched on their own, so verified images are never
+parsed twice and sizes are known before an image is downloaded. Entries can
+be seeded from a table bundled with the app.
+"""
+
+import contextlib
+import json
+import logging
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from services.iso9660 import IsoFile
+
+_INDEX_FILE_NAME = "iso_index.json"
+SEED_FILE_PATH = Path(__file__).parent.parent / "resources" / "iso_index_seed.json"
+
+
+class IsoIndex:
+    """
+    On-disk map of image SHA256 -> its files and known file hashes.
+
+    Each entry has ``files`` (path in the image -> [[offset, length], ...])
+    and ``hashes`` (path in the image -> SHA256 of that file). Lookups fall
+    back to the read-only seed table.
+    """
+
+    def __init__(self, index_file: Path, seed_file: Path | None = None):
+        """
+        Args:
+            index_file: JSON file the index is kept in
+            seed_file: Optional bundled table with the same format
+        """
+        self.index_file = index_file
+        self.seed_file = seed_file
+        self._entries: dict[str, dict] | None = None
+        self._seed: dict[str, dict] | None = None
+        self._lock = threading.Lock()
+
+    def lookup(self, sha256: str) -> dict[str, IsoFile] | None:
+        """
+        Get the files of the image with digest *sha256*.
+
+        Returns:
+            Image path -> file, or None if the image isn't indexed
+        """
+        with self._lock:
+            files = self._entry(_normalize(sha256)).get("files")
+        if files is None:
+            return None
+        return {
+            path: IsoFile(path, [(offset, length) for offset, length in extents])
+            for path, extents in files.items()
+        }
+
+    def add(self, sha256: str, files: dict[str, IsoFile]) -> None:
+        """Record the files of the verified image with digest *sha256*."""
+        with self._lock:
+            entry = self._load().setdefault(_normalize(sha256), {})
+            entry["files"] = {
+                path: [list(extent) for extent in iso_file.extents]
+                for path, iso_file in files.items()
+            }
+            self._save()
+
+    def contents_size(
+        self, sha256: str, filter_func: Callable[[str], bool] | None = None
+    ) -> int | None:
+        """
+        Get the total size of the files of an image selected by *filter_func*.
+
+        Returns:
+            Size in bytes, or None if the image isn't indexed
+        """
+        files = self.lookup(sha256)
+        if files is None:
+            return None
+        return sum(
+            iso_file.size
+            for path, iso_file in files.items()
+            if not filter_func or filter_func(path)
+        )
+
+    def file_hash(self, sha256: str, iso_path: str) -> str | None:
+        """Get the SHA256 of one file of the image with digest *sha256*."""
+        with self._lock:
+            return self._entry(_normalize(sha256)).get("hashes", {}).get(iso_path)
+
+    def record_file_hash(self, sha256: str, iso_path: str, file_sha256: str) -> None:
+        """Remember the SHA256 of one file of a verified image."""
+        with self._lock:
+            entry = self._load().setdefault(_normalize(sha256), {})
+            entry.setdefault("hashes", {})[iso_path] = _normalize(file_sha256)
+            self._save()
+
+    def _entry(self, sha256: str) -> dict:
+        """Get an image's entry, completed from the seed table (lock held)."""
+        return {**self._load_seed().get(sha256, {}), **self._load().get(sha256, {})}
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            self._entries = _read_table(self.index_file)
+        return self._entries
+
+    def _load_seed(self) -> dict[str, dict]:
+        if self._seed is None:
+            self._seed = _read_table(self.seed_file) if self.seed_file else {}
+        return self._seed
+
+    def _save(self) -> None:
+        tmp_file = self.index_file.with_name(self.index_file.name + ".tmp")
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(self._entries), encoding="utf-8")
+            tmp_file.replace(self.index_file)
+        except OSError as e:
+            logging.warning(f"Could not save ISO index {self.index_file}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
+
+
+def _read_table(path: Path) -> dict[str, dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable ISO index {path}: {e}")
+        return {}
+
+
+def _normalize(sha256: str) -> str:
+    return sha256.lower().strip()
+
+
+# Global index instance (lives next to the downloads it describes)
+_iso_index: IsoIndex | None = None
+
+
+def get_iso_index() -> IsoIndex:
+    """Get the global ISO index."""
+    global _iso_index
+    if _iso_index is None:
+        from core.settings import get_config
+
+        _iso_index = IsoIndex(
+            get_config().paths.work_dir / _INDEX_FILE_NAME, SEED_FILE_PATH
+        )
+    return _iso_index
+
+
+def set_iso_index(index: IsoIndex) -> None:
+    """Set the global ISO index (for testing)."""
+    global _iso_index
+    _iso_index = index
@@ -0,0 +1,363 @@
+"""
+Content-addressed store of downloaded images.
+Verified downloads are hard-linked into the store under their SHA256, so an
+image already on disk is reused whatever name the next download wants it
+under, and least-recently-used images are evicted to stay within a disk
+budget. Where hard links aren't supported the store just records the
+file's location and hands it over by renaming it.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from services import chunk_manifest, segmented_download
+from services import file as file_service
+from services.hash_cache import file_fingerprint, get_hash_cache
+
+_STORE_DIR_NAME = "store"
+_INDEX_FILE_NAME = "index.json"
+
+
+class IsoStore:
+    """
+    Images keyed by SHA256, with the names they are linked under.
+
+    The index maps each digest to its size, last use and ``links`` (the
+    paths outside the store sharing its data). ``path`` is set instead of
+    a blob in the store when the image couldn't be hard-linked.
+    """
+
+    def __init__(self, store_dir: Path, budget: int = 0):
+        """
+        Args:
+            store_dir: Directory holding the blobs and index
+            budget: Bytes of images to keep when evicting, 0 for unlimited
+        """
+        self.store_dir = store_dir
+        self.budget = budget
+        self._entries: dict[str, dict] | None = None
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> Path:
+        """Get the in-store path of the image with digest *sha256*."""
+        return self.store_dir / f"{_normalize(sha256)}.iso"
+
+    def lookup(self, sha256: str) -> Path | None:
+        """
+        Get where the image with digest *sha256* is on disk, if it is stored.
+
+        Args:
+            sha256: Expected digest of the image
+
+        Returns:
+            Path of the stored data, or None if not stored (or gone); its
+            contents aren't verified
+        """
+        with self._lock:
+            return self._location(_normalize(sha256))
+
+    def add(self, filepath: Path, sha256: str) -> None:
+        """
+        Record a verified image, replacing duplicate data with a link.
+
+        If an identical image is already stored (and still hashes to
+        *sha256*), *filepath* is re-linked to it so the data exists once on
+        disk.
+
+        Args:
+            filepath: Verified file
+            sha256: Its digest
+        """
+        sha256 = _normalize(sha256)
+        with self._lock:
+            location = self._location(sha256)
+            if location is not None and not _same_file(location, filepath):
+                location = self._verified(sha256, location)
+            entry = self._load().setdefault(sha256, {"links": []})
+            if location is None:
+                blob = self.blob_path(sha256)
+                try:
+                    self.store_dir.mkdir(parents=True, exist_ok=True)
+                    blob.unlink(missing_ok=True)
+                    os.link(filepath, blob)
+                    entry.pop("path", None)
+                    _share_verified_hash(
+                        _verified_fingerprint(filepath, sha256), blob, sha256
+                    )
+                except OSError as e:
+                    logging.debug(f"Not hard-linking {filepath} into the store: {e}")
+                    entry["path"] = str(filepath)
+            elif not _same_file(location, filepath):
+                logging.info(f"{filepath.name} duplicates stored {location.name}")
+                with contextlib.suppress(OSError):
+                    _link_over(location, filepath)
+            entry["size"] = filepath.stat().st_size
+            entry["last_used"] = time.time()
+            if str(filepath) not in entry["links"]:
+                entry["links"].append(str(filepath))
+            self._save()
+
+    def materialize(self, sha256: str, target: Path) -> bool:
+        """
+        Make the stored image with digest *sha256* available at *target*.
+
+        *target* is hard-linked to the stored data, replacing any partial or
+        stale file there. Without hard links the data is moved to *target*.
+        Stored data that no longer hashes to *sha256* (e.g. changed through
+        one of its names) is dropped from the store instead.
+
+        Args:
+            sha256: Expected digest of the image
+            target: Path the image is wanted at
+
+        Returns:
+            True if *target* now holds the image, False if it isn't stored
+        """
+        sha256 = _normalize(sha256)
+        with self._lock:
+            location = self._location(sha256)
+            if location is not None:
+                location = self._verified(sha256, location)
+            if location is None:
+                return False
+            entry = self._load()[sha256]
+            fingerprint = _verified_fingerprint(location, sha256)
+            if not _same_file(location, target):
+                segmented_download.discard_state(target)
+                chunk_manifest.discard_manifest(target)
+                try:
+                    _link_over(location, target)
+                except OSError:
+                    location.replace(target)
+                    entry["path"] = str(target)
+                # Keep the chunk hashes, so the file can still be range-repaired
+                with contextlib.suppress(OSError):
+                    shutil.copyfile(
+                        chunk_manifest.manifest_path_for(location),
+                        chunk_manifest.manifest_path_for(target),
+                    )
+                logging.info(f"Reusing stored image {location.name} as {target.name}")
+            entry["last_used"] = time.time()
+            if str(target) not in entry["links"]:
+                entry["links"].append(str(target))
+            self._save()
+        _share_verified_hash(fingerprint, target, sha256)
+        return True
+
+    def evict(self, keep: set[str] | None = None) -> int:
+        """
+        Remove least-recently-used images until the store is within budget.
+
+        Every name an evicted image is linked under is removed with it, or
+        the disk space wouldn't be freed.
+
+        Args:
+            keep: Digests that must not be evicted (e.g. the running install's)
+
+        Returns:
+            Number of bytes freed
+        """
+        keep = {_normalize(sha256) for sha256 in keep or ()}
+        freed = 0
+        with self._lock:
+            entries = self._load()
+            for sha256 in [s for s in entries if self._location(s) is None]:
+                # Deleted by the user, or changed: drop what is left of it
+                self._remove_data(sha256)
+                del entries[sha256]
+            if self.budget <= 0:
+                self._save()
+                return 0
+
+            total = sum(entry["size"] for entry in entries.values())
+            for sha256 in sorted(entries, key=lambda s: entries[s]["last_used"]):
+                if total <= self.budget:
+                    break
+                if sha256 in keep:
+                    continue
+                self._remove_data(sha256)
+                entry = entries.pop(sha256)
+                logging.info(
+                    f"Evicted stored image {sha256[:12]} ({entry['size']} bytes)"
+                )
+                total -= entry["size"]
+                freed += entry["size"]
+            self._save()
+        return freed
+
+    def _remove_data(self, sha256: str) -> None:
+        """
+        Delete an image and every name it is linked under (lock held).
+
+        If the image's data no longer matches the index (its size changed),
+        only a blob in the store is deleted: names outside the store that
+        may share it aren't the image any more, and may be in use.
+        """
+        entry = self._load()[sha256]
+        location = self._location(sha256)
+        if location is None:
+            if "path" not in entry:
+                blob = self.blob_path(sha256)
+                with contextlib.suppress(OSError):
+                    blob.unlink()
+                chunk_manifest.discard_manifest(blob)
+            return
+        for link in map(Path, entry["links"]):
+            # A name may since have been reused for a different file
+            if link != location and _same_file(link, location):
+                with contextlib.suppress(OSError):
+                    link.unlink()
+            chunk_manifest.discard_manifest(link)
+            get_hash_cache().forget(link)
+        with contextlib.suppress(OSError):
+            location.unlink()
+        chunk_manifest.discard_manifest(location)
+
+    def _verified(self, sha256: str, location: Path) -> Path | None:
+        """
+        Check an image's data still hashes to its digest (lock held).
+
+        Data that doesn't is dropped from the store; its other names are
+        left, to be verified (and repaired) as files of their own.
+
+        Returns:
+            *location*, or None if its data has changed
+        """
+        if file_service.get_cached_sha256_hash(str(location)) == sha256:
+            return location
+        logging.warning(f"Stored image {location.name} has changed, dropping it")
+        if "path" not in self._load()[sha256]:
+            with contextlib.suppress(OSError):
+                location.unlink()
+            chunk_manifest.discard_manifest(location)
+        del self._load()[sha256]
+        self._save()
+        return None
+
+    def _location(self, sha256: str) -> Path | None:
+        """Get where an image's data is, if it still exists (lock held)."""
+        entry = self._load().get(sha256)
+        if entry is None:
+            return None
+        location = Path(entry["path"]) if "path" in entry else self.blob_path(sha256)
+        if not location.is_file() or location.stat().st_size != entry.get("size"):
+            return None
+        return location
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(
+                    (self.store_dir / _INDEX_FILE_NAME).read_text(encoding="utf-8")
+                )
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        index_file = self.store_dir / _INDEX_FILE_NAME
+        tmp_file = index_file.with_name(index_file.name + ".tmp")
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(self._entries, indent=1), encoding="utf-8")
+            tmp_file.replace(index_file)
+        except OSError as e:
+            logging.warning(f"Could not save store index {index_file}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
+
+
+def detach_from_store(filepath: Path, keep_data: bool = True) -> None:
+    """
+    Make sure writing to *filepath* in place leaves stored images intact.
+
+    Names of stored images are hard links to the stored data, so a name
+    that shares its data gets a copy of its own, or is removed.
+
+    Args:
+        filepath: File about to be written in place
+        keep_data: Whether the data is needed (e.g. to be repaired), or the
+            file is about to be downloaded again anyway
+    """
+    try:
+        if filepath.stat().st_nlink <= 1:
+            return
+    except OSError:
+        return
+    if not keep_data:
+        filepath.unlink()
+        return
+    tmp_file = filepath.with_name(filepath.name + ".copy")
+    shutil.copyfile(filepath, tmp_file)
+    tmp_file.replace(filepath)
+
+
+def _verified_fingerprint(filepath: Path, sha256: str) -> dict | None:
+    """Get the fingerprint of *filepath* if it is cached as hashing to *sha256*."""
+    if get_hash_cache().lookup(filepath) != sha256:
+        return None
+    try:
+        return file_fingerprint(filepath)
+    except OSError:
+        return None
+
+
+def _share_verified_hash(fingerprint: dict | None, link: Path, sha256: str) -> None:
+    """
+    Record *link* as verified if it is the data hashed with *fingerprint*
+    (a hard link to it, or the file moved), so it isn't hashed again.
+    """
+    try:
+        if fingerprint is None or file_fingerprint(link) != fingerprint:
+            return
+    except OSError:
+        return
+    get_hash_cache().store(link, sha256)
+
+
+def _normalize(sha256: str) -> str:
+    return sha256.lower().strip()
+
+
+def _same_file(a: Path, b: Path) -> bool:
+    try:
+        return a.samefile(b)
+    except OSError:
+        return False
+
+
+def _link_over(source: Path, target: Path) -> None:
+    """Hard-link *target* to *source*, replacing whatever *target* was."""
+    tmp_link = target.with_name(target.name + ".link")
+    tmp_link.unlink(missing_ok=True)
+    os.link(source, tmp_link)
+    tmp_link.replace(target)
+
+
+# Global store instance (lives next to the downloads it describes)
+_iso_store: IsoStore | None = None
+
+
+def get_iso_store() -> IsoStore:
+    """Get the global image store."""
+    global _iso_store
+    if _iso_store is None:
+        from core.settings import get_config
+
+        config = get_config()
+        _iso_store = IsoStore(
+            config.paths.work_dir / _STORE_DIR_NAME, config.app.iso_store_budget
+        )
+    return _iso_store
+
+
+def set_iso_store(store: IsoStore) -> None:
+    """Set the global image store (for testing)."""
+    global _iso_store
+    _iso_store = store
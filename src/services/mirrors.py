@@ -0,0 +1,290 @@
+"""
+Mirror selection for spin downloads.
+Resolves the Fedora metalink/mirrorlist for a download.fedoraproject.org URL,
+races the first megabyte from several mirrors and ranks them by measured
+throughput. Measurements are kept between runs so known-fast mirrors are
+tried first next time.
+"""
+
+import contextlib
+import json
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import quote, urlparse
+
+from services import segmented_download
+
+RACE_BYTES = 1024 * 1024
+RACE_TIMEOUT = 10.0
+MAX_MIRRORS = 20  # Mirrors kept from the metalink (best preference first)
+_STATS_FILE_NAME = "mirror_stats.json"
+_STATS_MAX_AGE = 30 * 24 * 3600  # Forget measurements older than a month
+_SPEED_SMOOTHING = 0.5  # Weight of a new sample in the moving average
+_REDIRECTOR_HOSTS = {"download.fedoraproject.org", "dl.fedoraproject.org"}
+
+
+@dataclass
+class MirrorResult:
+    """Outcome of racing one mirror."""
+
+    url: str
+    speed: float = 0.0  # bytes/s over the race, including connection setup
+    size: int = 0  # Total size reported by Content-Range
+    error: str = ""
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+class MirrorStats:
+    """On-disk map of mirror host -> smoothed throughput and failure count."""
+
+    def __init__(self, stats_file: Path):
+        self.stats_file = stats_file
+        self._entries: dict[str, dict] | None = None
+        self._lock = threading.Lock()
+
+    def speed(self, url: str) -> float | None:
+        """Get the smoothed throughput of *url*'s host, if it was measured recently."""
+        with self._lock:
+            entry = self._load().get(host_of(url))
+        if not entry or time.time() - entry.get("updated", 0) > _STATS_MAX_AGE:
+            return None
+        return entry.get("speed")
+
+    def record_speed(self, url: str, speed: float) -> None:
+        """Fold a throughput sample for *url*'s host into its moving average."""
+        with self._lock:
+            entry = self._load().setdefault(host_of(url), {})
+            previous = entry.get("speed")
+            entry["speed"] = (
+                speed
+                if previous is None
+                else previous + _SPEED_SMOOTHING * (speed - previous)
+            )
+            entry["updated"] = time.time()
+            self._save()
+
+    def record_failure(self, url: str) -> None:
+        """Count a failed or unusable response from *url*'s host."""
+        with self._lock:
+            entry = self._load().setdefault(host_of(url), {})
+            entry["failures"] = entry.get("failures", 0) + 1
+            # A failure halves the host's standing without discarding it
+            if entry.get("speed"):
+                entry["speed"] /= 2
+            entry["updated"] = time.time()
+            self._save()
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.stats_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        tmp_file = self.stats_file.with_name(self.stats_file.name + ".tmp")
+        try:
+            self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(self._entries, indent=1), encoding="utf-8")
+            tmp_file.replace(self.stats_file)
+        except OSError as e:
+            logging.debug(f"Could not save mirror stats {self.stats_file}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
+
+
+def parse_metalink(data: bytes) -> list[str]:
+    """
+    Extract mirror URLs from a MirrorManager metalink, most preferred first.
+
+    Only HTTPS mirrors are returned.
+    """
+    root = ET.fromstring(data)
+    ranked: list[tuple[int, str]] = []
+    for element in root.iter():
+        if not element.tag.endswith("url") or not element.text:
+            continue
+        url = element.text.strip()
+        if urlparse(url).scheme != "https":
+            continue
+        preference = element.get("preference", "0")
+        ranked.append((int(preference) if preference.isdigit() else 0, url))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [url for _, url in ranked]
+
+
+def parse_mirrorlist(text: str) -> list[str]:
+    """Extract HTTPS mirror URLs from a plain-text mirrorlist, in order."""
+    return [
+        line.strip()
+        for line in text.splitlines()
+        if line.strip().startswith("https://")
+    ]
+
+
+def resolve_mirrors(url: str) -> list[str]:
+    """
+    Get candidate mirror URLs for a file.
+
+    URLs on the Fedora download redirector are resolved through its metalink
+    (falling back to the plain mirrorlist). Any other URL is its own only
+    candidate.
+
+    Args:
+        url: Download URL of the file
+
+    Returns:
+        Candidate URLs, best first (always at least one)
+    """
+    if host_of(url) not in _REDIRECTOR_HOSTS:
+        return [url]
+
+    from core.settings import get_config
+
+    urls = get_config().urls
+    path = quote(urlparse(url).path.lstrip("/"))
+    for endpoint, parse in (
+        (urls.fedora_metalink, parse_metalink),
+        (urls.fedora_mirrorlist, lambda data: parse_mirrorlist(data.decode())),
+    ):
+        try:
+            with segmented_download.open_url(f"{endpoint}?path={path}") as response:
+                mirrors = parse(response.read())
+        except (OSError, ValueError, ET.ParseError) as e:
+            logging.warning(f"Could not resolve mirrors from {endpoint}: {e}")
+            continue
+        if mirrors:
+            logging.info(f"Resolved {len(mirrors)} mirrors for {url}")
+            return mirrors[:MAX_MIRRORS]
+    return [url]
+
+
+def _race_one(url: str) -> MirrorResult:
+    began = time.monotonic()
+    try:
+        with segmented_download.open_url(
+            url, 0, RACE_BYTES, timeout=RACE_TIMEOUT
+        ) as response:
+            if response.status != 206:
+                return MirrorResult(url, error="no Range support")
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            received = 0
+            while received < RACE_BYTES:
+                data = response.read(min(64 * 1024, RACE_BYTES - received))
+                if not data:
+                    break
+                received += len(data)
+                if time.monotonic() - began > RACE_TIMEOUT:
+                    return MirrorResult(url, error="too slow")
+    except (OSError, ValueError) as e:
+        return MirrorResult(url, error=str(e))
+    elapsed = max(time.monotonic() - began, 1e-6)
+    return MirrorResult(
+        response.geturl(),
+        speed=received / elapsed,
+        size=int(total) if total.isdigit() else 0,
+    )
+
+
+def race_mirrors(candidates: list[str], count: int) -> list[MirrorResult]:
+    """
+    Download the first RACE_BYTES from up to *count* mirrors at once.
+
+    Mirrors with a cached measurement are raced first (best half of the
+    field), the rest of the field goes to unmeasured mirrors so new ones get
+    a chance. Mirrors whose file size disagrees with the majority are
+    treated as out of sync and dropped.
+
+    Args:
+        candidates: Mirror URLs, best first
+        count: Number of mirrors to race
+
+    Returns:
+        Usable mirrors, fastest first
+    """
+    stats = get_mirror_stats()
+    known = sorted(
+        (url for url in candidates if stats.speed(url) is not None),
+        key=lambda url: stats.speed(url) or 0.0,
+        reverse=True,
+    )
+    unknown = [url for url in candidates if url not in known]
+    entrants = known[: max(1, count // 2)]
+    entrants += unknown[: count - len(entrants)]
+    entrants += [url for url in known if url not in entrants][: count - len(entrants)]
+
+    results: list[MirrorResult] = []
+    threads = [
+        threading.Thread(target=lambda u=url: results.append(_race_one(u)))
+        for url in entrants
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sizes = Counter(r.size for r in results if not r.error and r.size)
+    size = sizes.most_common(1)[0][0] if sizes else 0
+    usable = []
+    for result in results:
+        if not result.error and result.size != size:
+            result.error = f"size {result.size} differs from {size}"
+        if result.error:
+            logging.info(f"Mirror {host_of(result.url)} rejected: {result.error}")
+            stats.record_failure(result.url)
+            continue
+        stats.record_speed(result.url, result.speed)
+        usable.append(result)
+    usable.sort(key=lambda r: r.speed, reverse=True)
+    for result in usable:
+        logging.info(f"Mirror {host_of(result.url)}: {result.speed / 1e6:.2f} MB/s")
+    return usable
+
+
+def rank_mirrors(url: str, count: int) -> list[str]:
+    """
+    Get the mirrors to download *url* from, fastest first.
+
+    Args:
+        url: Download URL of the file
+        count: Number of mirrors to race (0 or 1 disables racing)
+
+    Returns:
+        Mirror URLs, fastest first; just ``[url]`` if no mirror is usable
+    """
+    if count <= 1:
+        return [url]
+    candidates = resolve_mirrors(url)
+    if len(candidates) <= 1:
+        return candidates
+    ranked = [result.url for result in race_mirrors(candidates, count)]
+    return ranked or [url]
+
+
+# Global stats instance (lives next to the downloads it describes)
+_mirror_stats: MirrorStats | None = None
+
+
+def get_mirror_stats() -> MirrorStats:
+    """Get the global mirror measurements."""
+    global _mirror_stats
+    if _mirror_stats is None:
+        from core.settings import get_config
+
+        _mirror_stats = MirrorStats(get_config().paths.work_dir / _STATS_FILE_NAME)
+    return _mirror_stats
+
+
+def set_mirror_stats(stats: MirrorStats) -> None:
+    """Set the global mirror measurements (for testing)."""
+    global _mirror_stats
+    _mirror_stats = stats
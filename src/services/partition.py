@@ -8,8 +8,9 @@ from dataclasses import dataclass
 
 from models.partition import PartitioningOptions
 
-from .disk import (
-    Partition,
+from . import fat32
+from .disk import Partition
+from .storage import (
     delete_partition,
     get_efi_partition,
     get_windows_partition,
@@ -17,6 +18,9 @@ from .disk import (
     resize_partition,
 )
 
+# New partitions start and end on multiples of this (Windows' default)
+PARTITION_ALIGNMENT = 1024 * 1024
+
 
 @dataclass
 class PartitionGuids:
@@ -37,6 +41,18 @@ class PartitioningResult:
     sys_drive_original_size: int
     partition_guids: PartitionGuids
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "PartitioningResult":
+        """Rebuild a result saved with dataclasses.asdict."""
+        return cls(
+            tmp_part=Partition(**data["tmp_part"]),
+            windows_partition=Partition(**data["windows_partition"]),
+            efi_partition=Partition(**data["efi_partition"]),
+            shrink_space=data["shrink_space"],
+            sys_drive_original_size=data["sys_drive_original_size"],
+            partition_guids=PartitionGuids(**data["partition_guids"]),
+        )
+
 
 def partition_procedure(
     options: PartitioningOptions,
@@ -69,13 +85,16 @@ def partition_procedure(
         raise RuntimeError(msg)
 
     # Calculate shrink space if not provided
+    tmp_part_size = _align_up(options.tmp_part_size)
     if not (options.shrink_space and options.make_root_partition):
-        options.shrink_space = options.tmp_part_size + options.boot_part_size
+        options.shrink_space = tmp_part_size + _align_up(options.boot_part_size)
 
     # --- resize system drive ---
-    sys_drive_new_size = sys_drive_original_size - (
-        options.shrink_space + 1100000
-    )  # Extra safety margin
+    # End it on an alignment boundary
+    sys_drive_new_end = _align_down(
+        windows_partition.offset + sys_drive_original_size - options.shrink_space
+    )
+    sys_drive_new_size = sys_drive_new_end - windows_partition.offset
     resize_partition(windows_partition.partition_guid, sys_drive_new_size)
 
     # --- create partitions with rollback on failure ---
@@ -84,7 +103,7 @@ def partition_procedure(
         partition_guids = _create_partitions(
             windows_partition.disk_number,
             options.shrink_space,
-            options.tmp_part_size,
+            tmp_part_size,
             options.boot_part_size,
             options.make_root_partition,
             created_guids,
@@ -93,9 +112,10 @@ def partition_procedure(
         # Create the temporary partition (no mounting - caller is responsible)
         tmp_part = new_partition(
             windows_partition.disk_number,
-            options.tmp_part_size,
+            tmp_part_size,
             "FAT32",
             options.temp_part_label,
+            allocation_unit_size=fat32.CLUSTER_SIZE,
         )
         created_guids.append(tmp_part.partition_guid)
 
@@ -178,14 +198,24 @@ def _create_partitions(
     partition_guids = PartitionGuids()
 
     if make_root_partition:
-        root_space = shrink_space - (tmp_part_size + boot_part_size + 1100000)
+        root_space = _align_down(
+            shrink_space - (tmp_part_size + _align_up(boot_part_size))
+        )
         metadata = new_partition(sys_disk_number, root_space)
         partition_guids.root_guid = metadata.partition_guid
         created_guids.append(metadata.partition_guid)
 
     if boot_part_size:
-        metadata = new_partition(sys_disk_number, boot_part_size)
+        metadata = new_partition(sys_disk_number, _align_up(boot_part_size))
         partition_guids.boot_guid = metadata.partition_guid
         created_guids.append(metadata.partition_guid)
 
     return partition_guids
+
+
+def _align_up(size: int) -> int:
+    return -(-size // PARTITION_ALIGNMENT) * PARTITION_ALIGNMENT
+
+
+def _align_down(size: int) -> int:
+    return size // PARTITION_ALIGNMENT * PARTITION_ALIGNMENT
@@ -0,0 +1,103 @@
+"""
+Message framing for the privilege helper pipe.
+
+Each message is a pickled object preceded by its length (8 bytes, little
+endian), written in CHUNK_SIZE pieces and read back until the announced
+length has arrived. Messages of any size therefore cross the byte-mode
+pipe as one request or response, with no acknowledgements in between.
+
+The framing works on any transport given as a pair of callables, so the
+protocol can also run over a socket pair off Windows (see
+dev/bench_pipe_framing.py):
+
+    read(n) -> up to n bytes, b"" once the other end is closed
+    write(data) -> writes all of data
+"""
+
+import pickle
+import struct
+from collections.abc import Callable
+from typing import Any
+
+# Size of the named pipe's buffers, and of each read and write
+CHUNK_SIZE = 65536
+
+Reader = Callable[[int], bytes]
+Writer = Callable[[bytes | memoryview], None]
+
+_HEADER = struct.Struct("<Q")
+
+
+def send_message(write: Writer, message: Any) -> None:
+    """
+    Send one message.
+
+    Args:
+        write: Writes all the bytes it is given to the transport
+        message: Picklable object to send
+    """
+    payload = memoryview(pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+    # The header shares the first write, so small messages take one write
+    first = CHUNK_SIZE - _HEADER.size
+    write(_HEADER.pack(len(payload)) + payload[:first])
+    for start in range(first, len(payload), CHUNK_SIZE):
+        write(payload[start : start + CHUNK_SIZE])
+
+
+def receive_message(read: Reader) -> Any:
+    """
+    Receive one message.
+
+    Args:
+        read: Reads up to the given number of bytes from the transport
+
+    Returns:
+        The unpickled message
+
+    Raises:
+        EOFError: If the transport is closed before a message starts
+        ConnectionError: If it is closed in the middle of a message
+    """
+    header = _read_exactly(read, _HEADER.size, at_message_start=True)
+    (length,) = _HEADER.unpack(header)
+    return pickle.loads(_read_exactly(read, length))
+
+
+def win32_pipe_transport(pipe_handle: Any) -> tuple[Reader, Writer]:
+    """
+    Get the read and write callables of a byte-mode named pipe.
+
+    Args:
+        pipe_handle: Handle of a connected pipe
+
+    Returns:
+        (read, write) for send_message and receive_message
+    """
+    import win32file
+
+    def read(size: int) -> bytes:
+        _, data = win32file.ReadFile(pipe_handle, size)  # type: ignore
+        return data
+
+    def write(data: bytes | memoryview) -> None:
+        win32file.WriteFile(pipe_handle, data)  # type: ignore
+
+    return read, write
+
+
+def _read_exactly(read: Reader, size: int, at_message_start: bool = False) -> bytearray:
+    """Read *size* bytes, in as many reads of at most CHUNK_SIZE as needed."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        data = read(min(CHUNK_SIZE, size - received))
+        if not data:
+            if at_message_start and received == 0:
+                msg = "Pipe closed"
+                raise EOFError(msg)
+            msg = f"Pipe closed after {received} of {size} bytes of a message"
+            raise ConnectionError(msg)
+        view[received : received + len(data)] = data
+        received += len(data)
+    return buffer
@@ -6,22 +6,18 @@ It can execute both PowerShell commands and Python functions, then returns the r
 """
 
 import contextlib
-import pickle
 import subprocess
 import sys
 import traceback
 from pathlib import Path
 from typing import Any
 
-import pywintypes
-import win32file
-
 # Add src directory to path for module imports
 src_dir = Path(__file__).parent.parent
 if str(src_dir) not in sys.path:
     sys.path.insert(0, str(src_dir))
 
-BUFFER_SIZE = 65536
+from services import pipe_framing  # noqa: E402 - needs src on the path
 
 
 def execute_command(command_data: dict[str, Any]) -> Any:
@@ -92,8 +88,35 @@ def execute_command(command_data: dict[str, Any]) -> Any:
         }
 
 
+def serve(read: pipe_framing.Reader, write: pipe_framing.Writer) -> None:
+    """
+    Execute commands until told to shut down or the client disconnects.
+
+    Args:
+        read: Reads from the client's end of the transport
+        write: Writes to the client's end of the transport
+    """
+    while True:
+        try:
+            command_data = pipe_framing.receive_message(read)
+        except EOFError:
+            break
+
+        # Check for shutdown command
+        if command_data.get("type") == "shutdown":
+            response = {"success": True, "message": "Shutting down"}
+            pipe_framing.send_message(write, response)
+            break
+
+        # Execute command and send response back
+        response = execute_command(command_data)
+        pipe_framing.send_message(write, response)
+
+
 def main(pipe_name: str):
     """Main loop - listen on Named Pipe and execute commands."""
+    import pywintypes
+    import win32file
 
     full_pipe_name = rf"\\.\pipe\{pipe_name}"
     pipe_handle = None
@@ -110,36 +133,11 @@ def main(pipe_name: str):
             None,
         )
 
-        # Main command loop
-        while True:
-            try:
-                # Read command from pipe
-                _, data = win32file.ReadFile(pipe_handle, BUFFER_SIZE)  # type: ignore
-
-                if not data:
-                    break
-
-                # Deserialize command
-                command_data = pickle.loads(data)  # type: ignore
-
-                # Check for shutdown command
-                if command_data.get("type") == "shutdown":
-                    response = {"success": True, "message": "Shutting down"}
-                    response_data = pickle.dumps(response)
-                    win32file.WriteFile(pipe_handle, response_data)  # type: ignore
-                    break
-
-                # Execute command
-                response = execute_command(command_data)
-
-                # Send response back
-                response_data = pickle.dumps(response)
-                win32file.WriteFile(pipe_handle, response_data)  # type: ignore
-
-            except pywintypes.error as e:
-                # Pipe error - likely disconnected
-                if e.args[0] in (109, 232):  # ERROR_BROKEN_PIPE, ERROR_NO_DATA
-                    break
+        try:
+            serve(*pipe_framing.win32_pipe_transport(pipe_handle))
+        except pywintypes.error as e:
+            # Pipe error - likely disconnected
+            if e.args[0] not in (109, 232):  # ERROR_BROKEN_PIPE, ERROR_NO_DATA
                 raise
 
     except Exception:
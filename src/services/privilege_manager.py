@@ -20,7 +20,6 @@ import contextlib
 import ctypes
 import inspect
 import logging
-import pickle
 import subprocess
 import sys
 import threading
@@ -29,13 +28,13 @@ from collections.abc import Callable
 from pathlib import Path
 from typing import Any, Optional, TypeVar, cast
 
-import pywintypes
-import win32file
-import win32pipe
+from services import pipe_framing
 
 T = TypeVar("T")
 
-BUFFER_SIZE = 65536
+# Off Windows there is no helper: functions run in-process, unprivileged (the
+# loopback storage backend runs installations there, see services.storage)
+_use_helper = sys.platform == "win32"
 
 
 class _PrivilegeManager:
@@ -47,9 +46,13 @@ class _PrivilegeManager:
     def __init__(self):
         self.pipe_name: str | None = None
         self.pipe_handle: int | None = None
+        self._read: pipe_framing.Reader | None = None
+        self._write: pipe_framing.Writer | None = None
         self._initialized = False
         self._initializing = False
         self._failed = False
+        # One request/response exchange on the pipe at a time
+        self._command_lock = threading.Lock()
 
     @classmethod
     def get_instance(cls) -> "_PrivilegeManager":
@@ -64,6 +67,9 @@ class _PrivilegeManager:
         if self._initialized:
             return
 
+        import win32file
+        import win32pipe
+
         with self._lock:
             if self._initialized:
                 return
@@ -94,8 +100,8 @@ class _PrivilegeManager:
                     | win32pipe.PIPE_READMODE_BYTE
                     | win32pipe.PIPE_WAIT,
                     1,  # Max instances
-                    BUFFER_SIZE,
-                    BUFFER_SIZE,
+                    pipe_framing.CHUNK_SIZE,
+                    pipe_framing.CHUNK_SIZE,
                     0,
                     None,  # type: ignore
                 )
@@ -135,6 +141,9 @@ class _PrivilegeManager:
                 logging.debug(
                     f"Privilege helper successfully connected on pipe: {self.pipe_name}"
                 )
+                self._read, self._write = pipe_framing.win32_pipe_transport(
+                    self.pipe_handle
+                )
 
                 # Register cleanup on exit
                 atexit.register(self.shutdown)
@@ -149,18 +158,18 @@ class _PrivilegeManager:
 
     def _send_command(self, command_data: dict[str, Any]) -> Any:
         """Send command to helper and get response."""
+        import pywintypes
+
         self._ensure_initialized()
 
-        if self.pipe_handle is None:
+        if self._read is None or self._write is None:
             msg = "Privilege manager not initialized"
             raise RuntimeError(msg)
 
         try:
-            data = pickle.dumps(command_data)
-            win32file.WriteFile(self.pipe_handle, data)  # type: ignore
-
-            _, response_data = win32file.ReadFile(self.pipe_handle, BUFFER_SIZE)  # type: ignore
-            response = pickle.loads(response_data)  # type: ignore
+            with self._command_lock:
+                pipe_framing.send_message(self._write, command_data)
+                response = pipe_framing.receive_message(self._read)
 
             if isinstance(response, dict) and response.get("type") == "error":
                 msg = f"Privilege helper error: {response['error']}"
@@ -174,6 +183,10 @@ class _PrivilegeManager:
                 msg = "Connection to privilege helper lost"
                 raise RuntimeError(msg) from e
             raise
+        except (EOFError, ConnectionError) as e:
+            self._initialized = False
+            msg = "Connection to privilege helper lost"
+            raise RuntimeError(msg) from e
 
     def ping(self) -> bool:
         """
@@ -193,15 +206,15 @@ class _PrivilegeManager:
         if not self._initialized or self.pipe_handle is None:
             return
 
+        import win32file
+
         try:
             # Send shutdown command
-            shutdown_data = {"type": "shutdown"}
-            data = pickle.dumps(shutdown_data)
-            win32file.WriteFile(self.pipe_handle, data)  # type: ignore
+            pipe_framing.send_message(self._write, {"type": "shutdown"})  # type: ignore
 
             # Read acknowledgment
             with contextlib.suppress(Exception):
-                win32file.ReadFile(self.pipe_handle, BUFFER_SIZE)  # type: ignore
+                pipe_framing.receive_message(self._read)  # type: ignore
 
         except Exception:
             pass
@@ -210,6 +223,7 @@ class _PrivilegeManager:
                 win32file.CloseHandle(self.pipe_handle)  # type: ignore
 
             self.pipe_handle = None
+            self._read = self._write = None
             self._initialized = False
 
 
@@ -233,6 +247,9 @@ class elevated:  # noqa: N801
             proc = elevated.run(["powershell.exe", "-Command", "Get-Process"],
                                capture_output=True, text=True)
         """
+        if not _use_helper:
+            return subprocess.run(args, **kwargs)
+
         # Let subprocess.run handle all the argument parsing/validation
         # We just intercept and forward to the helper
         manager = _PrivilegeManager.get_instance()
@@ -291,6 +308,8 @@ class elevated:  # noqa: N801
         """
         if kwargs is None:
             kwargs = {}
+        if not _use_helper:
+            return target(*args, **kwargs)
 
         manager = _PrivilegeManager.get_instance()
 
@@ -317,6 +336,17 @@ class elevated:  # noqa: N801
         return cast("T", response["result"])
 
 
+def set_use_helper(use_helper: bool) -> None:
+    """
+    Choose whether elevated calls go through the helper (for testing and dry runs).
+
+    Args:
+        use_helper: False to run them in-process, without elevation
+    """
+    global _use_helper
+    _use_helper = use_helper
+
+
 if __name__ == "__main__":
     # Check for elevated helper mode when not in PyInstaller bundle
     if "/PIPE" in sys.argv and not getattr(sys, "frozen", False):
@@ -0,0 +1,189 @@
+"""
+Push-based progress notification.
+Lets a download wake its monitor when there is something new to report,
+coalesced to a configurable rate, and the moment it finishes; and tracks
+throughput and ETA of byte-counted jobs such as copies.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+
+from services.stages import count_stage_io
+
+DEFAULT_PROGRESS_INTERVAL = 0.1  # seconds between coalesced updates
+_SPEED_WINDOW = 3.0  # seconds of samples used for the speed estimate
+
+
+class ProgressChannel:
+    """
+    Coalescing wake-up channel between a producer and one consumer.
+
+    The producer calls :meth:`publish` as often as it likes (e.g. per chunk
+    received) and :meth:`finish` once. The consumer blocks in :meth:`wait`,
+    which returns at most once per ``interval`` while progress is being
+    published, and immediately once the producer has finished.
+    """
+
+    def __init__(self, interval: float = DEFAULT_PROGRESS_INTERVAL):
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._pending = False
+        self._finished = False
+        self._last_delivery = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def publish(self) -> None:
+        """Signal that there is new progress."""
+        with self._cond:
+            if not self._pending:
+                self._pending = True
+                self._cond.notify_all()
+
+    def finish(self) -> None:
+        """Signal that the producer is done; wakes the consumer immediately."""
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def wait(self) -> bool:
+        """
+        Block until there is progress to report or the producer finished.
+
+        Returns:
+            True if the producer finished, False for a progress update
+        """
+        with self._cond:
+            while not self._finished:
+                wait_for = None
+                if self._pending:
+                    now = time.monotonic()
+                    due = self._last_delivery + self.interval
+                    if now >= due:
+                        self._pending = False
+                        self._last_delivery = now
+                        return False
+                    wait_for = due - now
+                self._cond.wait(wait_for)
+            return True
+
+
+def poll_into(handle, channel: ProgressChannel) -> threading.Thread:
+    """
+    Feed *channel* from a handle that can only be polled (e.g. requers).
+
+    Publishes every ``channel.interval`` until ``handle.is_finished()``, then
+    finishes the channel.
+
+    Args:
+        handle: Object with an ``is_finished()`` method
+        channel: Channel to publish to
+
+    Returns:
+        The started polling thread
+    """
+
+    def poll() -> None:
+        while not handle.is_finished():
+            channel.publish()
+            time.sleep(channel.interval)
+        channel.finish()
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    return thread
+
+
+class ByteProgress:
+    """
+    Bytes done of a job made of several steps, with throughput and ETA.
+
+    Steps (e.g. each extraction or copy) add to one running count, so the
+    speed and ETA cover the whole job. *on_update* is called with
+    (done, total, bytes per second, seconds left) at most once per
+    ``interval``, and by :meth:`finish`. Safe to advance from several
+    threads.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        on_update: Callable[[int, int, float, float], None],
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ):
+        self.total = total
+        self.done = 0
+        self.on_update = on_update
+        self.interval = interval
+        self._samples: deque[tuple[float, int]] = deque()
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    def advance(self, nbytes: int) -> None:
+        """Count *nbytes* more as done."""
+        with self._lock:
+            self.done += nbytes
+            now = time.monotonic()
+            self._samples.append((now, self.done))
+            while now - self._samples[0][0] > _SPEED_WINDOW:
+                self._samples.popleft()
+            if now - self._last_update < self.interval:
+                return
+            self._last_update = now
+            self._notify()
+
+    def step_callback(self) -> Callable[[int, int], None]:
+        """
+        Get a callback for a step that reports its own cumulative progress.
+
+        The returned function takes (step bytes done, step total) and
+        advances by the difference since its last call.
+        """
+        reported = 0
+
+        def report(step_done: int, _step_total: int) -> None:
+            nonlocal reported
+            self.advance(step_done - reported)
+            reported = step_done
+
+        return report
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Log the throughput of the bytes done inside the block as *name*.
+
+        The bytes also count as I/O of the scheduled stage running the block.
+        """
+        began = time.monotonic()
+        done_before = self.done
+        yield
+        elapsed = time.monotonic() - began
+        nbytes = self.done - done_before
+        speed = nbytes / elapsed if elapsed > 0 else 0.0
+        logging.info(
+            f"{name}: {nbytes} bytes in {elapsed:.1f} s ({speed / 1e6:.1f} MB/s)"
+        )
+        count_stage_io(nbytes)
+
+    def finish(self) -> None:
+        """Report the final count; the total becomes what was actually done."""
+        with self._lock:
+            self.total = self.done
+            self._notify()
+
+    def _notify(self) -> None:
+        """Call on_update with the current numbers (lock held)."""
+        first_time, first_done = self._samples[0] if self._samples else (0.0, 0)
+        last_time, last_done = self._samples[-1] if self._samples else (0.0, 0)
+        elapsed = last_time - first_time
+        speed = (last_done - first_done) / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.done)
+        eta = remaining / speed if speed > 0 else -1.0
+        self.on_update(self.done, self.total, speed, eta)
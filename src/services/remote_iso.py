@@ -0,0 +1,178 @@
+"""
+Reading single files out of remote ISO images.
+Only the volume descriptors and the directory records on the file's path
+are fetched, with HTTP Range requests, to locate a file (nothing at all if
+the image is in the ISO index); then just its extents are downloaded. The data is verified against
+the file's own SHA256 from the ISO index.
+"""
+
+import contextlib
+import logging
+from collections.abc import Callable
+from pathlib import Path
+
+from services import segmented_download
+from services.bandwidth import Transfer
+from services.download import DownloadProgress, stream_download
+from services.iso9660 import IsoFile, IsoFormatError, find_file
+from services.iso_index import get_iso_index
+from services.progress import DEFAULT_PROGRESS_INTERVAL
+
+_BLOCK_SIZE = 256 * 1024  # Metadata is read ahead in blocks of this size
+
+
+class RemoteIsoImage:
+    """The directory tree of an image on an HTTP server that serves ranges."""
+
+    def __init__(self, url: str, size: int, files: dict[str, IsoFile]):
+        self.url = url  # Final URL after redirects
+        self.size = size
+        # Image path (e.g. "/LiveOS/squashfs.img") -> file; only the wanted
+        # file if the image wasn't indexed
+        self.files = files
+
+    @classmethod
+    def open(
+        cls, url: str, iso_path: str, sha256: str | None = None
+    ) -> "RemoteIsoImage":
+        """
+        Locate a file in the image at *url*.
+
+        Args:
+            url: URL of the image
+            iso_path: Path of the wanted file in the image
+            sha256: Expected digest of the image; its tree is taken from the
+                ISO index if it is there
+
+        Raises:
+            RangeNotSupportedError: If the server doesn't serve byte ranges
+            IsoFormatError: If the image isn't a (supported) ISO9660 image
+            OSError: If a request fails
+        """
+        info = segmented_download.probe(url)
+        if not info.accepts_ranges:
+            msg = f"{url} is not served with byte ranges"
+            raise segmented_download.RangeNotSupportedError(msg)
+        files = get_iso_index().lookup(sha256) if sha256 else None
+        if files is not None:
+            return cls(info.url, info.size, files)
+        reader = _BlockReader(info.url, info.size)
+        iso_file = find_file(reader.read_at, iso_path, url)
+        logging.info(
+            f"Looked up {iso_path} in {url} "
+            f"with {reader.requests} range requests ({reader.fetched} bytes)"
+        )
+        files = {iso_file.path: iso_file} if iso_file is not None else {}
+        return cls(info.url, info.size, files)
+
+    def fetch_file(
+        self,
+        iso_path: str,
+        target: Path,
+        expected_hash: str,
+        progress_callback: Callable[[DownloadProgress], None] | None = None,
+        transfer: Transfer | None = None,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ) -> str:
+        """
+        Download one file of the image to *target*.
+
+        Args:
+            iso_path: Path of the file in the image
+            target: Local file to write
+            expected_hash: SHA256 of the file itself (not of the image)
+            progress_callback: Optional callback for progress updates
+            transfer: Optional share of a BandwidthScheduler to throttle to
+            progress_interval: Minimum seconds between progress callbacks
+
+        Returns:
+            SHA256 of the file (lowercase hex)
+
+        Raises:
+            KeyError: If the image has no such file
+            HashVerificationError: If the data doesn't match *expected_hash*
+                (the partial *target* is removed)
+            RuntimeError: If the download fails
+        """
+        iso_file = self.files[iso_path]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with target.open("wb") as f:
+                sha256 = stream_download(
+                    self.url,
+                    f.write,
+                    expected_hash,
+                    progress_callback,
+                    transfer,
+                    progress_interval=progress_interval,
+                    ranges=iso_file.extents,
+                )
+        except BaseException:
+            with contextlib.suppress(OSError):
+                target.unlink()
+            raise
+        saved = self.size - iso_file.size
+        logging.info(
+            f"Fetched {iso_path} alone from {self.url}, {saved} bytes not downloaded"
+        )
+        return sha256
+
+
+class _BlockReader:
+    """Random access to a remote file through cached, ranged block reads."""
+
+    def __init__(self, url: str, size: int):
+        self.url = url
+        self.size = size
+        self.requests = 0
+        self.fetched = 0
+        self._blocks: dict[int, bytes] = {}
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b""
+        first = offset // _BLOCK_SIZE
+        last = (end - 1) // _BLOCK_SIZE
+        missing = [i for i in range(first, last + 1) if i not in self._blocks]
+        if missing:
+            # One request from the first missing block to the last one
+            start = missing[0] * _BLOCK_SIZE
+            stop = min((missing[-1] + 1) * _BLOCK_SIZE, self.size)
+            with segmented_download.open_url(self.url, start, stop) as response:
+                if response.status != 206:
+                    msg = f"Server ignored Range request for {self.url}"
+                    raise segmented_download.RangeNotSupportedError(msg)
+                data = response.read()
+            if len(data) != stop - start:
+                msg = f"Short read fetching bytes {start}-{stop} of {self.url}"
+                raise OSError(msg)
+            self.requests += 1
+            self.fetched += len(data)
+            for i in range(missing[0], missing[-1] + 1):
+                block_start = (i - missing[0]) * _BLOCK_SIZE
+                self._blocks[i] = data[block_start : block_start + _BLOCK_SIZE]
+        data = b"".join(self._blocks[i] for i in range(first, last + 1))
+        skip = offset - first * _BLOCK_SIZE
+        return data[skip : skip + end - offset]
+
+
+def open_remote_iso(
+    url: str, iso_path: str, sha256: str | None = None
+) -> RemoteIsoImage | None:
+    """
+    Locate a file in a remote image, if the server allows it.
+
+    Args:
+        url: URL of the image
+        iso_path: Path of the wanted file in the image
+        sha256: Expected digest of the image, to use its indexed tree
+
+    Returns:
+        The image, or None if it can't be read with range requests
+    """
+    try:
+        return RemoteIsoImage.open(url, iso_path, sha256)
+    except (OSError, IsoFormatError, segmented_download.RangeNotSupportedError) as e:
+        logging.info(f"Cannot read {url} by ranges, downloading it whole: {e}")
+        return None
@@ -0,0 +1,495 @@
+"""
+Segmented download engine.
+Splits a file into byte ranges and fetches them over parallel HTTP Range
+requests into a preallocated target file.
+
+The returned handle mirrors the ``requers`` download handle API
+(``is_finished``, ``is_successful``, ``get_progress``) so the download service
+can monitor both the same way.
+"""
+
+import contextlib
+import http.client
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from services.hashing import StreamingHasher
+from services.progress import ProgressChannel
+
+if TYPE_CHECKING:
+    from services.bandwidth import Transfer
+    from services.chunk_manifest import ChunkRecorder
+
+DEFAULT_SEGMENTS = 4
+MIN_SEGMENT_SIZE = 16 * 1024 * 1024  # Don't split below 16 MiB per connection
+READ_CHUNK_SIZE = 256 * 1024
+MAX_SEGMENT_RETRIES = 3
+REQUEST_TIMEOUT = 30.0
+
+_USER_AGENT = "WinGone/1.0"
+_STATE_SUFFIX = ".segments.json"
+_STATE_FLUSH_INTERVAL = 2.0  # seconds
+_SPEED_WINDOW = 3.0  # seconds of samples used for the speed estimate
+_SLOW_WINDOW = 10.0  # seconds below min_speed before failing over to a mirror
+
+
+class RangeNotSupportedError(RuntimeError):
+    """Raised when a server does not honour HTTP Range requests."""
+
+
+@dataclass
+class RemoteFileInfo:
+    """What a probe request learned about a remote file."""
+
+    url: str  # Final URL after redirects
+    size: int
+    accepts_ranges: bool
+    etag: str = ""
+
+
+@dataclass
+class _Segment:
+    """A byte range [start, end) and how much of it is on disk."""
+
+    start: int
+    end: int
+    position: int
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.position
+
+
+def open_url(
+    url: str,
+    start: int | None = None,
+    end: int | None = None,
+    timeout: float = REQUEST_TIMEOUT,
+    headers: dict[str, str] | None = None,
+) -> http.client.HTTPResponse:
+    """
+    Open a URL for streaming, optionally restricted to the range [start, end).
+
+    Args:
+        url: URL to open
+        start: First byte to request (None for the whole resource)
+        end: Byte after the last one to request (None for "until EOF")
+        timeout: Socket timeout in seconds
+        headers: Extra request headers
+
+    Returns:
+        The open HTTP response (use as a context manager)
+    """
+    headers = {"User-Agent": _USER_AGENT, **(headers or {})}
+    if start is not None:
+        last = "" if end is None else str(end - 1)
+        headers["Range"] = f"bytes={start}-{last}"
+    request = urllib.request.Request(url, headers=headers)
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def probe(url: str) -> RemoteFileInfo:
+    """
+    Resolve redirects and find out whether the server serves byte ranges.
+
+    Args:
+        url: URL to probe
+
+    Returns:
+        RemoteFileInfo for the final (redirected) URL
+    """
+    with open_url(url, 0, 1) as response:
+        final_url = response.geturl()
+        etag = response.headers.get("ETag", "")
+        if response.status == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            size = int(total) if total.isdigit() else 0
+            return RemoteFileInfo(final_url, size, size > 0, etag)
+
+        # Server ignored the Range header and started sending the whole body
+        size = int(response.headers.get("Content-Length") or 0)
+        return RemoteFileInfo(final_url, size, False, etag)
+
+
+def state_path_for(filepath: Path) -> Path:
+    """Get the path of the resume-state sidecar for a segmented download."""
+    return filepath.with_name(filepath.name + _STATE_SUFFIX)
+
+
+def has_resume_state(filepath: Path) -> bool:
+    """Check whether a segmented download of *filepath* can be resumed."""
+    return state_path_for(filepath).is_file()
+
+
+def discard_state(filepath: Path) -> None:
+    """Remove the resume-state sidecar of *filepath*, if any."""
+    with contextlib.suppress(OSError):
+        state_path_for(filepath).unlink()
+
+
+def split_ranges(size: int, segments: int, align: int = 1) -> list[tuple[int, int]]:
+    """
+    Split ``size`` bytes into at most ``segments`` contiguous [start, end) ranges.
+
+    Ranges are never smaller than MIN_SEGMENT_SIZE (except for a lone range
+    covering a small file), and start on a multiple of ``align``.
+    """
+    count = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+    step = -(-size // count)  # ceil division
+    step = -(-step // align) * align
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+class SegmentedDownload:
+    """Handle for a running segmented download."""
+
+    def __init__(
+        self,
+        info: RemoteFileInfo,
+        filepath: Path,
+        segments: list[_Segment],
+        hasher: StreamingHasher | None = None,
+        recorder: "ChunkRecorder | None" = None,
+        transfer: "Transfer | None" = None,
+        mirrors: list[str] | None = None,
+        min_speed: float = 0.0,
+        progress: ProgressChannel | None = None,
+    ):
+        self.info = info
+        self.filepath = filepath
+        self._segments = segments
+        self._hasher = hasher
+        self._recorder = recorder
+        self._transfer = transfer
+        self._progress = progress
+        # Fallback mirrors, next-best first; remaining ranges move to the next
+        # one when the current URL fails or stays below min_speed
+        self._urls = [info.url, *(mirrors or [])]
+        self._url_index = 0
+        self.min_speed = min_speed
+        self._started = time.monotonic()
+        self._initial_bytes = self.downloaded
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._error: BaseException | None = None
+        self._samples: deque[tuple[float, int]] = deque()
+        self._last_state_flush = 0.0
+
+    @property
+    def error(self) -> BaseException | None:
+        """The first error raised by a segment worker, if any."""
+        return self._error
+
+    @property
+    def url(self) -> str:
+        """The URL segments are currently fetched from."""
+        return self._urls[self._url_index]
+
+    @property
+    def downloaded(self) -> int:
+        """Bytes of the file that are on disk."""
+        return sum(s.position - s.start for s in self._segments)
+
+    @property
+    def average_speed(self) -> float:
+        """Bytes/s fetched by this handle (excluding a resumed prefix)."""
+        elapsed = time.monotonic() - self._started
+        return (self.downloaded - self._initial_bytes) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def contiguous_bytes(self) -> int:
+        """Length of the leading part of the file that is completely on disk."""
+        for segment in self._segments:
+            if segment.remaining > 0:
+                return segment.position
+        return self.info.size
+
+    def start(self) -> "SegmentedDownload":
+        """Start one worker thread per unfinished segment."""
+        workers = [
+            threading.Thread(target=self._run_worker, args=(segment,), daemon=True)
+            for segment in self._segments
+            if segment.remaining > 0
+        ]
+        logging.info(
+            f"Segmented download of {self.filepath.name}: "
+            f"{len(workers)} of {len(self._segments)} segments pending "
+            f"({self.info.url})"
+        )
+        for worker in workers:
+            worker.start()
+        threading.Thread(target=self._supervise, args=(workers,), daemon=True).start()
+        return self
+
+    def cancel(self) -> None:
+        """Ask all workers to stop at the next chunk boundary."""
+        self._cancelled.set()
+
+    def is_finished(self) -> bool:
+        return self._finished.is_set()
+
+    def is_successful(self) -> bool:
+        return self._finished.is_set() and self._transfer_complete()
+
+    def get_progress(self) -> dict[str, Any]:
+        """Get progress in the same shape as the requers handle."""
+        downloaded = self.downloaded
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, downloaded))
+            while len(self._samples) > 2 and now - self._samples[0][0] > _SPEED_WINDOW:
+                self._samples.popleft()
+            first_time, first_bytes = self._samples[0]
+
+        elapsed = now - first_time
+        speed = (downloaded - first_bytes) / elapsed if elapsed > 0 else 0.0
+        remaining = self.info.size - downloaded
+        eta = remaining / speed if speed > 0 else 0.0
+        return {
+            "downloaded": downloaded,
+            "total": self.info.size,
+            "speed": speed,
+            "eta": eta,
+        }
+
+    def _supervise(self, workers: list[threading.Thread]) -> None:
+        window: deque[tuple[float, int]] = deque([(time.monotonic(), self.downloaded)])
+        while alive := [worker for worker in workers if worker.is_alive()]:
+            alive[0].join(timeout=1.0)
+            now = time.monotonic()
+            window.append((now, self.downloaded))
+            if now - window[0][0] < _SLOW_WINDOW:
+                continue
+            first_time, first_bytes = window.popleft()
+            speed = (window[-1][1] - first_bytes) / (now - first_time)
+            if speed < self._slow_threshold() and self._switch_mirror(
+                f"{speed / 1e3:.0f} kB/s over {_SLOW_WINDOW:.0f} s"
+            ):
+                window = deque([(now, self.downloaded)])
+        if self._transfer_complete():
+            discard_state(self.filepath)
+        else:
+            self._flush_state(force=True)
+        self._finished.set()
+        if self._progress:
+            self._progress.finish()
+
+    def _slow_threshold(self) -> float:
+        """Throughput below which the current mirror counts as too slow."""
+        rate = self._transfer.rate if self._transfer else 0.0
+        if rate > 0:
+            # Don't blame the mirror for our own bandwidth scheduling
+            return min(self.min_speed, rate / 2)
+        return self.min_speed
+
+    def _switch_mirror(self, reason: str, failed_url: str | None = None) -> bool:
+        """
+        Move all remaining ranges to the next mirror.
+
+        Args:
+            reason: Why the current mirror is abandoned (for the log)
+            failed_url: URL the caller was using; if another worker already
+                switched away from it, nothing is done
+
+        Returns:
+            True if segments now use a different URL than *failed_url*
+        """
+        with self._lock:
+            if failed_url is not None and failed_url != self.url:
+                return True
+            if self._url_index + 1 >= len(self._urls):
+                return False
+            self._url_index += 1
+            new_url = self.url
+        logging.warning(
+            f"Moving remaining ranges of {self.filepath.name} to {new_url} ({reason})"
+        )
+        return True
+
+    def _transfer_complete(self) -> bool:
+        return self._error is None and all(s.remaining == 0 for s in self._segments)
+
+    def _run_worker(self, segment: _Segment) -> None:
+        try:
+            self._download_segment(segment)
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self._cancelled.set()
+
+    def _download_segment(self, segment: _Segment) -> None:
+        attempts = 0
+        # Unbuffered, so anything counted in segment.position is visible to
+        # the hasher's read-back
+        with self.filepath.open("r+b", buffering=0) as f:
+            while segment.remaining > 0 and not self._cancelled.is_set():
+                url = self.url
+                try:
+                    self._fetch_into(f, segment, url)
+                except RangeNotSupportedError as e:
+                    if not self._switch_mirror(str(e), url):
+                        raise
+                except (OSError, http.client.HTTPException) as e:
+                    attempts += 1
+                    if attempts > MAX_SEGMENT_RETRIES:
+                        if not self._switch_mirror(str(e), url):
+                            raise
+                        attempts = 0
+                        continue
+                    logging.warning(
+                        f"Segment {segment.start}-{segment.end} of "
+                        f"{self.filepath.name} failed ({e}), retrying "
+                        f"({attempts}/{MAX_SEGMENT_RETRIES})"
+                    )
+                    time.sleep(attempts)
+
+    def _fetch_into(self, f, segment: _Segment, url: str) -> None:
+        with open_url(url, segment.position, segment.end) as response:
+            if response.status != 206:
+                msg = f"Server ignored Range request for {url}"
+                raise RangeNotSupportedError(msg)
+
+            f.seek(segment.position)
+            # Stop when the download moves to another mirror; the caller
+            # reconnects from segment.position
+            while (
+                segment.remaining > 0
+                and not self._cancelled.is_set()
+                and url == self.url
+            ):
+                chunk = response.read(min(READ_CHUNK_SIZE, segment.remaining))
+                if not chunk:
+                    msg = "Connection closed before the segment was complete"
+                    raise ConnectionError(msg)
+                _write_all(f, chunk)
+                # Record chunk digests of the bytes as received, so later
+                # on-disk damage shows up as a chunk mismatch
+                if self._recorder:
+                    self._recorder.update(segment.position, chunk)
+                if self._hasher:
+                    self._hasher.feed(segment.position, chunk)
+                with self._lock:
+                    segment.position += len(chunk)
+                self._flush_state()
+                if self._progress:
+                    self._progress.publish()
+                if self._transfer:
+                    self._transfer.consume(len(chunk))
+
+    def _flush_state(self, force: bool = False) -> None:
+        """Persist segment positions so an interrupted download can resume."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_state_flush < _STATE_FLUSH_INTERVAL:
+                return
+            self._last_state_flush = now
+            state = {
+                "url": self.url,
+                "size": self.info.size,
+                "etag": self.info.etag,
+                "segments": [[s.start, s.end, s.position] for s in self._segments],
+            }
+        try:
+            state_path_for(self.filepath).write_text(
+                json.dumps(state), encoding="utf-8"
+            )
+        except OSError as e:
+            logging.debug(f"Could not write segment state for {self.filepath}: {e}")
+
+
+def _write_all(f, data: bytes) -> None:
+    """Write all of *data* to an unbuffered file."""
+    view = memoryview(data)
+    while view:
+        view = view[f.write(view) :]
+
+
+def _load_segments(filepath: Path, info: RemoteFileInfo) -> list[_Segment] | None:
+    """Load resumable segments, or None if the saved state doesn't apply."""
+    state_path = state_path_for(filepath)
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+    # ETags are per server, so they only say something when resuming from
+    # the same mirror; the final hash check covers switching mirrors
+    if (
+        state.get("size") != info.size
+        or (state.get("url") == info.url and state.get("etag", "") != info.etag)
+        or not filepath.is_file()
+        or filepath.stat().st_size != info.size
+    ):
+        logging.info(f"Discarding stale segment state for {filepath.name}")
+        discard_state(filepath)
+        return None
+
+    return [
+        _Segment(start, end, position) for start, end, position in state["segments"]
+    ]
+
+
+def start_segmented_download(
+    url: str,
+    filepath: Path,
+    segments: int = DEFAULT_SEGMENTS,
+    hasher: StreamingHasher | None = None,
+    recorder: "ChunkRecorder | None" = None,
+    transfer: "Transfer | None" = None,
+    mirrors: list[str] | None = None,
+    min_speed: float = 0.0,
+    progress: ProgressChannel | None = None,
+) -> SegmentedDownload | None:
+    """
+    Start downloading *url* to *filepath* over parallel Range requests.
+
+    An interrupted segmented download of the same remote file is resumed
+    from its state sidecar.
+
+    Args:
+        url: URL to download from
+        filepath: Target file path
+        segments: Maximum number of parallel connections
+        hasher: Optional streaming hasher fed with in-order data as it arrives
+        recorder: Optional chunk recorder fed with every segment's data; ranges
+            are then aligned to its chunk size
+        transfer: Optional bandwidth share that throttles all segments
+        mirrors: Fallback URLs of the same file, next-best first
+        min_speed: Bytes/s below which remaining ranges move to the next
+            mirror (0 = never fail over for speed)
+        progress: Optional channel published to as data arrives and
+            finished the moment the download ends
+
+    Returns:
+        A running SegmentedDownload, or None if the server does not support
+        Range requests (the caller should fall back to a single stream)
+    """
+    info = probe(url)
+    if not info.accepts_ranges:
+        logging.info(f"{info.url} does not support Range requests")
+        return None
+
+    parts = _load_segments(filepath, info)
+    if parts is None:
+        # Preallocate so every worker can write at its own offset
+        with filepath.open("wb") as f:
+            f.truncate(info.size)
+        parts = [
+            _Segment(start, end, start)
+            for start, end in split_ranges(
+                info.size, segments, recorder.chunk_size if recorder else 1
+            )
+        ]
+
+    return SegmentedDownload(
+        info, filepath, parts, hasher, recorder, transfer, mirrors, min_speed, progress
+    ).start()
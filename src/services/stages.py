@@ -0,0 +1,287 @@
+"""
+Dependency-aware stage scheduling.
+A job is declared as stages that each name what they need and what they
+provide; every stage starts as soon as all it needs has been provided, so
+independent stages run at the same time. The wall time of each stage is
+measured and remembered, and overall progress is weighted by how long each
+stage is expected to take.
+"""
+
+import contextlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_TIMINGS_FILE_NAME = "stage_timings.json"
+_TIMING_SMOOTHING = 0.5  # Weight of the latest run in a remembered speed
+_MIN_EXPECTED_SECONDS = 1.0  # Even a stage with nothing to do takes a moment
+
+_running = threading.local()
+
+
+def current_stage() -> "Stage | None":
+    """Get the stage running on the calling thread, if any."""
+    return getattr(_running, "stage", None)
+
+
+def count_stage_io(nbytes: int) -> None:
+    """Add *nbytes* read or written to the stage running on the calling thread."""
+    stage = current_stage()
+    if stage is not None:
+        stage.io_bytes += nbytes
+
+
+@dataclass(eq=False)
+class Stage:
+    """
+    One step of a scheduled job.
+
+    Stages exchange their data through shared state (such as the
+    installation context); *needs* and *provides* only name it, to order
+    the stages. A stage fails by raising.
+    """
+
+    name: str
+    run: Callable[[], None]
+    needs: tuple[str, ...] = ()
+    provides: tuple[str, ...] = ()
+    # Amount of work (bytes, files...) and the seconds a unit takes until
+    # the stage has been measured
+    work: float = 1.0
+    seconds_per_unit: float = 1.0
+    # Called from another thread to make the stage return early
+    cancel: Callable[[], None] | None = None
+    # Called instead of run first; returns True if an earlier run's results
+    # are still valid and in use, so the stage is skipped
+    restore: Callable[[], bool] | None = None
+    fraction: float = field(default=0.0, init=False)
+    expected_seconds: float = field(default=0.0, init=False)
+    # Measured once it runs: when it started (time.monotonic), how long it
+    # took and how many bytes of data it moved (see count_stage_io)
+    started: float | None = field(default=None, init=False)
+    seconds: float | None = field(default=None, init=False)
+    io_bytes: int = field(default=0, init=False)
+
+    def report(self, fraction: float) -> None:
+        """Record how much of the stage is done; it never goes back."""
+        self.fraction = max(self.fraction, min(1.0, fraction))
+
+
+class StageTimings:
+    """On-disk map of stage name -> measured seconds per unit of work."""
+
+    def __init__(self, timings_file: Path):
+        self.timings_file = timings_file
+        self._entries: dict[str, float] | None = None
+        self._lock = threading.Lock()
+
+    def seconds_per_unit(self, stage: Stage) -> float:
+        """Get the measured speed of *stage*, or its default if never measured."""
+        with self._lock:
+            return self._load().get(stage.name, stage.seconds_per_unit)
+
+    def record(self, stage: Stage) -> None:
+        """Blend the measured wall time of a finished *stage* into its speed."""
+        if stage.seconds is None or stage.work <= 0:
+            return
+        measured = stage.seconds / stage.work
+        with self._lock:
+            entries = self._load()
+            previous = entries.get(stage.name)
+            if previous is not None:
+                measured = (
+                    _TIMING_SMOOTHING * measured + (1 - _TIMING_SMOOTHING) * previous
+                )
+            entries[stage.name] = measured
+            self._save()
+
+    def _load(self) -> dict[str, float]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(
+                    self.timings_file.read_text(encoding="utf-8")
+                )
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        tmp_file = self.timings_file.with_name(self.timings_file.name + ".tmp")
+        try:
+            self.timings_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(self._entries, indent=1), encoding="utf-8")
+            tmp_file.replace(self.timings_file)
+        except OSError as e:
+            logging.warning(f"Could not save stage timings {self.timings_file}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
+
+
+class StageScheduler:
+    """Runs a graph of stages, each as soon as what it needs is provided."""
+
+    def __init__(self, stages: Sequence[Stage], timings: StageTimings | None = None):
+        """
+        Check the graph and estimate each stage's duration.
+
+        Args:
+            stages: The stages of the job
+            timings: Measured speeds of earlier runs, updated by this one
+
+        Raises:
+            ValueError: If a name is used twice, a need is never provided, or
+                the stages depend on each other in a cycle
+        """
+        self.stages = list(stages)
+        self.timings = timings
+        _check_graph(self.stages)
+        for stage in self.stages:
+            speed = (
+                timings.seconds_per_unit(stage) if timings else stage.seconds_per_unit
+            )
+            stage.expected_seconds = max(stage.work * speed, _MIN_EXPECTED_SECONDS)
+
+    def progress(self) -> float:
+        """Get the fraction of the job done, weighted by expected durations."""
+        total = sum(stage.expected_seconds for stage in self.stages)
+        done = sum(stage.expected_seconds * stage.fraction for stage in self.stages)
+        return done / total
+
+    def run(self) -> None:
+        """
+        Run every stage.
+
+        Once a stage fails, no other stage is started, and the running ones
+        are cancelled and waited for.
+
+        Raises:
+            Exception: The first exception raised by a stage
+        """
+        provided: set[str] = set()
+        pending = list(self.stages)
+        running: dict[Future[None], Stage] = {}
+        error: BaseException | None = None
+        with ThreadPoolExecutor(
+            max_workers=len(self.stages), thread_name_prefix="stage"
+        ) as executor:
+            while True:
+                if error is None:
+                    for stage in [s for s in pending if provided.issuperset(s.needs)]:
+                        pending.remove(stage)
+                        running[executor.submit(self._run_stage, stage)] = stage
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    exception = future.exception()
+                    if exception is None:
+                        provided.update(stage.provides)
+                    elif error is None:
+                        error = exception
+                        logging.error(f"Stage {stage.name} failed: {exception}")
+                        self._cancel(running.values())
+        logging.info(
+            "Stage wall times: "
+            + ", ".join(
+                f"{stage.name} {stage.seconds:.1f}s "
+                f"(expected {stage.expected_seconds:.1f}s)"
+                for stage in self.stages
+                if stage.seconds is not None
+            )
+        )
+        if error is not None:
+            raise error
+
+    def _run_stage(self, stage: Stage) -> None:
+        _running.stage = stage
+        stage.started = time.monotonic()
+        try:
+            if self._restore(stage):
+                return
+            stage.run()
+        finally:
+            _running.stage = None
+        stage.seconds = time.monotonic() - stage.started
+        stage.report(1.0)
+        if self.timings:
+            self.timings.record(stage)
+
+    @staticmethod
+    def _restore(stage: Stage) -> bool:
+        """Skip *stage* if its restore hook says an earlier run did it."""
+        if not stage.restore:
+            return False
+        try:
+            restored = stage.restore()
+        except Exception as e:
+            logging.warning(f"Could not restore stage {stage.name}, running it: {e}")
+            return False
+        if restored:
+            logging.info(f"Stage {stage.name} restored from an earlier run")
+            stage.report(1.0)
+        return restored
+
+    @staticmethod
+    def _cancel(stages: Iterable[Stage]) -> None:
+        for stage in stages:
+            if stage.cancel:
+                logging.info(f"Cancelling stage {stage.name}")
+                stage.cancel()
+
+
+def _check_graph(stages: Sequence[Stage]) -> None:
+    """Raise ValueError unless *stages* form a graph that can run to the end."""
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        msg = f"Stage names must be unique: {names}"
+        raise ValueError(msg)
+    providers: dict[str, str] = {}
+    for stage in stages:
+        for item in stage.provides:
+            if item in providers:
+                msg = f"{item} is provided by both {providers[item]} and {stage.name}"
+                raise ValueError(msg)
+            providers[item] = stage.name
+    for stage in stages:
+        missing = set(stage.needs) - providers.keys()
+        if missing:
+            msg = f"Stage {stage.name} needs {sorted(missing)}, which no stage provides"
+            raise ValueError(msg)
+
+    # Provide everything that can be, in order; whatever is left is a cycle
+    provided: set[str] = set()
+    pending = list(stages)
+    while pending:
+        ready = [stage for stage in pending if provided.issuperset(stage.needs)]
+        if not ready:
+            msg = f"Stages depend on each other: {[s.name for s in pending]}"
+            raise ValueError(msg)
+        for stage in ready:
+            pending.remove(stage)
+            provided.update(stage.provides)
+
+
+# Global timings instance (lives next to the downloads, like the hash cache)
+_stage_timings: StageTimings | None = None
+
+
+def get_stage_timings() -> StageTimings:
+    """Get the global measured stage timings."""
+    global _stage_timings
+    if _stage_timings is None:
+        from core.settings import get_config
+
+        _stage_timings = StageTimings(get_config().paths.work_dir / _TIMINGS_FILE_NAME)
+    return _stage_timings
+
+
+def set_stage_timings(timings: StageTimings) -> None:
+    """Set the global measured stage timings (for testing)."""
+    global _stage_timings
+    _stage_timings = timings
@@ -0,0 +1,305 @@
+"""
+Pluggable storage backends.
+Partitioning, mounting, raw volume writes and boot entries go through a
+StorageBackend: the Windows one (WMI and firmware variables, see
+services.disk), or the loopback one, which works on a disk image file on
+Linux so the whole installation can run and be timed there.
+
+The module-level functions forward to the global backend. They are what
+``elevated.call`` is given, since it can only call module-level functions.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+
+from services import disk
+from services.disk import Partition
+
+# Path of the installer's EFI binary on the EFI partition
+BOOT_FILE_PATH = "\\EFI\\wingone\\BOOT\\BOOTX64.EFI"
+
+
+class StorageBackend(ABC):
+    """Interface every storage backend implements."""
+
+    name: str = ""
+
+    @abstractmethod
+    def get_windows_partition(self) -> Partition:
+        """Get the partition Windows runs from."""
+
+    @abstractmethod
+    def get_efi_partition(self) -> Partition:
+        """Get the EFI system partition Windows boots from."""
+
+    @abstractmethod
+    def get_partition_by_guid(self, guid: str) -> Partition:
+        """
+        Get a partition by its GUID (with or without braces).
+
+        Raises:
+            RuntimeError: If there is no such partition
+        """
+
+    @abstractmethod
+    def new_partition(
+        self,
+        disk_number: int,
+        size: int,
+        filesystem: str | None = None,
+        label: str | None = None,
+        allocation_unit_size: int | None = None,
+    ) -> Partition:
+        """
+        Create a partition in the free space of a disk, optionally formatted.
+
+        Args:
+            disk_number: Disk to create the partition on
+            size: Size of the partition in bytes
+            filesystem: File system to format it with ("FAT32"), if any
+            label: Volume label, if formatted
+            allocation_unit_size: Cluster size in bytes, if formatted
+
+        Returns:
+            The new partition
+        """
+
+    @abstractmethod
+    def resize_partition(self, guid: str, new_size: int) -> None:
+        """Move the end of a partition so it is *new_size* bytes long."""
+
+    @abstractmethod
+    def delete_partition(self, guid: str) -> None:
+        """Delete a partition."""
+
+    @abstractmethod
+    def mount_volume(self, volume_unique_id: str, mount_path: str) -> None:
+        """Make a volume's files available under an empty directory."""
+
+    @abstractmethod
+    def unmount_volume(self, mount_path: str) -> None:
+        """Undo mount_volume, once every change is written to the volume."""
+
+    @abstractmethod
+    def write_fat32_image(self, volume_unique_id: str, image_file: str) -> None:
+        """
+        Write a saved Fat32Image over a volume, all at once.
+
+        Backends write it with fat32_image.write_saved_image, so the caller
+        can follow the progress with follow_write_progress.
+
+        Args:
+            volume_unique_id: Volume to overwrite
+            image_file: Fat32Image plan saved with Fat32Image.save
+        """
+
+    @abstractmethod
+    def get_disk_media_type(self, disk_number: int) -> str:
+        """Get "ssd", "hdd" or "unknown" for a disk."""
+
+    @abstractmethod
+    def create_boot_entry(self, efi_partition: Partition) -> int:
+        """
+        Add a firmware boot entry for the installer's EFI binary.
+
+        Args:
+            efi_partition: EFI partition holding BOOT_FILE_PATH
+
+        Returns:
+            Number of the new boot entry
+        """
+
+
+class WindowsStorage(StorageBackend):
+    """Storage of the running Windows system, through WMI."""
+
+    name = "windows"
+
+    def get_windows_partition(self) -> Partition:
+        return disk.get_windows_partition()
+
+    def get_efi_partition(self) -> Partition:
+        return disk.get_efi_partition()
+
+    def get_partition_by_guid(self, guid: str) -> Partition:
+        return disk.get_partition_by_guid(guid)
+
+    def new_partition(
+        self,
+        disk_number: int,
+        size: int,
+        filesystem: str | None = None,
+        label: str | None = None,
+        allocation_unit_size: int | None = None,
+    ) -> Partition:
+        return disk.new_partition(
+            disk_number,
+            size,
+            filesystem,
+            label,
+            allocation_unit_size=allocation_unit_size,
+        )
+
+    def resize_partition(self, guid: str, new_size: int) -> None:
+        disk.resize_partition(guid, new_size)
+
+    def delete_partition(self, guid: str) -> None:
+        disk.delete_partition(guid)
+
+    def mount_volume(self, volume_unique_id: str, mount_path: str) -> None:
+        disk.mount_volume_to_path(volume_unique_id, mount_path)
+
+    def unmount_volume(self, mount_path: str) -> None:
+        disk.unmount_volume_from_path(mount_path)
+
+    def write_fat32_image(self, volume_unique_id: str, image_file: str) -> None:
+        disk.write_fat32_image(volume_unique_id, image_file)
+
+    def get_disk_media_type(self, disk_number: int) -> str:
+        return disk.get_disk_media_type(disk_number)
+
+    def create_boot_entry(self, efi_partition: Partition) -> int:
+        """Duplicate the Windows Boot Manager entry, pointed at our EFI binary."""
+        import uuid
+
+        import firmware_variables as fwvars
+
+        if not efi_partition:
+            msg = "Could not get EFI partition information"
+            raise RuntimeError(msg)
+
+        # Find the entry with "Windows Boot Manager" to duplicate
+        windows_entry_id = None
+        with fwvars.adjust_privileges():
+            for entry_id in fwvars.get_boot_order():
+                entry = fwvars.get_parsed_boot_entry(entry_id)
+                if "windows boot manager" in entry.description.lower():
+                    windows_entry_id = entry_id
+                    break
+            if windows_entry_id is None:
+                msg = "Windows Boot Manager entry not found"
+                raise RuntimeError(msg)
+
+            # Duplicate the entry
+            new_entry = fwvars.get_parsed_boot_entry(windows_entry_id)
+            new_entry.description = "WinGone Installer"
+            new_entry.optional_data = b""
+
+            # Edit the duplicate entry to point to our EFI file on EFI partition
+            for path in new_entry.file_path_list.paths:
+                if path.is_file_path():
+                    path.set_file_path(BOOT_FILE_PATH)
+                elif path.is_hard_drive():
+                    hd_node = path.get_hard_drive_node()
+                    if hd_node:
+                        # Set to EFI partition instead of temp partition
+                        hd_node.partition_guid = efi_partition.partition_guid
+                        hd_node.partition_number = efi_partition.partition_number
+                        hd_node.partition_start_lba = efi_partition.start_lba
+                        hd_node.partition_size_lba = efi_partition.size_lba
+                        hd_node.partition_signature = uuid.UUID(
+                            efi_partition.partition_guid
+                        ).bytes_le
+                        path.set_hard_drive_node(hd_node)
+
+            # Find an unused entry_id for the new entry
+            new_entry_id = None
+            for i in range(50):
+                try:
+                    fwvars.get_boot_entry(i)
+                except OSError as e:
+                    if hasattr(e, "winerror") and e.winerror == 203:
+                        new_entry_id = i
+                        break
+                    # else: skip unknown errors
+            if new_entry_id is None:
+                new_entry_id = 16  # fallback
+
+            fwvars.set_parsed_boot_entry(new_entry_id, new_entry)
+
+            # Set the new entry as BootNext
+            fwvars.set_boot_next(new_entry_id)
+
+        return new_entry_id
+
+
+# Global backend instance
+_backend: StorageBackend | None = None
+
+
+def get_storage_backend() -> StorageBackend:
+    """Get the global storage backend (the Windows one unless set)."""
+    global _backend
+    if _backend is None:
+        _backend = WindowsStorage()
+        logging.info(f"Using {_backend.name} storage backend")
+    return _backend
+
+
+def set_storage_backend(backend: StorageBackend) -> None:
+    """Set the global storage backend (for testing and benchmarks)."""
+    global _backend
+    _backend = backend
+
+
+def get_windows_partition() -> Partition:
+    """Get the partition Windows runs from."""
+    return get_storage_backend().get_windows_partition()
+
+
+def get_efi_partition() -> Partition:
+    """Get the EFI system partition Windows boots from."""
+    return get_storage_backend().get_efi_partition()
+
+
+def get_partition_by_guid(guid: str) -> Partition:
+    """Get a partition by its GUID."""
+    return get_storage_backend().get_partition_by_guid(guid)
+
+
+def new_partition(
+    disk_number: int,
+    size: int,
+    filesystem: str | None = None,
+    label: str | None = None,
+    allocation_unit_size: int | None = None,
+) -> Partition:
+    """Create a partition in the free space of a disk, optionally formatted."""
+    return get_storage_backend().new_partition(
+        disk_number, size, filesystem, label, allocation_unit_size
+    )
+
+
+def resize_partition(guid: str, new_size: int) -> None:
+    """Move the end of a partition so it is *new_size* bytes long."""
+    get_storage_backend().resize_partition(guid, new_size)
+
+
+def delete_partition(guid: str) -> None:
+    """Delete a partition."""
+    get_storage_backend().delete_partition(guid)
+
+
+def mount_volume(volume_unique_id: str, mount_path: str) -> None:
+    """Make a volume's files available under an empty directory."""
+    get_storage_backend().mount_volume(volume_unique_id, mount_path)
+
+
+def unmount_volume(mount_path: str) -> None:
+    """Undo mount_volume."""
+    get_storage_backend().unmount_volume(mount_path)
+
+
+def write_fat32_image(volume_unique_id: str, image_file: str) -> None:
+    """Write a saved Fat32Image over a volume."""
+    get_storage_backend().write_fat32_image(volume_unique_id, image_file)
+
+
+def get_disk_media_type(disk_number: int) -> str:
+    """Get "ssd", "hdd" or "unknown" for a disk."""
+    return get_storage_backend().get_disk_media_type(disk_number)
+
+
+def create_boot_entry(efi_partition: Partition) -> int:
+    """Add a firmware boot entry for the installer's EFI binary."""
+    return get_storage_backend().create_boot_entry(efi_partition)
@@ -0,0 +1,307 @@
+"""
+Loopback storage backend.
+Emulates a Windows system disk with a sparse GPT disk image file on Linux,
+so the whole installation (download, partitioning, extraction, EFI copy)
+can run and be timed outside Windows. The partition table is edited with
+sfdisk. File systems are FAT32 only: volumes are formatted and written with
+Fat32Image, and mounting copies a volume's files out with mtools into the
+mount directory, then writes them back as a new volume on unmount.
+
+Needs util-linux (sfdisk) and mtools.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from services import fat32
+from services.disk import Partition
+from services.fat32_image import Fat32Image, ImageFile, write_saved_image
+from services.storage import BOOT_FILE_PATH, StorageBackend
+from utils.uuid import PartitionUuid
+
+_SECTOR_SIZE = 512
+_EFI_TYPE = "C12A7328-F81F-11D2-BA4B-00A0C93EC93B"
+_BASIC_DATA_TYPE = "EBD0A0A2-B9E5-4433-87C0-68B6B72699C7"
+_DEFAULT_EFI_SIZE = 260 * 1024 * 1024
+_DISK_NUMBER = 0
+_GPT_PARTITION_STYLE = 2  # MSFT_Disk.PartitionStyle of a GPT disk
+_VOLUME_PREFIX = "loopback:"
+_BOOT_ENTRIES_FILE_NAME = "boot_entries.json"
+# FAT32 boot sector fields kept when a volume is written back
+_VOLUME_ID_OFFSET = 67
+_VOLUME_LABEL_OFFSET = 71
+_VOLUME_LABEL_LENGTH = 11
+
+
+class LoopbackStorage(StorageBackend):
+    """Storage on a GPT disk image file, standing in for the Windows disk."""
+
+    name = "loopback"
+
+    def __init__(self, image_file: Path):
+        """
+        Args:
+            image_file: Disk image made by create()
+        """
+        self.image_file = image_file
+        self._mounts: dict[str, str] = {}  # Mount path -> partition GUID
+
+    @classmethod
+    def create(
+        cls, image_file: Path, size: int, efi_size: int = _DEFAULT_EFI_SIZE
+    ) -> "LoopbackStorage":
+        """
+        Create a sparse disk image laid out like a Windows system disk.
+
+        It has a FAT32 EFI system partition, then a "Windows" partition
+        filling the rest of the disk (unformatted: only its size matters).
+
+        Args:
+            image_file: Image file to create (replaced if it exists)
+            size: Size of the disk in bytes
+            efi_size: Size of the EFI system partition in bytes
+
+        Returns:
+            Backend using the new image
+        """
+        image_file.parent.mkdir(parents=True, exist_ok=True)
+        with image_file.open("wb") as f:
+            f.truncate(size)
+        backend = cls(image_file)
+        backend._sfdisk(
+            [],
+            "label: gpt\n"
+            f"size={efi_size // _SECTOR_SIZE}, type={_EFI_TYPE}, name=EFI\n"
+            f"type={_BASIC_DATA_TYPE}, name=Windows\n",
+        )
+        efi_partition = backend.get_efi_partition()
+        backend._format(efi_partition, "SYSTEM")
+        logging.info(f"Created loopback disk {image_file} ({size} bytes)")
+        return backend
+
+    def get_windows_partition(self) -> Partition:
+        return self._find(lambda p: p["type"].upper() == _BASIC_DATA_TYPE, "Windows")
+
+    def get_efi_partition(self) -> Partition:
+        return self._find(lambda p: p["type"].upper() == _EFI_TYPE, "EFI system")
+
+    def get_partition_by_guid(self, guid: str) -> Partition:
+        guid = PartitionUuid.to_raw(guid).lower()
+        return self._find(lambda p: p["uuid"].lower() == guid, guid)
+
+    def new_partition(
+        self,
+        disk_number: int,  # noqa: ARG002 - there is only one disk
+        size: int,
+        filesystem: str | None = None,
+        label: str | None = None,
+        allocation_unit_size: int | None = None,
+    ) -> Partition:
+        if filesystem not in (None, "FAT32"):
+            msg = f"Loopback disks only support FAT32, not {filesystem}"
+            raise ValueError(msg)
+        guid = str(uuid.uuid4())
+        self._sfdisk(
+            ["--append"],
+            f"size={size // _SECTOR_SIZE}, type={_BASIC_DATA_TYPE}, uuid={guid}\n",
+        )
+        partition = self.get_partition_by_guid(guid)
+        if filesystem:
+            self._format(
+                partition, label or "", allocation_unit_size or fat32.CLUSTER_SIZE
+            )
+        return partition
+
+    def resize_partition(self, guid: str, new_size: int) -> None:
+        partition = self.get_partition_by_guid(guid)
+        self._sfdisk(
+            ["-N", str(partition.partition_number)],
+            f"size={new_size // _SECTOR_SIZE}\n",
+        )
+
+    def delete_partition(self, guid: str) -> None:
+        partition = self.get_partition_by_guid(guid)
+        self._run(
+            [
+                "sfdisk",
+                "--delete",
+                str(self.image_file),
+                str(partition.partition_number),
+            ]
+        )
+
+    def mount_volume(self, volume_unique_id: str, mount_path: str) -> None:
+        partition = self._volume(volume_unique_id)
+        Path(mount_path).mkdir(parents=True, exist_ok=True)
+        source = f"{self.image_file}@@{partition.offset}"
+        listing = self._run(["mdir", "-b", "-i", source, "::/"])
+        if listing.strip():
+            self._run(["mcopy", "-s", "-n", "-m", "-i", source, "::/*", mount_path])
+        self._mounts[os.path.normcase(mount_path)] = partition.partition_guid
+
+    def unmount_volume(self, mount_path: str) -> None:
+        guid = self._mounts.pop(os.path.normcase(mount_path), None)
+        if guid is None:
+            msg = f"No partition found mounted at {mount_path}"
+            raise RuntimeError(msg)
+        partition = self.get_partition_by_guid(guid)
+        root = Path(mount_path)
+        files = [
+            ImageFile.from_file(
+                f"/{path.relative_to(root).as_posix()}",
+                path,
+                read_only=not path.stat().st_mode & stat.S_IWRITE,
+            )
+            for path in sorted(root.rglob("*"))
+            if path.is_file()
+        ]
+        self._format(partition, files=files)
+        # Empty the directory again, like removing a real access path does
+        for child in root.iterdir():
+            if child.is_dir():
+                shutil.rmtree(child, onexc=_make_writable_and_retry)
+            else:
+                child.chmod(stat.S_IWUSR | stat.S_IRUSR)
+                child.unlink()
+
+    def write_fat32_image(self, volume_unique_id: str, image_file: str) -> None:
+        partition = self._volume(volume_unique_id)
+        with self.image_file.open("r+b") as f:
+            f.seek(partition.offset)
+            write_saved_image(Path(image_file), f.write)
+
+    def get_disk_media_type(self, disk_number: int) -> str:  # noqa: ARG002
+        return "unknown"
+
+    def create_boot_entry(self, efi_partition: Partition) -> int:
+        """Record the boot entry next to the disk image, as there is no firmware."""
+        entries_file = self.image_file.with_name(_BOOT_ENTRIES_FILE_NAME)
+        try:
+            entries = json.loads(entries_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            entries = []
+        entries.append(
+            {
+                "description": "WinGone Installer",
+                "partition_guid": efi_partition.partition_guid,
+                "file_path": BOOT_FILE_PATH,
+            }
+        )
+        entries_file.write_text(json.dumps(entries, indent=1), encoding="utf-8")
+        return len(entries) - 1
+
+    def _partitions(self) -> list[tuple[dict, Partition]]:
+        """Read the partition table of the image: (sfdisk entry, partition)."""
+        table = json.loads(self._run(["sfdisk", "--json", str(self.image_file)]))
+        table = table["partitiontable"]
+        sector_size = table.get("sectorsize", _SECTOR_SIZE)
+        partitions = []
+        for entry in table.get("partitions", []):
+            guid = entry["uuid"].lower()
+            partition = Partition(
+                partition_guid=guid,
+                # The node is the image path followed by the number
+                partition_number=int(entry["node"][len(str(self.image_file)) :]),
+                disk_number=_DISK_NUMBER,
+                disk_guid=table["id"].lower(),
+                offset=entry["start"] * sector_size,
+                size=entry["size"] * sector_size,
+                logical_sector_size=sector_size,
+                start_lba=entry["start"],
+                size_lba=entry["size"],
+                disk_partition_style=_GPT_PARTITION_STYLE,
+                drive_letter="C" if entry.get("name") == "Windows" else None,
+                volume_unique_id=f"{_VOLUME_PREFIX}{guid}",
+            )
+            partitions.append((entry, partition))
+        return partitions
+
+    def _find(self, match: Callable[[dict], bool], description: str) -> Partition:
+        """Get the first partition whose sfdisk entry matches."""
+        for entry, partition in self._partitions():
+            if match(entry):
+                return partition
+        msg = f"No {description} partition on {self.image_file}"
+        raise RuntimeError(msg)
+
+    def _volume(self, volume_unique_id: str) -> Partition:
+        if not volume_unique_id.startswith(_VOLUME_PREFIX):
+            msg = f"Not a loopback volume: {volume_unique_id}"
+            raise ValueError(msg)
+        return self.get_partition_by_guid(volume_unique_id[len(_VOLUME_PREFIX) :])
+
+    def _format(
+        self,
+        partition: Partition,
+        label: str | None = None,
+        cluster_size: int = fat32.CLUSTER_SIZE,
+        files: list[ImageFile] | None = None,
+    ) -> None:
+        """
+        Write a FAT32 volume holding *files* over a partition.
+
+        Without a *label*, the label and serial number of the volume already
+        on the partition are kept.
+        """
+        volume_id = None
+        if label is None:
+            with self.image_file.open("rb") as f:
+                f.seek(partition.offset + _VOLUME_ID_OFFSET)
+                header = f.read(_VOLUME_LABEL_OFFSET - _VOLUME_ID_OFFSET)
+                raw_label = f.read(_VOLUME_LABEL_LENGTH)
+            volume_id = int.from_bytes(header, "little")
+            label = raw_label.decode("ascii", "replace").rstrip()
+        image = Fat32Image(
+            files or [],
+            partition.size,
+            label,
+            cluster_size=cluster_size,
+            hidden_sectors=partition.start_lba,
+            volume_id=volume_id,
+        )
+        with self.image_file.open("r+b") as f:
+            f.seek(partition.offset)
+            image.write(f.write)
+
+    def _sfdisk(self, options: list[str], script: str) -> None:
+        self._run(
+            [
+                "sfdisk",
+                "--no-reread",
+                "--no-tell-kernel",
+                *options,
+                str(self.image_file),
+            ],
+            script,
+        )
+
+    @staticmethod
+    def _run(args: list[str], stdin: str | None = None) -> str:
+        """Run a tool and return its output; mtools may not check geometry."""
+        try:
+            result = subprocess.run(
+                args,
+                input=stdin,
+                capture_output=True,
+                text=True,
+                check=True,
+                env={**os.environ, "MTOOLS_SKIP_CHECK": "1"},
+            )
+        except subprocess.CalledProcessError as e:
+            msg = f"{args[0]} failed: {e.stderr.strip() or e.returncode}"
+            raise RuntimeError(msg) from e
+        return result.stdout
+
+
+def _make_writable_and_retry(func, path: str, _exc) -> None:  # type: ignore[no-untyped-def]
+    with contextlib.suppress(OSError):
+        Path(path).chmod(stat.S_IWUSR | stat.S_IRUSR)
+        func(path)
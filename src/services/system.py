@@ -11,7 +11,6 @@ For async privileged operations:
 
 import ctypes
 import locale
-import winreg
 
 from utils import com_context
 
@@ -65,6 +64,8 @@ def get_windows_timezone_from_iana(iana_timezone: str) -> str | None:
 
 def get_current_windows_keyboard() -> str | None:
     """Get the current Windows keyboard layout friendly name."""
+    import winreg
+
     try:
         # Get the first keyboard layout from registry
         key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Keyboard Layout\Preload")
@@ -101,6 +102,8 @@ def set_windows_time_to_utc() -> bool:
     Returns:
         True if successful, False otherwise
     """
+    import winreg
+
     try:
         key = winreg.CreateKey(
             winreg.HKEY_LOCAL_MACHINE,